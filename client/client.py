@@ -13,14 +13,19 @@
 
 import argparse
 import asyncio
+from contextvars import ContextVar
 from datetime import datetime, timezone
+import fnmatch
 import json
 import os
 import platform
+import random
+import shutil
 import ssl
 import sys
 import tempfile
-import urllib.request
+import time
+from typing import Optional
 
 # using this to access to the shared dir files
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -28,13 +33,16 @@ from shared.alsa import Alsa
 from shared.bw_custom import BWCustom
 from shared.cat import check
 from shared.converter import Converter, SUPPORTED_EXTENSIONS
-from shared.http import BWHTTPFileClient
+from shared.downloader import download, stream, progress_bar, DownloadError
+from shared.file_index import FileIndex, IndexWatcher, hash_file, pack_entries
+from shared.http import BWHTTPFileClient, BWHTTPFileServer
 from shared.logger import Log
-from shared.protocol import ProtocolParser, Commands, PROTOCOL_VERSION
+from shared.protocol import ProtocolParser, Commands, RPCError, FRAMINGS, PROTOCOL_VERSION
 from shared.pw_monitor import PWM
 from shared.security import PathValidator, SecurityError
 from shared.socket import BWWebSocketClient
 from shared.syscheck import check_requirements
+from shared.tls import gen_cert, save_cert
 from shared.version import check_for_updates
 
 
@@ -46,8 +54,25 @@ except ImportError:
     sys.exit(1)
 
 
+PEER_IDLE_TIMEOUT = 120 # seconds before an unused peer endpoint is closed
+FILE_CHANGES_PAGE_SIZE = 1000 # files per FILES_CHANGED message
+
+# STATUS heartbeat: frequent while on air, backing off while nothing changes
+STATUS_ACTIVE_INTERVAL = 10
+STATUS_IDLE_INTERVAL = 30
+STATUS_MAX_INTERVAL = 300
+CPU_TEMP_PATH = "/sys/class/thermal/thermal_zone0/temp"
+
+# reconnection after a dropped connection, delays double up to the max, with jitter
+RECONNECT_BASE_DELAY = 1
+RECONNECT_MAX_DELAY = 60
+REGISTRATION_TIMEOUT = 5
+
+# request id (rid) of the server message being handled, echoed by _reply
+_request_id: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
+
 class BotWaveClient:
-    def __init__(self, server_host: str, ws_port: int, http_port: int, http_host: str = None, upload_dir: str = "/opt/BotWave/uploads", passkey: str = None, talk: bool = False):
+    def __init__(self, server_host: str, ws_port: int, http_port: int, http_host: str = None, upload_dir: str = "/opt/BotWave/uploads", passkey: str = None, talk: bool = False, peer_port: int = None, http_connections: int = 4):
         self.server_host = server_host
         self.http_host = http_host or server_host
         self.ws_port = ws_port
@@ -58,6 +83,12 @@ class BotWaveClient:
         # communications
         self.ws_client = None
         self.http_client = None
+        self.http_connections = http_connections # kept-alive https connections per endpoint
+        
+        # peer distribution (serving our files to other clients)
+        self.peer_port = peer_port
+        self.peer_server = None
+        self.peer_last_used = 0
         
         # broadcast
         self.piwave = None
@@ -65,6 +96,10 @@ class BotWaveClient:
         self.piwave_monitor = PWM()
         self.broadcasting = False
         self.current_file = None
+        self.broadcast_frequency = None
+        self.broadcast_started = None # time.monotonic() of the start, for the playback position
+        self.broadcast_duration = None # seconds, known for files
+        self.broadcast_loop = False
         self.broadcast_lock = asyncio.Lock() # using asyncio instead of thereading now
         self.alsa = Alsa()
         self.stream_task = None
@@ -74,8 +109,21 @@ class BotWaveClient:
         self.running = False
         self.registered = False
         self.client_id = None
+        self.framing = 'text' # set by the server in REGISTER_OK
+        self.resume_token = None # sent back when reconnecting to keep our id
+        self.registration = None # future of the registration in progress, see connect
+        self.legacy_registration = False # server predates HELLO
+        self.pending_end = None # END of a broadcast that finished while disconnected
         
         os.makedirs(upload_dir, exist_ok=True)
+        self.file_index = FileIndex(upload_dir)
+        self.index_watcher = None # pushes file changes to the server once registered
+        self.server_indexes = False # server keeps a fleet index (REGISTER_OK index=true)
+        self.server_status = False # server caches STATUS heartbeats (REGISTER_OK status=true)
+        self.status_task = None
+        self.status_changed = asyncio.Event()
+        self.handler_tasks = set() # long running handlers, see _spawn
+        self.loop = None
         backend_classes["bw_custom"] = BWCustom
 
     def _create_ssl_context(self):
@@ -101,12 +149,72 @@ class BotWaveClient:
             "release": platform.release()
         }
         
+        if self.peer_port:
+            machine_info['peer_port'] = self.peer_port
+        
+        # lets the server send compressed originals for us to convert
+        if shutil.which("ffmpeg"):
+            machine_info['ffmpeg'] = 'true'
+        
+        # we can extract bundles (many files over one connection)
+        machine_info['bundle'] = 'true'
+        
+        if self.resume_token:
+            machine_info['resume'] = self.resume_token
+        
+        # resolved by REGISTER_OK, or by the server refusing us
+        self.registration = asyncio.get_running_loop().create_future()
+        
+        if self.legacy_registration:
+            await self._send_legacy_registration(machine_info)
+        else:
+            # everything in one message, offering the structured framings we can decode
+            if self.passkey:
+                machine_info['passkey'] = self.passkey
+            
+            hello_cmd = ProtocolParser.build_command(
+                Commands.HELLO,
+                version=PROTOCOL_VERSION,
+                framing=','.join(FRAMINGS),
+                **machine_info
+            )
+            await self.ws_client.send(hello_cmd)
+        
+        try:
+            if not await asyncio.wait_for(self.registration, timeout=REGISTRATION_TIMEOUT):
+                return False
+        except asyncio.TimeoutError:
+            Log.error("Registration timeout")
+            return False
+        except RPCError as e:
+            if self.legacy_registration:
+                Log.error(f"Registration refused: {e}")
+                return False
+            
+            # servers before HELLO close the connection on it, register the old way
+            Log.warning("Server doesn't support HELLO, registering with REGISTER / AUTH / VER")
+            self.legacy_registration = True
+            await self.ws_client.disconnect()
+            return await self.connect()
+        
+        if self.server_indexes:
+            asyncio.create_task(self._start_index_watcher())
+        if self.server_status and not self.status_task:
+            self.status_task = asyncio.create_task(self._status_loop())
+        
+        # the server may have missed what happened while we were away
+        self._notify_status()
+        
+        if self.pending_end:
+            await self.ws_client.send(self.pending_end)
+            self.pending_end = None
+        
+        return True
+
+    async def _send_legacy_registration(self, machine_info: dict):
         register_cmd = ProtocolParser.build_command(
             Commands.REGISTER,
-            hostname=machine_info['hostname'],
-            machine=machine_info['machine'],
-            system=machine_info['system'],
-            release=machine_info['release']
+            **machine_info
         )
         
         await self.ws_client.send(register_cmd)
@@ -116,16 +224,124 @@ class BotWaveClient:
             auth_cmd = ProtocolParser.build_command(Commands.AUTH, self.passkey)
             await self.ws_client.send(auth_cmd)
         
-        ver_cmd = ProtocolParser.build_command(Commands.VER, PROTOCOL_VERSION)
+        # offers the structured framings we can decode, the server picks one
+        ver_cmd = ProtocolParser.build_command(Commands.VER, PROTOCOL_VERSION, framing=','.join(FRAMINGS))
         await self.ws_client.send(ver_cmd)
+
+    def _registration_done(self, result=True, error: Exception = None):
+        if not self.registration or self.registration.done():
+            return
         
-        for _ in range(50):  # wait up to 5s
-            if self.registered:
-                return True
-            await asyncio.sleep(0.1)
+        if error:
+            self.registration.set_exception(error)
+        else:
+            self.registration.set_result(result)
+
+    async def _start_index_watcher(self):
+        # sends our whole file index once, then only what changes,
+        # so the server knows what we hold without asking
+        self.loop = asyncio.get_running_loop()
         
-        Log.error("Registration timeout")
-        return False
+        if self.index_watcher:
+            self.index_watcher.stop()
+        
+        watcher = IndexWatcher(self.file_index, lambda changes: self._on_files_changed(watcher, changes))
+        self.index_watcher = watcher
+        entries = await self.loop.run_in_executor(None, watcher.snapshot)
+        
+        # the snapshot is out before the watcher thread can report anything
+        await self._push_file_changes([{'event': 'added', **entry} for entry in entries], reset=True)
+        
+        if watcher is self.index_watcher and self.running:
+            watcher.start()
+
+    def _on_files_changed(self, watcher: IndexWatcher, changes: list):
+        # called from the watcher thread, a replaced watcher may still be finishing a scan
+        if self.loop and self.registered and watcher is self.index_watcher:
+            asyncio.run_coroutine_threadsafe(self._push_file_changes(changes), self.loop)
+
+    def _status(self) -> dict:
+        status = {'broadcasting': 'true' if self.broadcasting else 'false'}
+        
+        if self.broadcasting:
+            status['file'] = self.current_file or ''
+            status['frequency'] = self.broadcast_frequency or ''
+            if self.broadcast_started:
+                position = time.monotonic() - self.broadcast_started
+                
+                if self.broadcast_duration:
+                    status['duration'] = f"{self.broadcast_duration:.1f}"
+                    
+                    # a looped file restarts, the position stays within it
+                    if self.broadcast_loop:
+                        loops, position = divmod(position, self.broadcast_duration)
+                        status['loops'] = int(loops)
+                
+                status['position'] = f"{position:.0f}"
+        
+        try:
+            status['disk_free'] = shutil.disk_usage(self.upload_dir).free
+        except OSError:
+            pass
+        
+        try:
+            with open(CPU_TEMP_PATH) as f:
+                status['cpu_temp'] = f"{int(f.read().strip()) / 1000:.1f}"
+        except (OSError, ValueError):
+            pass
+        
+        return status
+
+    def _notify_status(self):
+        # something the server shows changed, send a heartbeat now
+        self.status_changed.set()
+
+    async def _status_loop(self):
+        # the interval is sent along, so the server knows when a client went quiet
+        interval = STATUS_IDLE_INTERVAL
+        last = None
+        
+        while self.running:
+            self.status_changed.clear()
+            status = self._status()
+            
+            # position and free space always move, they don't count as a change
+            summary = (status['broadcasting'], status.get('file'), status.get('frequency'))
+            
+            if self.broadcasting:
+                interval = STATUS_ACTIVE_INTERVAL
+            elif summary == last:
+                interval = min(interval * 2, STATUS_MAX_INTERVAL)
+            else:
+                interval = STATUS_IDLE_INTERVAL
+            
+            last = summary
+            
+            message = ProtocolParser.build_frame(self.framing, Commands.STATUS, interval=interval, **status)
+            await self.ws_client.send(message)
+            
+            try:
+                await asyncio.wait_for(self.status_changed.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _push_file_changes(self, changes: list, reset: bool = False):
+        fields = ['event', 'name', 'size', 'sha256']
+        
+        # big snapshots go in several messages, reset only on the first one
+        for start in range(0, max(len(changes), 1), FILE_CHANGES_PAGE_SIZE):
+            extra = {'reset': 'true'} if reset and start == 0 else {}
+            page = changes[start:start + FILE_CHANGES_PAGE_SIZE]
+            
+            message = ProtocolParser.build_frame(
+                self.framing,
+                Commands.FILES_CHANGED,
+                fields=','.join(fields),
+                changes=json.dumps(pack_entries(page, fields), separators=(',', ':')),
+                **extra
+            )
+            
+            await self.ws_client.send(message)
 
     async def start(self):
         try:
@@ -138,15 +354,19 @@ class BotWaveClient:
                 on_message_callback=self._handle_server_msg
             )
             
-            self.http_client = BWHTTPFileClient(ssl_context=ssl_context)
-            
-            if not await self.connect():
-                await self.stop()
+            self.http_client = BWHTTPFileClient(ssl_context=ssl_context, limit=self.http_connections)
             
             self.running = True
             
-            # wait for disconnect (keeps client alive)
-            await self.ws_client.wait_for_disconnect()
+            if not await self.connect():
+                return False
+            
+            # wait for disconnect (keeps client alive), then reconnect until stopped
+            while self.running:
+                await self.ws_client.wait_for_disconnect()
+                
+                if not self.running or not await self._reconnect():
+                    break
             
         except KeyboardInterrupt:
             Log.warning("Shutting down...")
@@ -155,32 +375,79 @@ class BotWaveClient:
         
         return True
 
+    async def _reconnect(self) -> bool:
+        # same process, whatever is on air keeps playing meanwhile
+        delay = RECONNECT_BASE_DELAY
+        attempt = 0
+        
+        await self.ws_client.disconnect()
+        
+        while self.running:
+            attempt += 1
+            
+            # jittered, so a whole fleet doesn't come back at the same time
+            wait = random.uniform(delay / 2, delay)
+            Log.warning(f"Connection lost, reconnecting in {wait:.1f}s (attempt {attempt})")
+            await asyncio.sleep(wait)
+            
+            if not self.running:
+                break
+            
+            self.registered = False
+            
+            if await self.connect():
+                return True
+            
+            await self.ws_client.disconnect()
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        
+        return False
+
     async def _handle_server_msg(self, message: str):
         try:
             parsed = ProtocolParser.parse_command(message)
             command = parsed['command']
             kwargs = parsed['kwargs']
             
+            # tasks started by the handlers inherit it, so late replies still match
+            _request_id.set(kwargs.get('rid'))
+            
             #Log.info(f"Received: {command}")
             
             # registrations
             if command == Commands.REGISTER_OK:
                 self.client_id = kwargs.get('client_id', 'unknown')
+                self.framing = kwargs.get('framing', 'text') if kwargs.get('framing') in FRAMINGS else 'text'
+                self.server_indexes = kwargs.get('index', '').lower() == 'true'
+                self.server_status = kwargs.get('status', '').lower() == 'true'
+                self.resume_token = kwargs.get('resume')
                 self.registered = True
-                Log.success(f"Registered as: {self.client_id}")
+                
+                if kwargs.get('resumed', '').lower() == 'true':
+                    Log.success(f"Session resumed as: {self.client_id}")
+                else:
+                    Log.success(f"Registered as: {self.client_id}")
+                
+                self._registration_done()
                 return
             
             if command == Commands.AUTH_FAILED:
                 Log.error("Authentication failed: Invalid passkey")
+                self._registration_done(False)
                 await self.stop()
                 return
             
             if command == Commands.VERSION_MISMATCH:
                 server_ver = kwargs.get('server_version', 'unknown')
                 Log.error(f"Protocol version mismatch! Server: {server_ver}, Client: {PROTOCOL_VERSION}")
+                self._registration_done(False)
                 await self.stop()
                 return
             
+            if command == Commands.ERROR and not self.registered:
+                self._registration_done(error=RPCError(kwargs.get('message', 'Registration refused')))
+                return
+            
             # ping pong
             if command == Commands.PING:
                 await self.ws_client.send(Commands.PONG)
@@ -199,22 +466,30 @@ class BotWaveClient:
                 await self._handle_stop_broadcast()
                 return
             
-            # files
+            # files, these can take minutes so they don't hold the receive loop
             if command == Commands.UPLOAD_TOKEN:
-                await self._handle_upload_token(kwargs)
+                self._spawn(self._handle_upload_token(kwargs))
                 return
             
             if command == Commands.DOWNLOAD_TOKEN:
-                await self._handle_download_token(kwargs)
+                self._spawn(self._handle_download_token(kwargs))
                 return
             
             if command == Commands.DOWNLOAD_URL:
-                await self._handle_download_url(kwargs)
+                self._spawn(self._handle_download_url(kwargs))
+                return
+            
+            if command == Commands.BUNDLE_TOKEN:
+                self._spawn(self._handle_bundle_token(kwargs))
+                return
+            
+            if command == Commands.PEER_OFFER:
+                self._spawn(self._handle_peer_offer(kwargs))
                 return
             
             # files managment
             if command == Commands.LIST_FILES:
-                await self._handle_list_files()
+                self._spawn(self._handle_list_files(kwargs))
                 return
             
             if command == Commands.REMOVE_FILE:
@@ -229,19 +504,45 @@ class BotWaveClient:
                 return
             
             Log.warning(f"Unknown command: {command}")
-            response = ProtocolParser.build_response(Commands.ERROR, message=f"Unknown command: {command}. Perhaps a protocol mismatch ?")
+            response = self._reply(Commands.ERROR, message=f"Unknown command: {command}. Perhaps a protocol mismatch ?")
             await self.ws_client.send(response)
             
         except Exception as e:
             Log.error(f"Error handling message: {e}")
 
+    def _spawn(self, coro):
+        # runs a handler next to the receive loop, so control commands (START,
+        # STOP...) are still answered in time during a transfer or a conversion.
+        # the task inherits the request id, its reply still matches
+        task = asyncio.create_task(self._run_handler(coro))
+        self.handler_tasks.add(task)
+        task.add_done_callback(self.handler_tasks.discard)
+    
+    async def _run_handler(self, coro):
+        try:
+            await coro
+        except Exception as e:
+            Log.error(f"Error handling message: {e}")
+
+    def _reply(self, status: str, message: str = '', **kwargs):
+        # builds a reply to the current server request, with its request id
+        # and in the negotiated framing
+        if message:
+            kwargs = {'message': message, **kwargs}
+        
+        rid = _request_id.get()
+        if rid:
+            kwargs['rid'] = rid
+        
+        return ProtocolParser.build_frame(self.framing, status, **kwargs)
+
     async def _handle_upload_token(self, kwargs: dict):
         token = kwargs.get('token')
         filename = kwargs.get('filename')
         size = int(kwargs.get('size', 0))
         
         if not token or not filename:
-            error = ProtocolParser.build_response(Commands.ERROR, "Missing token or filename")
+            error = self._reply(Commands.ERROR, "Missing token or filename")
             await self.ws_client.send(error)
             return
         
@@ -252,7 +553,7 @@ class BotWaveClient:
             filepath = PathValidator.safe_join(self.upload_dir, filename)
         except SecurityError as e:
             Log.error(f"Invalid filename from server: {e}")
-            error = ProtocolParser.build_response(Commands.ERROR, "Provided filename raised a security violation")
+            error = self._reply(Commands.ERROR, message="Provided filename raised a security violation", token=token)
             await self.ws_client.send(error)
             return
         
@@ -260,20 +561,25 @@ class BotWaveClient:
             if total > 0:
                 Log.progress_bar(bytes_sent, total, prefix=f'Uploading {filename}:', suffix='Complete', style='yellow', icon='FILE', auto_clear=(bytes_sent == total))
         
+        # only a hash the index already knows, no extra read pass before uploading
+        entry = self.file_index.get(filename, with_hash=False)
+        
         success = await self.http_client.upload_file(
             server_host=self.http_host,
             server_port=self.http_port,
             token=token,
             filepath=filepath,
-            progress_callback=progress
+            progress_callback=progress,
+            sha256=entry['sha256'] if entry else None
         )
         
+        # token is echoed back so the server can match the reply to its transfer
         if success:
             Log.success(f"Upload completed: {filename}")
-            response = ProtocolParser.build_response(Commands.OK, f"Uploaded {filename}")
+            response = self._reply(Commands.OK, message=f"Uploaded {filename}", token=token)
         else:
             Log.error(f"Upload failed: {filename}")
-            response = ProtocolParser.build_response(Commands.ERROR, "Upload failed")
+            response = self._reply(Commands.ERROR, message="Upload failed", token=token)
         
         await self.ws_client.send(response)
         
@@ -281,9 +587,15 @@ class BotWaveClient:
     async def _handle_download_token(self, kwargs: dict):
         token = kwargs.get('token')
         filename = kwargs.get('filename')
+        expected_hash = kwargs.get('sha256')
+        convert = kwargs.get('convert', '').lower() == 'true'
+        
+        # host / port are set when the file comes from a peer instead of the server
+        host = kwargs.get('host') or self.http_host
+        port = int(kwargs.get('port') or self.http_port)
         
         if not token or not filename:
-            error = ProtocolParser.build_response(Commands.ERROR, "Missing token or filename")
+            error = self._reply(Commands.ERROR, "Missing token or filename")
             await self.ws_client.send(error)
             return
         
@@ -292,9 +604,20 @@ class BotWaveClient:
         try:
             filename = PathValidator.sanitize_filename(filename)
             save_path = PathValidator.safe_join(self.upload_dir, filename)
+            
+            # compressed original: download next to the target, convert, then drop it
+            if convert:
+                wav_name = PathValidator.sanitize_filename(os.path.splitext(filename)[0] + ".wav")
+                wav_path = PathValidator.safe_join(self.upload_dir, wav_name)
+                save_path = PathValidator.safe_join(self.upload_dir, f".convert_{token[:12]}_{filename}")
         except SecurityError as e:
             Log.error(f"Invalid filename from server: {e}")
-            error = ProtocolParser.build_response(Commands.ERROR, "Provided filename raised a security violation")
+            error = self._reply(Commands.ERROR, message="Provided filename raised a security violation", token=token)
+            await self.ws_client.send(error)
+            return
+        
+        if convert and os.path.splitext(filename)[1].lower().lstrip(".") not in SUPPORTED_EXTENSIONS:
+            error = self._reply(Commands.ERROR, message="Unsupported file type", token=token)
             await self.ws_client.send(error)
             return
         
@@ -305,29 +628,157 @@ class BotWaveClient:
             if bytes_received == total:
                 Log.progress_bar(bytes_received, total, prefix=f'Downloaded {filename} !', suffix='Complete', style='yellow', icon='FILE', auto_clear=True)
         
-        success = await self.http_client.download_file(
+        # verified (size & hash) before being renamed into place
+        sha256 = await self.http_client.download_file(
+            server_host=host,
+            server_port=port,
+            token=token,
+            save_path=save_path,
+            progress_callback=progress,
+            expected_sha256=expected_hash
+        )
+        
+        success = sha256 is not None
+        error_message = "Download failed"
+        loop = asyncio.get_event_loop()
+        
+        # hashed while downloading, the index never has to read it again
+        if success and not convert:
+            self.file_index.update(filename, sha256)
+        
+        if convert:
+            try:
+                if success:
+                    Log.converter(f"Converting {filename} locally...")
+                    await Converter.convert_wav_async(save_path, wav_path, not self.silent)
+                    self.file_index.update(wav_name, await loop.run_in_executor(None, hash_file, wav_path))
+                    filename = wav_name
+            except Exception as e:
+                success = False
+                error_message = f"Conversion failed: {e}"
+            finally:
+                if os.path.exists(save_path):
+                    os.remove(save_path)
+        
+        if success and convert:
+            Log.success(f"Download completed: {filename} (converted)")
+            response = self._reply(Commands.OK, message=f"Downloaded {filename} (converted)", token=token, filename=filename)
+        elif success:
+            Log.success(f"Download completed: {filename}")
+            response = self._reply(Commands.OK, message=f"Downloaded {filename}", token=token)
+        else:
+            Log.error(f"Download failed: {filename} ({error_message})")
+            response = self._reply(Commands.ERROR, message=error_message, token=token)
+        
+        await self.ws_client.send(response)
+
+    async def _handle_bundle_token(self, kwargs: dict):
+        token = kwargs.get('token')
+        count = int(kwargs.get('count', 0))
+        
+        if not token:
+            error = self._reply(Commands.ERROR, "Missing token")
+            await self.ws_client.send(error)
+            return
+        
+        Log.file(f"Received bundle token for {count} file(s)")
+        
+        def progress(bytes_received, total):
+            if total > 1024 * 1024:
+                Log.progress_bar(bytes_received, total, prefix='Receiving bundle:', suffix='Complete', style='yellow', icon='FILE', auto_clear=(bytes_received == total))
+        
+        extracted, errors = await self.http_client.download_bundle(
             server_host=self.http_host,
             server_port=self.http_port,
             token=token,
-            save_path=save_path,
+            dest_dir=self.upload_dir,
             progress_callback=progress
         )
         
-        if success:
-            Log.success(f"Download completed: {filename}")
-            response = ProtocolParser.build_response(Commands.OK, f"Downloaded {filename}")
+        # every entry was hashed while extracted
+        for filename, sha256 in extracted:
+            self.file_index.update(filename, sha256)
+        
+        if errors:
+            Log.error(f"Bundle: {len(extracted)}/{count} files extracted ({errors[0]})")
+            response = self._reply(Commands.ERROR, message=f"{len(extracted)}/{count} files extracted: {errors[0]}", token=token)
         else:
-            Log.error(f"Download failed: {filename}")
-            response = ProtocolParser.build_response(Commands.ERROR, "Download failed")
+            Log.success(f"Bundle: {len(extracted)} files extracted")
+            response = self._reply(Commands.OK, message=f"Extracted {len(extracted)} files", token=token)
         
         await self.ws_client.send(response)
 
+    async def _handle_peer_offer(self, kwargs: dict):
+        # the server wants us to serve one of our files to another client
+        filename = kwargs.get('filename')
+        
+        try:
+            if not self.peer_port:
+                raise ValueError("Peer distribution is disabled on this client")
+            
+            filename = PathValidator.sanitize_filename(filename)
+            file_path = PathValidator.safe_join(self.upload_dir, filename)
+            
+            if not os.path.isfile(file_path):
+                raise ValueError(f"File not found: {filename}")
+            
+            await self._ensure_peer_server()
+            
+            token = self.peer_server.create_download_token(file_path)
+            self.peer_last_used = time.time()
+            
+            response = self._reply(Commands.PEER_TOKEN, token=token, port=self.peer_port)
+            Log.file(f"Serving {filename} to a peer")
+        
+        except Exception as e:
+            Log.error(f"Peer offer failed: {e}")
+            response = self._reply(Commands.ERROR, message=str(e))
+        
+        await self.ws_client.send(response)
+
+    async def _ensure_peer_server(self):
+        if self.peer_server:
+            return
+        
+        cert_pem, key_pem = gen_cert()
+        cert_path, key_path = save_cert(cert_pem, key_pem)
+        
+        ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ssl_context.load_cert_chain(cert_path, key_path)
+        
+        self.peer_server = BWHTTPFileServer(
+            host='0.0.0.0',
+            port=self.peer_port,
+            ssl_context=ssl_context,
+            upload_dir=self.upload_dir
+        )
+        
+        await self.peer_server.start()
+        asyncio.create_task(self._peer_idle_watch())
+
+    async def _peer_idle_watch(self):
+        # the endpoint only lives while peers are using it
+        while self.peer_server:
+            await asyncio.sleep(10)
+            
+            if self.peer_server.download_tokens or time.time() - self.peer_last_used < PEER_IDLE_TIMEOUT:
+                continue
+            
+            await self._stop_peer_server()
+
+    async def _stop_peer_server(self):
+        if self.peer_server:
+            peer_server = self.peer_server
+            self.peer_server = None
+            await peer_server.stop()
+            Log.file("Peer endpoint closed")
+
     async def _handle_download_url(self, kwargs: dict):
         url = kwargs.get('url')
         filename = kwargs.get('filename')
         
         if not url or not filename:
-            error = ProtocolParser.build_response(Commands.ERROR, "Missing URL or filename")
+            error = self._reply(Commands.ERROR, "Missing URL or filename")
             await self.ws_client.send(error)
             return
         
@@ -336,7 +787,7 @@ class BotWaveClient:
             filepath = PathValidator.safe_join(self.upload_dir, filename)
         except SecurityError as e:
             Log.error(f"Invalid filename from server: {e}")
-            error = ProtocolParser.build_response(Commands.ERROR, "Provided filename raised a security violation")
+            error = self._reply(Commands.ERROR, "Provided filename raised a security violation")
             await self.ws_client.send(error)
             return
 
@@ -347,14 +798,7 @@ class BotWaveClient:
             Log.file(f"Downloading from URL: {url}")
 
             def download_with_progress(dest_path):
-                headers = {
-                    "User-Agent": f"BotWaveDownloads/{PROTOCOL_VERSION} (+https://github.com/dpipstudio/botwave/)"
-                }
-
-                request = urllib.request.Request(url, headers=headers)
-
-                with urllib.request.urlopen(request) as response, open(dest_path, "wb") as out_file:
-                    out_file.write(response.read())
+                return download(url, dest_path, progress_callback=progress_bar(filename))
 
             loop = asyncio.get_event_loop()
 
@@ -362,6 +806,20 @@ class BotWaveClient:
             if ext == "wav":
                 await loop.run_in_executor(None, download_with_progress, filepath)
 
+            # streamable = decode while downloading, no compressed copy on disk
+            elif Converter.can_stream(ext):
+                label = filename
+                filepath = os.path.splitext(filepath)[0] + ".wav"
+                filename = os.path.splitext(filename)[0] + ".wav"
+
+                def download_and_convert():
+                    chunks = stream(url, progress_callback=progress_bar(label))
+                    Converter.convert_wav_stream(chunks, filepath, not self.silent)
+
+                await loop.run_in_executor(None, download_and_convert)
+                converted = True
+
+            # other containers may need seeking, download first
             elif ext in SUPPORTED_EXTENSIONS:
                 filepath = os.path.splitext(filepath)[0] + ".wav"
                 filename = os.path.splitext(filename)[0] + ".wav"
@@ -371,7 +829,7 @@ class BotWaveClient:
 
                 try:
                     await loop.run_in_executor(None, download_with_progress, tmp_path)
-                    Converter.convert_wav(tmp_path, filepath, not self.silent)
+                    await Converter.convert_wav_async(tmp_path, filepath, not self.silent)
                 finally:
                     converted = True
                     if os.path.exists(tmp_path):
@@ -383,19 +841,19 @@ class BotWaveClient:
 
             if os.path.exists(filepath):
                 file_size = os.path.getsize(filepath)
-                Log.success(f"Downloaded: {filename} ({file_size if file_size > 0 else '?'} bytes{", converted" if converted else ""})")
-                response = ProtocolParser.build_response(Commands.OK, f"Downloaded {filename}{" (converted)" if converted else ""}")
+                Log.success(f"Downloaded: {filename} ({file_size if file_size > 0 else '?'} bytes{', converted' if converted else ''})")
+                response = self._reply(Commands.OK, f"Downloaded {filename}{' (converted)' if converted else ''}")
             else:
                 Log.error("Download failed: file not created")
-                response = ProtocolParser.build_response(Commands.ERROR, "File not created")
+                response = self._reply(Commands.ERROR, "File not created")
 
-        except urllib.error.URLError as e:
+        except DownloadError as e:
             Log.error(f"Network error: {e}")
-            response = ProtocolParser.build_response(Commands.ERROR, f"Network error: {str(e)}")
+            response = self._reply(Commands.ERROR, f"Network error: {str(e)}")
 
         except Exception as e:
             Log.error(f"Download failed: {e}")
-            response = ProtocolParser.build_response(Commands.ERROR, f"Error: {str(e)}")
+            response = self._reply(Commands.ERROR, f"Error: {str(e)}")
 
         await self.ws_client.send(response)
 
@@ -403,7 +861,7 @@ class BotWaveClient:
         filename = kwargs.get('filename')
 
         if not filename:
-            response = ProtocolParser.build_response(Commands.ERROR, "Missing filename")
+            response = self._reply(Commands.ERROR, "Missing filename")
             await self.ws_client.send(response)
             return
         
@@ -412,12 +870,12 @@ class BotWaveClient:
             file_path = PathValidator.safe_join(self.upload_dir, filename)
         except SecurityError as e:
             Log.error(f"Invalid filename from server: {e}")
-            response = ProtocolParser.build_response(Commands.ERROR, "Provided filename raised a security violation")
+            response = self._reply(Commands.ERROR, "Provided filename raised a security violation")
             await self.ws_client.send(response)
             return
 
         if not os.path.exists(file_path):
-            response = ProtocolParser.build_response(Commands.END, f"File not found: {filename}")
+            response = self._reply(Commands.END, f"File not found: {filename}")
             await self.ws_client.send(response)
             return
         
@@ -440,7 +898,7 @@ class BotWaveClient:
                     file_path, filename, frequency, ps, rt, pi, loop, delay
                 ))
                 
-                response = ProtocolParser.build_response(Commands.OK, f"Scheduled in {delay:.2f}s")
+                response = self._reply(Commands.OK, f"Scheduled in {delay:.2f}s")
                 await self.ws_client.send(response)
                 return
         
@@ -448,9 +906,9 @@ class BotWaveClient:
         started = await self._start_broadcast(file_path, filename, frequency, ps, rt, pi, loop)
 
         if isinstance(started, Exception):
-            response = ProtocolParser.build_response(Commands.ERROR, message=str(started));
+            response = self._reply(Commands.ERROR, message=str(started));
         else:
-            response = ProtocolParser.build_response(Commands.OK, "Broadcast started")
+            response = self._reply(Commands.OK, "Broadcast started")
 
         await self.ws_client.send(response)
 
@@ -466,7 +924,7 @@ class BotWaveClient:
         pi = kwargs.get('pi', 'FFFF')
         
         if not token:
-            error = ProtocolParser.build_response(Commands.ERROR, "Missing token")
+            error = self._reply(Commands.ERROR, "Missing token")
             await self.ws_client.send(error)
             return
         
@@ -475,9 +933,9 @@ class BotWaveClient:
         started = await self._start_stream_broadcast(token, rate, channels, frequency, ps, rt, pi)
         
         if isinstance(started, Exception):
-            response = ProtocolParser.build_response(Commands.ERROR, message=str(started))
+            response = self._reply(Commands.ERROR, message=str(started))
         else:
-            response = ProtocolParser.build_response(Commands.OK, "Stream broadcast started")
+            response = self._reply(Commands.OK, "Stream broadcast started")
         
         await self.ws_client.send(response)
 
@@ -530,6 +988,9 @@ class BotWaveClient:
                 
                 self.broadcasting = True
                 self.current_file = f"stream:{token[:8]}"
+                self.broadcast_frequency = frequency
+                self.broadcast_started = time.monotonic()
+                self._notify_status()
                 
                 self.stream_task = stream_task
                 
@@ -559,9 +1020,9 @@ class BotWaveClient:
         started = await self._start_broadcast(file_path, filename, frequency, ps, rt, pi, loop)
 
         if isinstance(started, Exception):
-            response = ProtocolParser.build_response(Commands.ERROR, message=str(started));
+            response = self._reply(Commands.ERROR, message=str(started));
         else:
-            response = ProtocolParser.build_response(Commands.OK, "Broadcast started")
+            response = self._reply(Commands.OK, "Broadcast started")
 
         await self.ws_client.send(response)
 
@@ -575,7 +1036,12 @@ class BotWaveClient:
                     Commands.END,
                     filename=filename
                 )
-                await self.ws_client.send(response)
+                
+                # sent once reconnected, so the queue still moves on
+                if self.ws_client.connected:
+                    await self.ws_client.send(response)
+                else:
+                    self.pending_end = response
             except Exception as e:
                 Log.error(f"Error notifying server of broadcast end: {e}")
 
@@ -601,6 +1067,11 @@ class BotWaveClient:
 
                 self.broadcasting = True
                 self.current_file = filename
+                self.broadcast_frequency = frequency
+                self.broadcast_started = time.monotonic()
+                self.broadcast_duration = Converter.wav_duration(file_path)
+                self.broadcast_loop = bool(loop)
+                self._notify_status()
 
                 if not loop:
                     self.piwave_monitor.start(self.piwave, finished, asyncio.get_event_loop())
@@ -645,6 +1116,11 @@ class BotWaveClient:
             
             self.broadcasting = False
             self.current_file = None
+            self.broadcast_frequency = None
+            self.broadcast_started = None
+            self.broadcast_duration = None
+            self.broadcast_loop = False
+            self._notify_status()
 
         if acquire_lock:
             async with self.broadcast_lock:
@@ -652,41 +1128,88 @@ class BotWaveClient:
         else:
             await _cleanup()
 
-    async def _handle_list_files(self):
+    async def _handle_list_files(self, kwargs: dict):
+        # hashes=true adds sha256 (used for delta syncs), they are cached
+        # in the file index so only new or modified files get hashed
+        # optional: pattern= (glob), since= (unix time, modified after),
+        # offset= / limit= (one page, next= gives the following offset)
+        # and compact=true (arrays in the order of fields= instead of objects)
+        with_hashes = kwargs.get('hashes', 'false').lower() == 'true'
+        compact = kwargs.get('compact', 'false').lower() == 'true'
+        pattern = kwargs.get('pattern')
+        
         try:
+            since = float(kwargs['since']) * 1e9 if kwargs.get('since') else None
+            offset = max(0, int(kwargs.get('offset') or 0))
+            limit = int(kwargs['limit']) if kwargs.get('limit') else None
+            
+            loop = asyncio.get_event_loop()
+            
+            def listing():
+                # filter and page first, so only the files sent get hashed
+                entries = self.file_index.scan()
+                
+                if pattern:
+                    entries = [entry for entry in entries if fnmatch.fnmatch(entry['name'], pattern)]
+                if since:
+                    entries = [entry for entry in entries if entry['mtime'] >= since]
+                
+                page = entries[offset:offset + limit] if limit else entries[offset:]
+                
+                if with_hashes:
+                    page = [self.file_index.get(entry['name']) or entry for entry in page]
+                
+                return page, len(entries)
+            
+            entries, total = await loop.run_in_executor(None, listing)
+            
             wav_files = []
             
-            for filename in os.listdir(self.upload_dir):
-                if filename.lower().endswith('.wav'):
-                    file_path = os.path.join(self.upload_dir, filename)
-                    if os.path.isfile(file_path):
-                        stat_info = os.stat(file_path)
-                        wav_files.append({
-                            'name': filename,
-                            'size': stat_info.st_size,
-                            'modified': datetime.fromtimestamp(stat_info.st_mtime).isoformat()
-                        })
+            for entry in entries:
+                file_info = {
+                    'name': entry['name'],
+                    'size': entry['size'],
+                    'modified': datetime.fromtimestamp(entry['mtime'] / 1e9).isoformat()
+                }
+                
+                if with_hashes:
+                    file_info['sha256'] = entry['sha256']
+                
+                wav_files.append(file_info)
             
-            wav_files.sort(key=lambda x: x['name'])
+            extra = {}
+            end = offset + len(wav_files)
+            
+            if end < total:
+                extra['next'] = end
+            
+            if compact:
+                fields = ['name', 'size', 'modified'] + (['sha256'] if with_hashes else [])
+                extra['fields'] = ','.join(fields)
+                files = json.dumps(pack_entries(wav_files, fields), separators=(',', ':'))
+            else:
+                files = json.dumps(wav_files)
             
-            response = ProtocolParser.build_command(
+            response = self._reply(
                 Commands.OK,
-                message=f"Found {len(wav_files)} files",
-                files=json.dumps(wav_files)
+                message=f"Found {total} files",
+                files=files,
+                total=total,
+                **extra
             )
             
             await self.ws_client.send(response)
-            Log.file(f"Listed {len(wav_files)} files")
+            Log.file(f"Listed {len(wav_files)}/{total} files")
             
         except Exception as e:
-            error = ProtocolParser.build_response(Commands.ERROR, str(e))
+            error = self._reply(Commands.ERROR, str(e))
             await self.ws_client.send(error)
 
     async def _handle_remove_file(self, kwargs: dict):
         filename = kwargs.get('filename')
         
         if not filename:
-            response = ProtocolParser.build_response(Commands.ERROR, "Missing filename")
+            response = self._reply(Commands.ERROR, "Missing filename")
             await self.ws_client.send(response)
             return
         
@@ -699,46 +1222,47 @@ class BotWaveClient:
                         removed += 1
                 
                 Log.success(f"Removed {removed} files")
-                response = ProtocolParser.build_response(Commands.OK, f"Removed {removed} files")
+                response = self._reply(Commands.OK, f"Removed {removed} files")
             else:
                 try:
                     filename = PathValidator.sanitize_filename(filename)
                     file_path = PathValidator.safe_join(self.upload_dir, filename)
                 except SecurityError as e:
                     Log.error(f"Security violation in remove: {e}")
-                    response = ProtocolParser.build_response(Commands.ERROR, "Provided filename raised a security violation")
+                    response = self._reply(Commands.ERROR, "Provided filename raised a security violation")
                     await self.ws_client.send(response)
                     return
                 
                 if not os.path.exists(file_path):
-                    response = ProtocolParser.build_response(Commands.ERROR, "File not found")
+                    response = self._reply(Commands.ERROR, "File not found")
                 else:
                     os.remove(file_path)
+                    self.file_index.remove(filename)
                     Log.success(f"Removed: {filename}")
-                    response = ProtocolParser.build_response(Commands.OK, f"Removed {filename}")
+                    response = self._reply(Commands.OK, f"Removed {filename}")
             
             await self.ws_client.send(response)
             
         except Exception as e:
-            error = ProtocolParser.build_response(Commands.ERROR, str(e))
+            error = self._reply(Commands.ERROR, str(e))
             await self.ws_client.send(error)
 
 
     async def _handle_stop_broadcast(self):
         try:
             if not self.broadcasting:
-                response = ProtocolParser.build_response(Commands.ERROR, "No broadcast running")
+                response = self._reply(Commands.ERROR, "No broadcast running")
                 await self.ws_client.send(response)
                 return
             
             await self._stop_broadcast()
             
-            response = ProtocolParser.build_response(Commands.OK, "Broadcast stopped")
+            response = self._reply(Commands.OK, "Broadcast stopped")
             await self.ws_client.send(response)
             
         except Exception as e:
             Log.error(f"Stop error: {e}")
-            error = ProtocolParser.build_response(Commands.ERROR, str(e))
+            error = self._reply(Commands.ERROR, str(e))
             await self.ws_client.send(error)
 
     async def stop(self):
@@ -753,6 +1277,21 @@ class BotWaveClient:
         if self.piwave:
             self.piwave.cleanup()
         
+        await self._stop_peer_server()
+        
+        if self.index_watcher:
+            self.index_watcher.stop()
+        
+        if self.status_task:
+            self.status_task.cancel()
+            self.status_task = None
+        
+        for task in list(self.handler_tasks):
+            task.cancel()
+        
+        if self.http_client:
+            await self.http_client.close()
+        
         if self.ws_client:
             await self.ws_client.disconnect()
         
@@ -773,6 +1312,8 @@ def main():
     parser.add_argument('--pk', help='Passkey for authentication')
     parser.add_argument('--skip-checks', action='store_true', help='Skip update and requirements checks')
     parser.add_argument('--talk', action='store_true', help='Makes PiWave (broadcast manager) output logs visible.')
+    parser.add_argument('--peer-port', type=int, help='Port used to serve files to other clients when the server asks for it (disabled by default)')
+    parser.add_argument('--http-connections', type=int, default=4, help='Kept-alive HTTPS connections per file server')
     args = parser.parse_args()
     
     if not args.server_host:
@@ -798,7 +1339,9 @@ def main():
         http_host=args.fhost,
         upload_dir=args.upload_dir,
         passkey=args.pk,
-        talk=args.talk
+        talk=args.talk,
+        peer_port=args.peer_port,
+        http_connections=args.http_connections
     )
     
     try:
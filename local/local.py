@@ -20,7 +20,6 @@ import sys
 import time
 import tempfile
 import urllib.parse
-import urllib.request
 
 # using this to access to the shared dir files
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -28,10 +27,10 @@ from shared.alsa import Alsa
 from shared.bw_custom import BWCustom
 from shared.cat import check
 from shared.converter import Converter, ConvertError, SUPPORTED_EXTENSIONS
+from shared.downloader import download, stream, progress_bar, DownloadError
 from shared.handlers import HandlerExecutor
 from shared.logger import Log, toggle_input
 from shared.morser import text_to_morse
-from shared.protocol import PROTOCOL_VERSION
 from shared.pw_monitor import PWM
 from shared.queue import Queue
 from shared.security import PathValidator, SecurityError
@@ -441,19 +440,7 @@ class BotWaveCLI:
 
 
     def download_file(self, url: str, dest_name: str):
-        def _download_reporthook(block_num, block_size, total_size):
-            downloaded = block_num * block_size
-            if total_size > 0:
-                Log.progress_bar(downloaded, total_size, prefix='Downloading:', suffix='Complete', style='yellow', icon='FILE', auto_clear=False )
-
-            if downloaded >= total_size:
-                Log.progress_bar(total_size, total_size, prefix='Downloaded!', suffix='Complete', style='yellow', icon='FILE' )
-
         try:
-            headers = {
-                "User-Agent": f"BotWaveDownloads/{PROTOCOL_VERSION} (+https://github.com/dpipstudio/botwave/)"
-            }
-
             if not dest_name:
                 url_path = urllib.parse.urlparse(url).path
                 dest_name = os.path.basename(url_path)
@@ -475,13 +462,20 @@ class BotWaveCLI:
             # already wav = download directly
             if ext == "wav":
                 Log.file(f"Downloading WAV file from {url}...")
-                opener = urllib.request.build_opener()
-                opener.addheaders = [(k, v) for k, v in headers.items()]
-                urllib.request.install_opener(opener)
-                urllib.request.urlretrieve(url, final_path, reporthook=_download_reporthook)
+                download(url, final_path, progress_callback=progress_bar(final_name))
                 Log.success(f"File {final_name} downloaded successfully to {final_path}")
                 return True
 
+            # streamable = pipe the download straight into ffmpeg
+            if Converter.can_stream(ext):
+                Log.file(f"Downloading {ext.upper()} file and converting to WAV...")
+
+                chunks = stream(url, progress_callback=progress_bar(dest_name))
+                Converter.convert_wav_stream(chunks, final_path, not self.silent)
+
+                Log.success(f"File converted and saved to {final_path}")
+                return True
+
             # supported but not wav = temp download + convert
             if ext in SUPPORTED_EXTENSIONS:
                 Log.file(f"Downloading {ext.upper()} file and converting to WAV...")
@@ -489,14 +483,12 @@ class BotWaveCLI:
                 with tempfile.NamedTemporaryFile(delete=False, suffix="." + ext) as tmp:
                     tmp_path = tmp.name
 
-                opener = urllib.request.build_opener()
-                opener.addheaders = [(k, v) for k, v in headers.items()]
-                urllib.request.install_opener(opener)
-                urllib.request.urlretrieve(url, tmp_path, reporthook=_download_reporthook)
-
-                Converter.convert_wav(tmp_path, final_path, not self.silent)
-
-                os.unlink(tmp_path)
+                try:
+                    download(url, tmp_path, progress_callback=progress_bar(dest_name))
+                    Converter.convert_wav(tmp_path, final_path, not self.silent)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.unlink(tmp_path)
 
                 Log.success(f"File converted and saved to {final_path}")
                 return True
@@ -504,7 +496,7 @@ class BotWaveCLI:
             Log.error(f"Unsupported file type: .{ext}")
             return False
 
-        except (ConvertError, OSError, urllib.error.URLError) as e:
+        except (ConvertError, DownloadError, OSError) as e:
             Log.error(f"Download error: {e}")
             return False
         
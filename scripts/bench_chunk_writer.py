@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# benchmark: cpu time per MB received, ChunkWriter (coalesced 1MB writes
+# from one thread, preallocated, fsynced on close) vs aiofiles writing
+# each 64KB chunk as it arrives.
+#
+#   python3 scripts/bench_chunk_writer.py [--size-mb 256] [--dir /opt/BotWave/uploads]
+#
+# run it with --dir on the disk you care about (e.g. the sd card), tmpfs
+# hides most of the difference.
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import aiofiles
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.http import CHUNK_SIZE, ChunkWriter
+
+
+async def chunk_writer(path: str, chunk: bytes, count: int):
+    async with ChunkWriter(path, len(chunk) * count) as f:
+        for _ in range(count):
+            await f.write(chunk)
+
+
+async def aiofiles_writer(path: str, chunk: bytes, count: int):
+    async with aiofiles.open(path, 'wb') as f:
+        for _ in range(count):
+            await f.write(chunk)
+
+
+def measure(writer, directory: str, size_mb: int):
+    chunk = os.urandom(CHUNK_SIZE)
+    count = size_mb * 1024 * 1024 // CHUNK_SIZE
+    path = os.path.join(directory, ".bench_chunk_writer")
+
+    try:
+        # process_time counts every thread, so executor work is included
+        cpu, wall = time.process_time(), time.perf_counter()
+        asyncio.run(writer(path, chunk, count))
+        return time.process_time() - cpu, time.perf_counter() - wall
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cpu time per MB of the receive-side file writers')
+    parser.add_argument('--size-mb', type=int, default=256, help='Bytes written per run, in MB')
+    parser.add_argument('--dir', default=tempfile.gettempdir(), help='Directory to write to')
+    args = parser.parse_args()
+
+    for label, writer in (("aiofiles", aiofiles_writer), ("ChunkWriter", chunk_writer)):
+        cpu, wall = measure(writer, args.dir, args.size_mb)
+        print(f"{label:>11}: {cpu / args.size_mb * 1000:.2f} ms cpu/MB, {args.size_mb / wall:.0f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# benchmark: repeated small transfers through one pooled BWHTTPFileClient
+# (connections kept alive) vs a fresh client per transfer (tcp + tls
+# handshake each time), against a local BWHTTPFileServer.
+#
+#   python3 scripts/bench_http_sessions.py [--files 200] [--size 65536]
+
+import argparse
+import asyncio
+import os
+import ssl
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.http import BWHTTPFileClient, BWHTTPFileServer
+from shared.logger import Log
+from shared.tls import gen_cert, save_cert
+
+
+def client_context() -> ssl.SSLContext:
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+async def download_all(server: BWHTTPFileServer, port: int, source: str, dest: str, files: int, pooled: bool) -> float:
+    pool = BWHTTPFileClient(client_context()) if pooled else None
+    start = time.perf_counter()
+
+    try:
+        for index in range(files):
+            client = pool or BWHTTPFileClient(client_context())
+            token = server.create_download_token(source)
+
+            try:
+                if not await client.download_file("127.0.0.1", port, token, os.path.join(dest, f"{index}.wav")):
+                    raise RuntimeError("download failed")
+            finally:
+                if not pooled:
+                    await client.close()
+
+        return time.perf_counter() - start
+    finally:
+        if pool:
+            await pool.close()
+
+
+async def run(files: int, size: int, port: int):
+    cert_path, key_path = save_cert(*gen_cert())
+    server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_context.load_cert_chain(cert_path, key_path)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        source = os.path.join(workdir, "source.wav")
+        with open(source, 'wb') as f:
+            f.write(os.urandom(size))
+
+        server = BWHTTPFileServer("127.0.0.1", port, server_context, os.path.join(workdir, "uploads"))
+        await server.start()
+
+        try:
+            for pooled in (False, True):
+                dest = tempfile.mkdtemp(dir=workdir)
+                elapsed = await download_all(server, port, source, dest, files, pooled)
+                label = "pooled session" if pooled else "fresh sessions"
+                print(f"{label:>15}: {files} x {size // 1024}KB in {elapsed:.2f}s ({elapsed / files * 1000:.1f} ms/file)")
+        finally:
+            await server.stop()
+            os.remove(cert_path)
+            os.remove(key_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare pooled and fresh http sessions on small transfers')
+    parser.add_argument('--files', type=int, default=200, help='Transfers per run')
+    parser.add_argument('--size', type=int, default=64 * 1024, help='File size in bytes')
+    parser.add_argument('--port', type=int, default=9931, help='Local port for the benchmark server')
+    args = parser.parse_args()
+
+    Log.print = lambda *a, **k: None # keep the output to the results
+    asyncio.run(run(args.files, args.size, args.port))
+
+
+if __name__ == '__main__':
+    main()
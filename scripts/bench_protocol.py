@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# benchmark: parsing a LIST_FILES reply (the one large protocol message)
+# with shlex.split vs the protocol tokenizer, and as json / msgpack frames.
+#
+#   python3 scripts/bench_protocol.py [--files 5000] [--runs 5]
+
+import argparse
+import json
+import os
+import shlex
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.protocol import FRAMINGS, ProtocolParser, split
+
+
+def listing(files: int) -> str:
+    entries = [
+        {'name': f"track {index:05}.wav", 'size': 1_000_000 + index, 'modified': "2026-01-01T00:00:00", 'sha256': "ab" * 32}
+        for index in range(files)
+    ]
+    return json.dumps(entries)
+
+
+def best_of(runs: int, func, message) -> float:
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(message)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare protocol parsing speeds on a LIST_FILES reply')
+    parser.add_argument('--files', type=int, default=5000, help='Files in the listing')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per parser, the best one is kept')
+    args = parser.parse_args()
+
+    files = listing(args.files)
+    line = ProtocolParser.build_command('OK', message=f"Found {args.files} files", files=files, total=args.files)
+
+    # same tokens, or the comparison is meaningless
+    assert split(line) == shlex.split(line)
+
+    cases = [
+        ("shlex.split", shlex.split, line),
+        ("text", ProtocolParser.parse_command, line),
+    ]
+
+    for framing in FRAMINGS:
+        if framing != 'text':
+            frame = ProtocolParser.build_frame(framing, 'OK', message=f"Found {args.files} files", files=files, total=args.files)
+            cases.append((framing, ProtocolParser.parse_command, frame))
+
+    print(f"LIST_FILES reply, {args.files} files ({len(line) // 1024}KB as text)")
+
+    for label, func, message in cases:
+        print(f"{label:>12}: {best_of(args.runs, func, message) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
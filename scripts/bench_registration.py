@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# benchmark: registration of many clients reconnecting at once (a server
+# restart), one HELLO message vs REGISTER / AUTH / VER, against a local
+# BWWebSocketServer driving BotWaveServer's registration.
+#
+#   python3 scripts/bench_registration.py [--clients 200] [--rounds 3]
+#
+# "setup" is the time from the open websocket to REGISTER_OK, the tls
+# handshake before it is the same for both.
+
+import argparse
+import asyncio
+import os
+import ssl
+import statistics
+import sys
+import tempfile
+import time
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.server import BotWaveServer
+from shared.logger import Log
+from shared.protocol import FRAMINGS, PROTOCOL_VERSION, Commands, ProtocolParser
+from shared.socket import BWWebSocketServer
+from shared.tls import gen_cert, save_cert
+
+PASSKEY = "bench"
+
+
+def client_context() -> ssl.SSLContext:
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def registration(index: int, legacy: bool) -> list:
+    # the messages client.py sends
+    machine_info = {'hostname': f"pi{index}", 'machine': 'armv7l', 'system': 'Linux', 'release': '6.1', 'bundle': 'true'}
+
+    if not legacy:
+        return [ProtocolParser.build_command(Commands.HELLO, version=PROTOCOL_VERSION, framing=','.join(FRAMINGS), passkey=PASSKEY, **machine_info)]
+
+    return [
+        ProtocolParser.build_command(Commands.REGISTER, **machine_info),
+        ProtocolParser.build_command(Commands.AUTH, PASSKEY),
+        ProtocolParser.build_command(Commands.VER, PROTOCOL_VERSION, framing=','.join(FRAMINGS))
+    ]
+
+
+async def register(port: int, index: int, legacy: bool, context: ssl.SSLContext) -> float:
+    async with websockets.connect(f"wss://127.0.0.1:{port}", ssl=context) as websocket:
+        start = time.perf_counter()
+
+        for message in registration(index, legacy):
+            await websocket.send(message)
+
+        reply = ProtocolParser.parse_command(await websocket.recv())
+        if reply['command'] != Commands.REGISTER_OK:
+            raise RuntimeError(f"registration refused: {reply}")
+
+        return time.perf_counter() - start
+
+
+async def herd(server: BotWaveServer, port: int, clients: int, legacy: bool):
+    context = client_context()
+    start = time.perf_counter()
+    setups = await asyncio.gather(*[register(port, index, legacy, context) for index in range(clients)])
+    elapsed = time.perf_counter() - start
+
+    # every client is gone before the next round
+    while server.clients:
+        await asyncio.sleep(0.01)
+
+    return elapsed, setups
+
+
+async def run(clients: int, rounds: int, port: int):
+    cert_path, key_path = save_cert(*gen_cert())
+    server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_context.load_cert_chain(cert_path, key_path)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server = BotWaveServer(host="127.0.0.1", ws_port=port, passkey=PASSKEY, handlers_dir=workdir, upload_dir=os.path.join(workdir, "uploads"), cache_dir=os.path.join(workdir, "cache"))
+        server.onconnect_handlers = lambda *a: None
+        server.ondisconnect_handlers = lambda *a: None
+
+        server.ws_server = BWWebSocketServer(
+            host="127.0.0.1",
+            port=port,
+            ssl_context=server_context,
+            on_message_callback=server._handle_client_message,
+            on_connect_callback=server._handle_client_connect,
+            on_disconnect_callback=server._handle_client_disconnect
+        )
+        await server.ws_server.start()
+
+        try:
+            for legacy in (True, False):
+                label = "REGISTER/AUTH/VER" if legacy else "HELLO"
+                best, setups = None, []
+
+                for _ in range(rounds):
+                    elapsed, round_setups = await herd(server, port, clients, legacy)
+                    best = elapsed if best is None else min(best, elapsed)
+                    setups.extend(round_setups)
+
+                print(f"{label:>17}: {clients / best:.0f} registrations/s, setup median {statistics.median(setups) * 1000:.1f} ms, p95 {sorted(setups)[int(len(setups) * 0.95)] * 1000:.1f} ms")
+        finally:
+            await server.ws_server.stop()
+            os.remove(cert_path)
+            os.remove(key_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare HELLO and REGISTER/AUTH/VER registration of many clients at once')
+    parser.add_argument('--clients', type=int, default=200, help='Clients registering at once')
+    parser.add_argument('--rounds', type=int, default=3, help='Runs per handshake, the fastest one is kept')
+    parser.add_argument('--port', type=int, default=9932, help='Local port for the benchmark server')
+    args = parser.parse_args()
+
+    Log.print = lambda *a, **k: None # keep the output to the results
+    asyncio.run(run(args.clients, args.rounds, args.port))
+
+
+if __name__ == '__main__':
+    main()
@@ -544,6 +544,27 @@ install_requirements() {
     done <<< "$req_list"
 }
 
+install_optional_requirements() {
+    # nice to have, botwave works without them (e.g. inotify_simple: file
+    # changes are found by polling instead), so a failure is only a warning
+    local section="$1"
+    local install_json="$2"
+    local req_list=$(echo "$install_json" | jq -r ".${section}.optional_requirements[]?" 2>/dev/null)
+
+    if [[ -z "$req_list" ]]; then
+        return 0
+    fi
+
+    log INFO "Installing optional Python requirements for: $section"
+    while IFS= read -r req; do
+        [[ -z "$req" ]] && continue
+        log INFO "  - $req"
+        if ! silent ./venv/bin/pip install "$req"; then
+            log WARN "Could not install $req (optional), continuing without it"
+        fi
+    done <<< "$req_list"
+}
+
 install_binaries() {
     local section="$1"
     local install_json="$2"
@@ -661,6 +682,7 @@ install_components() {
         log INFO "Processing section: $section"
         download_files "$section" "$install_json" "$commit"
         install_requirements "$section" "$install_json"
+        install_optional_requirements "$section" "$install_json"
         install_binaries "$section" "$install_json" "$commit"
     done
 }
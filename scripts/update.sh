@@ -322,6 +322,27 @@ install_requirements() {
     done <<< "$req_list"
 }
 
+install_optional_requirements() {
+    # nice to have, botwave works without them (e.g. inotify_simple: file
+    # changes are found by polling instead), so a failure is only a warning
+    local section="$1"
+    local install_json="$2"
+    local req_list=$(echo "$install_json" | jq -r ".${section}.optional_requirements[]?" 2>/dev/null)
+
+    if [[ -z "$req_list" ]]; then
+        return 0
+    fi
+
+    log INFO "Updating optional Python requirements for: $section"
+    while IFS= read -r req; do
+        [[ -z "$req" ]] && continue
+        log INFO "  - $req"
+        if ! silent ./venv/bin/pip install "$req"; then
+            log WARN "Could not install $req (optional), continuing without it"
+        fi
+    done <<< "$req_list"
+}
+
 update_binaries() {
     local section="$1"
     local install_json="$2"
@@ -570,6 +591,7 @@ update_components() {
         update_backends "$install_json"
         download_files "client" "$install_json" "$commit"
         install_requirements "client" "$install_json"
+        install_optional_requirements "client" "$install_json"
         update_binaries "client" "$install_json" "$commit"
     fi
 
@@ -578,6 +600,7 @@ update_components() {
         log INFO "Updating server components..."
         download_files "server" "$install_json" "$commit"
         install_requirements "server" "$install_json"
+        install_optional_requirements "server" "$install_json"
         update_binaries "server" "$install_json" "$commit"
     fi
 
@@ -585,6 +608,7 @@ update_components() {
     log INFO "Updating common components..."
     download_files "always" "$install_json" "$commit"
     install_requirements "always" "$install_json"
+    install_optional_requirements "always" "$install_json"
     update_binaries "always" "$install_json" "$commit"
 }
 
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# load test: many clients on the websocket control plane, with the clients
+# handled in the main process (--ws-workers 0) and by worker processes.
+# per worker count it measures
+#   - registrations/s, every client connecting (tls) and sending HELLO at once
+#   - client -> server messages/s, every client sending --messages PONGs
+#   - server -> client messages/s, --broadcasts broadcasts to every client
+#
+#   python3 scripts/ws_load_test.py [--clients 400] [--workers 0,1,2,4] [--generators 4]
+#
+# the load comes from --generator processes, give the machine enough cores
+# for them and the workers or the numbers only show the cpu being shared.
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import ssl
+import sys
+import tempfile
+import time
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.server import BotWaveServer
+from shared.logger import Log
+from shared.protocol import PROTOCOL_VERSION, Commands, ProtocolParser
+from shared.socket import BWWebSocketServer
+from shared.tls import gen_cert, save_cert
+from shared.ws_workers import WorkerPool
+
+CONNECT_TIMEOUT = 30 # workers take a moment to start listening
+
+
+def client_context() -> ssl.SSLContext:
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+async def connect(port: int, name: str, context: ssl.SSLContext):
+    deadline = time.monotonic() + CONNECT_TIMEOUT
+
+    while True:
+        try:
+            websocket = await websockets.connect(f"wss://127.0.0.1:{port}", ssl=context, open_timeout=CONNECT_TIMEOUT, ping_interval=None)
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+    await websocket.send(ProtocolParser.build_command(Commands.HELLO, version=PROTOCOL_VERSION, hostname=name))
+    reply = ProtocolParser.parse_command(await websocket.recv())
+
+    if reply['command'] != Commands.REGISTER_OK:
+        raise RuntimeError(f"{name}: registration refused: {reply}")
+
+    return websocket
+
+
+async def load(websocket, messages: int, broadcasts: int):
+    pong = ProtocolParser.build_command(Commands.PONG)
+
+    for _ in range(messages):
+        await websocket.send(pong)
+
+    for _ in range(broadcasts):
+        await websocket.recv()
+
+
+async def generate(index: int, port: int, clients: int, messages: int, broadcasts: int, events, results):
+    context = client_context()
+    loop = asyncio.get_running_loop()
+    websockets_ = await asyncio.gather(*[connect(port, f"load{index}-{n}", context) for n in range(clients)])
+    results.put(('registered', index))
+
+    await loop.run_in_executor(None, events['start'].wait)
+    await asyncio.gather(*[load(websocket, messages, broadcasts) for websocket in websockets_])
+    results.put(('done', index))
+
+    await loop.run_in_executor(None, events['stop'].wait)
+    await asyncio.gather(*[websocket.close() for websocket in websockets_], return_exceptions=True)
+
+
+def run_generator(*args):
+    asyncio.run(generate(*args))
+
+
+async def wait_results(results, kind: str, count: int):
+    loop = asyncio.get_running_loop()
+
+    for _ in range(count):
+        got, index = await loop.run_in_executor(None, results.get)
+        if got != kind:
+            raise RuntimeError(f"generator {index}: expected {kind}, got {got}")
+
+
+async def run(workers: int, clients: int, generators: int, messages: int, broadcasts: int, port: int):
+    cert_path, key_path = save_cert(*gen_cert())
+    server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_context.load_cert_chain(cert_path, key_path)
+    context = multiprocessing.get_context('spawn')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server = BotWaveServer(host="127.0.0.1", ws_port=port, handlers_dir=workdir, upload_dir=os.path.join(workdir, "uploads"), cache_dir=os.path.join(workdir, "cache"))
+        server.onconnect_handlers = lambda *a: None
+        server.ondisconnect_handlers = lambda *a: None
+
+        received = 0
+
+        async def on_message(client_id, message, websocket):
+            nonlocal received
+            if client_id is not None:
+                received += 1
+            await server._handle_client_message(client_id, message, websocket)
+
+        server.ws_server = BWWebSocketServer(
+            host="127.0.0.1",
+            port=port,
+            ssl_context=server_context,
+            on_message_callback=on_message,
+            on_connect_callback=server._handle_client_connect,
+            on_disconnect_callback=server._handle_client_disconnect
+        )
+        pool = WorkerPool(server.ws_server, workers, cert_path, key_path) if workers else None
+
+        if pool:
+            await pool.start()
+        else:
+            await server.ws_server.start()
+
+        events = {'start': context.Event(), 'stop': context.Event()}
+        results = context.Queue()
+        share = [clients // generators + (1 if index < clients % generators else 0) for index in range(generators)]
+        processes = [
+            context.Process(target=run_generator, args=(index, port, share[index], messages, broadcasts, events, results), daemon=True)
+            for index in range(generators)
+        ]
+
+        try:
+            started = time.perf_counter()
+            for process in processes:
+                process.start()
+
+            await wait_results(results, 'registered', generators)
+            registering = time.perf_counter() - started
+
+            if len(server.clients) != clients:
+                raise RuntimeError(f"{len(server.clients)} of {clients} clients registered")
+
+            started = time.perf_counter()
+            events['start'].set()
+
+            while received < clients * messages:
+                await asyncio.sleep(0.005)
+
+            inbound = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for number in range(broadcasts):
+                await server.ws_server.broadcast(ProtocolParser.build_command(Commands.PING, seq=number))
+
+            await wait_results(results, 'done', generators)
+            outbound = time.perf_counter() - started
+
+            dropped = sum(outbox.dropped for outbox in server.ws_server.outboxes.values())
+        finally:
+            events['start'].set()
+            events['stop'].set()
+
+            for process in processes:
+                await asyncio.get_running_loop().run_in_executor(None, process.join, 10)
+                if process.is_alive():
+                    process.terminate()
+
+            await server.ws_server.stop()
+            if pool:
+                await pool.stop()
+
+            os.remove(cert_path)
+            os.remove(key_path)
+
+    return registering, inbound, outbound, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the websocket control plane with and without worker processes')
+    parser.add_argument('--clients', type=int, default=400, help='Connected clients')
+    parser.add_argument('--workers', default='0,1,2,4', help='Worker counts to run, comma separated (0 = main process only)')
+    parser.add_argument('--generators', type=int, default=4, help='Processes generating the client load')
+    parser.add_argument('--messages', type=int, default=50, help='Messages each client sends')
+    parser.add_argument('--broadcasts', type=int, default=50, help='Messages broadcast to every client')
+    parser.add_argument('--port', type=int, default=9933, help='Local port for the test server')
+    args = parser.parse_args()
+
+    Log.print = lambda *a, **k: None # keep the output to the results
+    print(f"{args.clients} clients, {args.generators} generator processes, {os.cpu_count()} cpus")
+
+    for workers in [int(count) for count in args.workers.split(',')]:
+        registering, inbound, outbound, dropped = asyncio.run(run(workers, args.clients, args.generators, args.messages, args.broadcasts, args.port))
+        print(
+            f"{workers} workers: {args.clients / registering:.0f} registrations/s, "
+            f"{args.clients * args.messages / inbound:.0f} msg/s in, "
+            f"{args.clients * args.broadcasts / outbound:.0f} msg/s out"
+            + (f", {dropped} dropped" if dropped else "")
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -11,8 +11,10 @@
 import argparse
 import asyncio
 from datetime import datetime, timezone
+import fnmatch
 import json
 import os
+import secrets
 import shlex
 import sys
 import ssl
@@ -21,25 +23,32 @@ import tempfile
 import time
 import threading
 from typing import Dict, List, Optional
+import urllib.parse
 import uuid
 
 # using this to access to the shared dir files
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from shared.alsa import Alsa
 from shared.cat import check
-from shared.converter import Converter, ConvertError, SUPPORTED_EXTENSIONS
+from shared.converter import ConversionPool, ConvertError, SUPPORTED_EXTENSIONS
+from shared.downloader import DownloadError, progress_bar
+from shared.file_index import hash_file, unpack_entries
+from shared.fleet_index import FleetIndex
 from shared.handlers import HandlerExecutor
-from shared.http import BWHTTPFileServer
+from shared.http import ACK_TIMEOUT, BWHTTPFileServer, TransferError
 from shared.logger import Log, toggle_input
 from shared.morser import text_to_morse
-from shared.protocol import ProtocolParser, Commands, PROTOCOL_VERSION
+from shared.protocol import ProtocolParser, Commands, RPCError, PROTOCOL_VERSION
 from shared.queue import Queue
+from shared.scheduler import TransferScheduler, LIVE_TRANSFER_RATE, PRIORITY_QUEUE, PRIORITY_BACKGROUND
 from shared.security import PathValidator, SecurityError
-from shared.socket import BWWebSocketServer
+from shared.socket import BWWebSocketServer, SEND_CONTROL, SEND_BULK
 from shared.sstv import make_sstv_wav
 from shared.tls import gen_cert, save_cert
+from shared.url_cache import URLCache
 from shared.version import check_for_updates, versions_compatible
 from shared.ws_cmd import WSCMDH
+from shared.ws_workers import WorkerPool
 
 try:
     import readline
@@ -47,6 +56,36 @@ try:
 except:
     HAS_READLINE = False
 
+ALLOWED_SOURCE_DIRS = [
+    "/tmp",
+    "/opt/BotWave",
+    os.path.expanduser("~")
+]
+
+MAX_UPLOAD_SIZE = 500 * 1024 * 1024  # 500 MB
+
+# small files going to the same client are streamed together as bundles
+BUNDLE_MIN_FILES = 4 # below this, per-file tokens are just as good
+BUNDLE_FILE_LIMIT = 16 * 1024 * 1024 # bigger files go one by one (peer fan-out, compressed mode)
+BUNDLE_MAX_FILES = 500
+BUNDLE_MAX_BYTES = 256 * 1024 * 1024
+BUNDLE_FLUSH_FILES = 32 # sync and folder uploads send a batch once this many small files are ready,
+BUNDLE_FLUSH_BYTES = 64 * 1024 * 1024 # or this many bytes, while the rest keeps converting
+
+CONTROL_TIMEOUT = 10 # seconds each client has to acknowledge a control command (start, stop...)
+
+LIST_PAGE_SIZE = 1000 # files per LIST_FILES reply when fetching whole listings
+LIST_DISPLAY_LIMIT = 100 # files shown per client by lf, narrow with a pattern to see others
+
+# what clients that don't echo request ids answer OK with, per command (see _match_legacy_reply)
+LEGACY_REPLIES = {
+    Commands.START: ("Broadcast started", "Stream broadcast started", "Scheduled in"),
+    Commands.STOP: ("Broadcast stopped",),
+    Commands.REMOVE_FILE: ("Removed",),
+}
+
+RESUME_WINDOW = 300 # seconds a disconnected client may resume its session (same id, no onconnect handlers)
+
 class BotWaveClient:
     def __init__(self, client_id: str, websocket, machine_info: dict, protocol_version: str):
         self.client_id = client_id
@@ -56,13 +95,47 @@ class BotWaveClient:
         self.connected_at = datetime.now()
         self.last_seen = datetime.now()
         self.authenticated = True  # alr auth via ws
+        self.ip: Optional[str] = None
+        self.peer_port: Optional[int] = None # set if the client can serve files to peers
+        self.can_convert = False # client has ffmpeg and accepts compressed originals
+        self.can_bundle = False # client can extract bundles
+        self.framing = 'text' # negotiated message framing (see shared.protocol.FRAMINGS)
+        self.status: dict = {} # last STATUS heartbeat, see _apply_status
+        self.status_at: Optional[float] = None # time.monotonic() it was received at
+        self.resume_token: Optional[str] = None
+        self.echoes_rid = False # answered with a request id at least once, see _resolve_rpc
     
     def get_display_name(self) -> str:
         hostname = self.machine_info.get('hostname', 'unknown')
         return f"{hostname} ({self.client_id})"
+    
+    def is_broadcasting(self, filename: str = None) -> bool:
+        # from the cached heartbeat, without asking the client
+        if not self.status.get('broadcasting'):
+            return False
+        return filename is None or self.status.get('file') == filename
+    
+    def playback_position(self) -> Optional[float]:
+        # position of the last heartbeat, moved forward by the time since
+        if not self.is_broadcasting() or self.status.get('position') is None:
+            return None
+        
+        position = self.status['position'] + time.monotonic() - self.status_at
+        
+        # looped file (the client counts loops), wrap like it does
+        if 'loops' in self.status and self.status.get('duration'):
+            position %= self.status['duration']
+        
+        return position
+    
+    def status_stale(self) -> bool:
+        # missed two heartbeats in a row
+        if self.status_at is None:
+            return True
+        return time.monotonic() - self.status_at > 2 * self.status.get('interval', 30)
 
 class BotWaveServer:
-    def __init__(self, host: str = '0.0.0.0', ws_port: int = 9938, http_port: int = 9921, ws_cmd_port: int = None, passkey: str = None, wait_start: bool = True, skip_checks: bool = False, handlers_dir: str = "/opt/BotWave/handlers", upload_dir: str = "/opt/BotWave/uploads"):
+    def __init__(self, host: str = '0.0.0.0', ws_port: int = 9938, http_port: int = 9921, ws_cmd_port: int = None, passkey: str = None, wait_start: bool = True, skip_checks: bool = False, handlers_dir: str = "/opt/BotWave/handlers", upload_dir: str = "/opt/BotWave/uploads", convert_workers: int = None, transfer_workers: int = 4, peer_fanout: int = 0, transcode: str = "server", max_transfers: int = 16, client_transfers: int = 2, transfer_rate: float = 0, live_transfer_rate: float = LIVE_TRANSFER_RATE, dl_mode: str = "client", cache_dir: str = "/opt/BotWave/cache", ws_workers: int = 0):
         self.host = host
         self.ws_port = ws_port
         self.ws_cmd_port = ws_cmd_port
@@ -77,14 +150,25 @@ class BotWaveServer:
         
         # main socket & file transfer
         self.ws_server = None
+        self.ws_pool = None # worker processes accepting websocket clients, if ws_workers
         self.http_server = None
         self.alsa = Alsa()
         
         # state
         self.running = False
-        self.pending_responses: Dict[str, asyncio.Future] = {}
-        self.file_list_responses: Dict[str, list] = {}
+        self.pending_responses: Dict[str, tuple] = {} # rid -> (client_id, command, future), see _rpc
         self.queue = Queue(self)
+        self.converter = ConversionPool(workers=convert_workers)
+        self.source_hashes: Dict[tuple, tuple] = {} # (path, size, mtime) -> (wav size, sha256)
+        self.fleet_index = FleetIndex() # files of each client, pushed by them as they change
+        self.sessions: Dict[str, dict] = {} # resume token -> {'client_id', 'expires'}, see _resume_session
+        self.transfer_workers = max(1, transfer_workers)
+        self.peer_fanout = max(0, peer_fanout) # 0 = peer distribution disabled
+        self.transcode = transcode # where compressed uploads get converted, "server" or "client"
+        self.scheduler = TransferScheduler(max_transfers, client_transfers, transfer_rate, live_transfer_rate) # rates in bytes/s
+        self.dl_mode = dl_mode # who fetches dl urls, "client" (each one) or "server" (once, then uploaded)
+        self.url_cache = URLCache(cache_dir)
+        self.ws_workers = max(0, ws_workers) # 0 = websocket clients handled in this process
         
         self.handlers_executor = HandlerExecutor(handlers_dir, self._execute_command)
         self.loop = None
@@ -111,13 +195,18 @@ class BotWaveServer:
                 on_disconnect_callback=self._handle_client_disconnect
             )
             
-            await self.ws_server.start()
+            if self.ws_workers:
+                self.ws_pool = WorkerPool(self.ws_server, self.ws_workers, cert_path, key_path)
+                await self.ws_pool.start()
+            else:
+                await self.ws_server.start()
             
             self.http_server = BWHTTPFileServer(
                 host=self.host,
                 port=self.http_port,
                 ssl_context=ssl_context,
-                upload_dir=self.upload_dir
+                upload_dir=self.upload_dir,
+                scheduler=self.scheduler
             )
             
             await self.http_server.start()
@@ -153,14 +242,20 @@ class BotWaveServer:
             await self.ws_server.stop()
             Log.server("Main socket stopped")
         
+        if self.ws_pool:
+            await self.ws_pool.stop()
+            Log.server("WebSocket workers stopped")
+        
         if self.http_server:
             await self.http_server.stop()
             Log.server("File transfer (HTTP) server stopped")
         
-        for future in self.pending_responses.values():
+        for _, _, future in self.pending_responses.values():
             if not future.done():
                 future.cancel()
         
+        self.converter.cancel("all")
+        
         self.running = False
         Log.success("Server shutdown complete")
 
@@ -186,6 +281,16 @@ class BotWaveServer:
             client = self.clients[client_id]
             Log.warning(f"Client disconnected: {client.get_display_name()}")
             del self.clients[client_id]
+            self.fleet_index.drop(client_id)
+            
+            # it has a while to come back as the same client
+            if client.resume_token in self.sessions:
+                self.sessions[client.resume_token]['expires'] = time.monotonic() + RESUME_WINDOW
+            
+            for owner, _, future in list(self.pending_responses.values()):
+                if owner == client_id and not future.done():
+                    future.set_exception(RPCError("Client disconnected"))
+            
             self.ondisconnect_handlers()
 
     async def _handle_client_message(self, client_id: Optional[str], message: str, websocket):
@@ -205,32 +310,24 @@ class BotWaveServer:
             if command == Commands.PONG:
                 return
             
+            # replies to _rpc requests are handled by whoever is waiting for them
+            if self._resolve_rpc(client_id, command, kwargs):
+                return
+            
+            if command == Commands.FILES_CHANGED:
+                self._apply_file_changes(client_id, kwargs)
+                return
+            
+            if command == Commands.STATUS:
+                self._apply_status(client_id, kwargs)
+                return
+            
             if command == Commands.OK:
                 msg = kwargs.get('message', 'OK')
-                files_json = kwargs.get('files')
                 
-                if files_json:
-                    try:
-                        files = json.loads(files_json)
-
-                        # store file list for sync operations
-                        self.file_list_responses[client_id] = files
-
-                        if f"{client_id}_files" in self.pending_responses:
-                            self.pending_responses[f"{client_id}_files"].set_result(files)
-                            del self.pending_responses[f"{client_id}_files"]
-                            return
-
-                        for file in files:
-                            Log.file(f"  {file['name']} ({file['size']} bytes)")
-
-                    except Exception as e:
-                        Log.error(f"Error parsing files: {e}")
-                        
-                        if f"{client_id}_files" in self.pending_responses:
-                            self.pending_responses[f"{client_id}_files"].set_exception(e)
-                            del self.pending_responses[f"{client_id}_files"]
-
+                if 'token' in kwargs:
+                    self.http_server.complete_transfer(kwargs['token'], True, msg)
+                
                 Log.success(f"{self.clients[client_id].get_display_name()}: {msg}")
                 return
             
@@ -238,9 +335,8 @@ class BotWaveServer:
                 msg = kwargs.get('message', 'Error')
                 Log.error(f"{self.clients[client_id].get_display_name()}: {msg}")
                 
-                if f"{client_id}_files" in self.pending_responses:
-                    self.pending_responses[f"{client_id}_files"].set_exception(Exception(msg))
-                    del self.pending_responses[f"{client_id}_files"]
+                if 'token' in kwargs:
+                    self.http_server.complete_transfer(kwargs['token'], False, msg)
                 
                 return
             
@@ -263,10 +359,12 @@ class BotWaveServer:
     async def _handle_registration(self, command: str, args: list, kwargs: dict, websocket):
         """        
         sequence:
-        1. Client sends: REGISTER hostname=X machine=Y system=Z release=W
-        2. Client sends: AUTH <passkey> (if server has passkey)
-        3. Client sends: VER <version>
-        4. Server sends: REGISTER_OK client_id=X server_version=Y
+        1. Client sends: HELLO hostname=X machine=Y system=Z release=W version=V [passkey=P] [framing=...] [resume=token]
+        2. Server sends: REGISTER_OK client_id=X server_version=Y
+        
+        older clients register in three messages instead of HELLO:
+        REGISTER hostname=X machine=Y system=Z release=W [resume=token], then
+        AUTH <passkey> (if server has passkey), then VER <version> [framing=...]
         
         OR server sends error and closes connection.
         """
@@ -275,20 +373,27 @@ class BotWaveServer:
             websocket.reg_data = {
                 'machine_info': None,
                 'authenticated': False,
-                'protocol_version': None
+                'protocol_version': None,
+                'peer_port': None,
+                'can_convert': False,
+                'can_bundle': False,
+                'resume': None
             }
         
-        if command == Commands.REGISTER:
-            machine_info = {
-                'hostname': kwargs.get('hostname', 'unknown'),
-                'machine': kwargs.get('machine', 'unknown'),
-                'system': kwargs.get('system', 'unknown'),
-                'release': kwargs.get('release', 'unknown')
-            }
+        if command == Commands.HELLO:
+            self._read_registration(kwargs, websocket.reg_data)
+            
+            if not await self._check_passkey(kwargs.get('passkey'), websocket):
+                return
             
-            websocket.reg_data['machine_info'] = machine_info
+            if not await self._check_version(kwargs.get('version'), kwargs.get('framing', ''), websocket):
+                return
             
-            Log.info(f"Registration attempt from {machine_info['hostname']}")
+            await self._complete_registration(websocket)
+            return
+        
+        if command == Commands.REGISTER:
+            self._read_registration(kwargs, websocket.reg_data)
             
             if not self.passkey:
                 websocket.reg_data['authenticated'] = True
@@ -296,66 +401,13 @@ class BotWaveServer:
             return
         
         elif command == Commands.AUTH:
-            if not self.passkey:
-                websocket.reg_data['authenticated'] = True
-                return
-            
-            if not args:
-                Log.auth("AUTH command missing passkey")
-                error = ProtocolParser.build_response(
-                    Commands.AUTH_FAILED,
-                    "Missing passkey"
-                )
-                await websocket.send(error)
-                await websocket.close()
-                return
-            
-            client_passkey = args[0]
-            
-            if client_passkey != self.passkey:
-                Log.auth(f"Authentication failed: Invalid passkey")
-                error = ProtocolParser.build_response(
-                    Commands.AUTH_FAILED,
-                    "Invalid passkey"
-                )
-                await websocket.send(error)
-                await websocket.close()
-                return
-            
-            websocket.reg_data['authenticated'] = True
-            Log.auth("Client authenticated")
+            await self._check_passkey(args[0] if args else None, websocket)
             return
         
         elif command == Commands.VER:
-            if not args:
-                Log.error("VER command missing version")
-                error = ProtocolParser.build_response(
-                    Commands.ERROR,
-                    "Missing protocol version"
-                )
-                await websocket.send(error)
-                await websocket.close()
-                return
-            
-            client_version = args[0]
-            
-            if not versions_compatible(PROTOCOL_VERSION, client_version):
-                Log.error(f"Protocol version mismatch!")
-                Log.error(f"  Server version: {PROTOCOL_VERSION}")
-                Log.error(f"  Client version: {client_version}")
-                
-                error = ProtocolParser.build_command(
-                    Commands.VERSION_MISMATCH,
-                    server_version=PROTOCOL_VERSION,
-                    client_version=client_version,
-                    message=f"Protocol version mismatch. Please update."
-                )
-                await websocket.send(error)
-                await websocket.close()
+            if not await self._check_version(args[0] if args else None, kwargs.get('framing', ''), websocket):
                 return
             
-            websocket.reg_data['protocol_version'] = client_version
-            
             if (websocket.reg_data['machine_info'] and 
                 websocket.reg_data['authenticated'] and 
                 websocket.reg_data['protocol_version']):
@@ -368,10 +420,93 @@ class BotWaveServer:
             Log.warning(f"Unexpected command during registration: {command}")
             error = ProtocolParser.build_response(
                 Commands.ERROR,
-                f"Expected REGISTER, AUTH, or VER, got {command}"
+                f"Expected HELLO, REGISTER, AUTH, or VER, got {command}"
+            )
+            await websocket.send(error)
+            await websocket.close()
+
+    def _read_registration(self, kwargs: dict, reg_data: dict):
+        # machine info and capabilities of a HELLO / REGISTER
+        machine_info = {
+            'hostname': kwargs.get('hostname', 'unknown'),
+            'machine': kwargs.get('machine', 'unknown'),
+            'system': kwargs.get('system', 'unknown'),
+            'release': kwargs.get('release', 'unknown')
+        }
+        
+        reg_data['machine_info'] = machine_info
+        
+        try:
+            reg_data['peer_port'] = int(kwargs['peer_port']) if kwargs.get('peer_port') else None
+        except ValueError:
+            Log.warning("Ignoring invalid peer_port in registration")
+        
+        reg_data['can_convert'] = kwargs.get('ffmpeg', '').lower() == 'true'
+        reg_data['can_bundle'] = kwargs.get('bundle', '').lower() == 'true'
+        reg_data['resume'] = kwargs.get('resume') or None
+        
+        Log.info(f"Registration attempt from {machine_info['hostname']}")
+
+    async def _check_passkey(self, client_passkey: Optional[str], websocket) -> bool:
+        # refuses and closes the connection on a wrong passkey
+        if not self.passkey:
+            websocket.reg_data['authenticated'] = True
+            return True
+        
+        if not client_passkey:
+            Log.auth("AUTH command missing passkey")
+            error = ProtocolParser.build_response(
+                Commands.AUTH_FAILED,
+                "Missing passkey"
+            )
+            await websocket.send(error)
+            await websocket.close()
+            return False
+        
+        if client_passkey != self.passkey:
+            Log.auth(f"Authentication failed: Invalid passkey")
+            error = ProtocolParser.build_response(
+                Commands.AUTH_FAILED,
+                "Invalid passkey"
+            )
+            await websocket.send(error)
+            await websocket.close()
+            return False
+        
+        websocket.reg_data['authenticated'] = True
+        Log.auth("Client authenticated")
+        return True
+
+    async def _check_version(self, client_version: Optional[str], framing: str, websocket) -> bool:
+        # refuses and closes the connection on an incompatible protocol version
+        if not client_version:
+            Log.error("VER command missing version")
+            error = ProtocolParser.build_response(
+                Commands.ERROR,
+                "Missing protocol version"
+            )
+            await websocket.send(error)
+            await websocket.close()
+            return False
+        
+        if not versions_compatible(PROTOCOL_VERSION, client_version):
+            Log.error(f"Protocol version mismatch!")
+            Log.error(f"  Server version: {PROTOCOL_VERSION}")
+            Log.error(f"  Client version: {client_version}")
+            
+            error = ProtocolParser.build_command(
+                Commands.VERSION_MISMATCH,
+                server_version=PROTOCOL_VERSION,
+                client_version=client_version,
+                message=f"Protocol version mismatch. Please update."
             )
             await websocket.send(error)
             await websocket.close()
+            return False
+        
+        websocket.reg_data['protocol_version'] = client_version
+        websocket.reg_data['framing'] = ProtocolParser.negotiate_framing(framing)
+        return True
 
 
     async def _complete_registration(self, websocket):
@@ -387,18 +522,22 @@ class BotWaveServer:
         except:
             pass
         
-        base_client_id = f"{hostname}_{ip}"
+        # a valid resume token gets the client its previous id back, even if its ip changed
+        resumed_id = self._resume_session(reg_data.get('resume'))
+        
+        base_client_id = resumed_id or f"{hostname}_{ip}"
         client_id = base_client_id
         counter = 1
         
         while client_id in self.clients:
             Log.warning(f"Client {client_id} already connected -> reconnecting")
             old_client = self.clients[client_id]
+            self.sessions.pop(old_client.resume_token, None)
             try:
                 await old_client.websocket.close()
             except:
                 pass
-            del self.clients[client_id]
+            self.clients.pop(client_id, None)
             
             client_id = base_client_id
             break
@@ -409,7 +548,14 @@ class BotWaveServer:
             machine_info=machine_info,
             protocol_version=protocol_version
         )
-        
+        client.ip = ip if ip != "unknown" else None
+        client.peer_port = reg_data.get('peer_port')
+        client.can_convert = reg_data.get('can_convert', False)
+        client.can_bundle = reg_data.get('can_bundle', False)
+        client.framing = reg_data.get('framing', 'text')
+        client.resume_token = secrets.token_urlsafe(24)
+        
+        self.sessions[client.resume_token] = {'client_id': client_id, 'expires': None}
         self.clients[client_id] = client
         
         self.ws_server.register_client(websocket, client_id)
@@ -417,19 +563,44 @@ class BotWaveServer:
         response = ProtocolParser.build_command(
             Commands.REGISTER_OK,
             client_id=client_id,
-            server_version=PROTOCOL_VERSION
+            server_version=PROTOCOL_VERSION,
+            framing=client.framing,
+            index='true',
+            status='true',
+            resume=client.resume_token,
+            resumed='true' if resumed_id else 'false'
         )
         
         await websocket.send(response)
         
+        delattr(websocket, 'reg_data')
+        
+        if resumed_id:
+            # queue positions are kept by client id, nothing else to restore
+            Log.success(f"Client resumed: {client.get_display_name()}")
+            return
+        
         Log.success(f"Client registered: {client.get_display_name()}")
 
         if protocol_version != PROTOCOL_VERSION:
             Log.version(f"  Client protocol version: {protocol_version}. Some features may not work correctly.")
         
-        delattr(websocket, 'reg_data')
         self.onconnect_handlers()
 
+    def _resume_session(self, token: Optional[str]) -> Optional[str]:
+        # client id of a resumable session, tokens are single use
+        now = time.monotonic()
+        
+        for key, session in list(self.sessions.items()):
+            if session['expires'] is not None and session['expires'] < now:
+                del self.sessions[key]
+        
+        if not token:
+            return None
+        
+        session = self.sessions.pop(token, None)
+        return session['client_id'] if session else None
+
     def _start_websocket_server(self):
         self.ws_handler = WSCMDH(
             host=self.host,
@@ -506,23 +677,23 @@ class BotWaveServer:
         # FILE MANAGEMENT 
         elif command_name == 'upload':
             if len(cmd) < 3:
-                Log.error("Usage: upload <targets> <file|folder>")
+                Log.error("Usage: upload <targets> <file|folder> [server|client]")
                 return
-            await self.upload_file(cmd[1], cmd[2])
+            await self.upload_file(cmd[1], cmd[2], cmd[3] if len(cmd) > 3 else None)
             return
         
         elif command_name == 'dl':
             if len(cmd) < 3:
-                Log.error("Usage: dl <targets> <url>")
+                Log.error("Usage: dl <targets> <url> [client|server]")
                 return
-            await self.download_file(cmd[1], cmd[2])
+            await self.download_file(cmd[1], cmd[2], cmd[3] if len(cmd) > 3 else None)
             return
         
         elif command_name == 'lf':
             if len(cmd) < 2:
-                Log.error("Usage: lf <targets>")
+                Log.error("Usage: lf <targets> [pattern] [max_age]")
                 return
-            await self.list_files(cmd[1])
+            await self.list_files(cmd[1], cmd[2] if len(cmd) > 2 else None, cmd[3] if len(cmd) > 3 else None)
             return
         
         elif command_name == 'rm':
@@ -606,8 +777,9 @@ class BotWaveServer:
             
             if success:
                 Log.sstv(f"Uploading {output_wav} to {targets}...")
-                await self.upload_file(targets, output_wav)
-                await asyncio.sleep(2)  # Wait for upload
+                if not await self.upload_file(targets, output_wav):
+                    Log.error("Upload failed, not broadcasting")
+                    return
                 
                 Log.sstv(f"Broadcasting {os.path.basename(output_wav)}...")
                 await self.start_broadcast(targets, os.path.basename(output_wav), frequency, ps, rt, pi, loop)
@@ -651,17 +823,27 @@ class BotWaveServer:
                 return
 
             Log.morse(f"Uploading {output_wav} to {targets}...")
-            await self.upload_file(targets, output_wav)
-            await asyncio.sleep(2)
+            uploaded = await self.upload_file(targets, output_wav)
 
             os.remove(output_wav)
 
+            if not uploaded:
+                Log.error("Upload failed, not broadcasting")
+                return
+
             Log.morse("Broadcasting Morse...")
             await self.start_broadcast(targets, os.path.basename(output_wav), frequency=frequency, ps=ps, rt=rt, pi=pi, loop=loop)
 
             return
 
         
+        elif command_name == 'jobs':
+            if len(cmd) > 2 and cmd[1].lower() == 'cancel':
+                self.cancel_jobs(cmd[2])
+            else:
+                self.list_jobs()
+            return
+        
         # OTHER 
         elif command_name == 'handlers':
             if len(cmd) > 1:
@@ -745,6 +927,8 @@ class BotWaveServer:
         
         Log.section("Connected Clients")
         
+        outboxes = self.ws_server.metrics()
+        
         for client_id, client in self.clients.items():
             info = client.machine_info
             
@@ -755,14 +939,68 @@ class BotWaveServer:
             Log.print(f"  Protocol Version: {client.protocol_version}", 'cyan')
             Log.print(f"  Connected: {client.connected_at.strftime('%Y-%m-%d %H:%M:%S')}", 'cyan')
             Log.print(f"  Last seen: {client.last_seen.strftime('%Y-%m-%d %H:%M:%S')}", 'cyan')
+            
+            if client.status_at is not None:
+                status = client.status
+                
+                if client.is_broadcasting():
+                    line = f"  Status: on air, {status.get('file') or 'unknown'}"
+                    if status.get('frequency'):
+                        line += f" @ {status['frequency']} MHz"
+                    position = client.playback_position()
+                    if position is not None:
+                        line += f" ({self._format_duration(position)})"
+                else:
+                    line = "  Status: idle"
+                
+                if status.get('disk_free') is not None:
+                    line += f", {status['disk_free'] / (1024 * 1024):.0f} MB free"
+                if status.get('cpu_temp') is not None:
+                    line += f", CPU {status['cpu_temp']:.1f}°C"
+                
+                age = time.monotonic() - client.status_at
+                line += f" ({age:.0f}s ago{', stale' if client.status_stale() else ''})"
+                
+                Log.print(line, 'yellow' if client.status_stale() else 'cyan')
+            
+            if client_id in outboxes:
+                outbox = outboxes[client_id]
+                Log.print(f"  Send queue: {outbox['queued']} queued (peak {outbox['peak']}), {outbox['sent']} sent, {outbox['dropped']} dropped", 'cyan')
+            
             Log.print("")
+        
+        if self.ws_server.overflows:
+            Log.warning(f"{self.ws_server.overflows} client(s) dropped for a full send queue since start")
 
-    async def upload_file(self, client_targets, filepath):
-        ALLOWED_SOURCE_DIRS = [
-            "/tmp",
-            "/opt/BotWave",
-            os.path.expanduser("~")
-        ]
+    def list_jobs(self):
+        jobs = list(self.converter.jobs.values())
+
+        if not jobs:
+            Log.converter("No conversion jobs")
+            return
+
+        active = len(self.converter.active_jobs())
+        Log.section(f"Conversion jobs ({active} active, {self.converter.workers} workers)")
+
+        for job in jobs:
+            line = f"{job.id}  {job.state:<9} {job.progress * 100:5.1f}%  {os.path.basename(job.source)}"
+            if job.error:
+                line += f" ({job.error})"
+            Log.print(line, 'cyan' if job.state in ("queued", "running") else 'white')
+
+        Log.file(f"Transfers: {self.scheduler.active} active, {self.scheduler.pending()} waiting")
+
+    def cancel_jobs(self, job_id: str):
+        if self.converter.cancel(job_id):
+            Log.converter(f"Cancelled job(s): {job_id}")
+        else:
+            Log.error(f"No running job matching '{job_id}'")
+
+    async def upload_file(self, client_targets, filepath, transcode: Optional[str] = None):
+        transcode = (transcode or self.transcode).lower()
+        if transcode not in ("server", "client"):
+            Log.error(f"Invalid transcode mode: {transcode} (expected server or client)")
+            return False
 
         target_clients = self._parse_client_targets(client_targets)
         if not target_clients:
@@ -770,34 +1008,50 @@ class BotWaveServer:
             return False
 
         try:
-            filepath = PathValidator.validate_read(filepath, ALLOWED_SOURCE_DIRS)
+            checked_path = PathValidator.validate_read(filepath, ALLOWED_SOURCE_DIRS)
         except Exception as e:
             Log.error(str(e))
             return False
 
-        if os.path.isdir(filepath):
-            return await self._upload_folder_contents(client_targets, filepath)
+        if os.path.isdir(checked_path):
+            return await self._upload_folder_contents(client_targets, checked_path, transcode)
+
+        prepared = await self._prepare_upload(filepath, transcode)
+        if not prepared:
+            return False
+
+        return bool(await self._send_upload(target_clients, prepared))
+
+    async def _prepare_upload(self, filepath: str, transcode: str = "server") -> Optional[dict]:
+        # validates a source file and converts it to wav if needed
+        # returns {'path', 'filename', 'size', 'temporary'} or None on failure
+        # 'temporary' means the path is ours to delete once sent
+        # with transcode="client" compressed files are kept as is and flagged 'compressed'
+        try:
+            filepath = PathValidator.validate_read(filepath, ALLOWED_SOURCE_DIRS)
+        except Exception as e:
+            Log.error(str(e))
+            return None
 
         if not os.path.exists(filepath):
             Log.error(f"File does not exist: {filepath}")
-            return False
+            return None
 
-        MAX_UPLOAD_SIZE = 500 * 1024 * 1024  # 500 MB
         try:
             filesize = os.path.getsize(filepath)
         except OSError as e:
             Log.error(f"Failed to stat file: {e}")
-            return False
+            return None
 
         if filesize > MAX_UPLOAD_SIZE:
             Log.error(f"File too large ({filesize} bytes)")
-            return False
+            return None
 
         try:
             filename = PathValidator.sanitize_filename(os.path.basename(filepath))
         except Exception as e:
             Log.error(f"Invalid filename: {e}")
-            return False
+            return None
 
         name, ext = os.path.splitext(filename)
         ext = ext.lower().lstrip(".")
@@ -808,13 +1062,22 @@ class BotWaveServer:
         if ext != "wav":
             if ext not in SUPPORTED_EXTENSIONS:
                 Log.error(f"Unsupported file type: .{ext}")
-                return False
+                return None
+
+            if transcode == "client":
+                return {
+                    'path': filepath,
+                    'filename': filename,
+                    'size': filesize,
+                    'temporary': False,
+                    'compressed': True
+                }
 
             tmp = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
             tmp.close()
 
             try:
-                Converter.convert_wav(filepath, tmp.name)
+                await self.converter.convert(filepath, tmp.name)
                 converted_path = tmp.name
                 filepath = converted_path
                 filename = PathValidator.sanitize_filename(name + ".wav")
@@ -824,7 +1087,7 @@ class BotWaveServer:
                 except Exception:
                     pass
                 Log.error(f"Conversion failed: {e}")
-                return False
+                return None
 
         try:
             filesize = os.path.getsize(filepath)
@@ -835,50 +1098,288 @@ class BotWaveServer:
                     os.unlink(converted_path)
                 except Exception:
                     pass
-            return False
+            return None
 
-        try:
-            token = self.http_server.create_download_token(filepath)
-        except Exception as e:
-            Log.error(f"Failed to create download token: {e}")
-            if converted_path:
-                try:
-                    os.unlink(converted_path)
-                except Exception:
-                    pass
-            return False
+        return {
+            'path': filepath,
+            'filename': filename,
+            'size': filesize,
+            'temporary': converted_path is not None
+        }
 
-        success_count = 0
+    async def _send_upload(self, target_clients: List[str], prepared: dict, priority: int = PRIORITY_QUEUE) -> List[str]:
+        # one token per client so each transfer can be tracked to completion,
+        # returns the clients that received the file
+        clients = []
 
         for client_id in target_clients:
             if client_id not in self.clients:
                 Log.error(f"  {client_id}: Client not found")
                 continue
+            clients.append(client_id)
 
-            client = self.clients[client_id]
+        # sent in every token, receivers verify while writing and reject mismatches
+        if clients and not prepared.get('sha256'):
+            loop = asyncio.get_event_loop()
+            prepared['sha256'] = await loop.run_in_executor(None, hash_file, prepared['path'])
+
+        if prepared.get('compressed'):
+            return await self._send_compressed(clients, prepared, priority)
+
+        if self.peer_fanout and len(clients) > 1:
+            succeeded = await self._distribute(clients, prepared, priority)
+        else:
+            results = await asyncio.gather(*[self._transfer_via(None, client_id, prepared, priority=priority) for client_id in clients])
+            succeeded = [client_id for client_id, ok in zip(clients, results) if ok]
+
+        self._discard_prepared(prepared)
+
+        Log.broadcast(f"{prepared['filename']} transferred to {len(succeeded)}/{len(target_clients)} clients")
+        return succeeded
+
+    async def _send_compressed(self, clients: List[str], prepared: dict, priority: int = PRIORITY_QUEUE) -> List[str]:
+        # clients with ffmpeg get the original and convert it themselves,
+        # the others get a wav converted here. peers only hold the converted
+        # wav, so compressed originals always come from the server
+        converting = [client_id for client_id in clients if self.clients[client_id].can_convert]
+        fallback = [client_id for client_id in clients if client_id not in converting]
+
+        succeeded = []
+
+        if converting:
+            results = await asyncio.gather(*[self._transfer_via(None, client_id, prepared, priority) for client_id in converting])
+            succeeded += [client_id for client_id, ok in zip(converting, results) if ok]
+
+            Log.broadcast(f"{prepared['filename']} transferred to {len(succeeded)}/{len(converting)} clients for local conversion")
+
+        if fallback:
+            Log.file(f"  {len(fallback)} client(s) can't convert, converting {prepared['filename']} on the server")
+
+            converted = await self._prepare_upload(prepared['path'], "server")
+            if converted:
+                succeeded += await self._send_upload(fallback, converted, priority)
+
+        return succeeded
+
+    async def _transfer_via(self, source_id: Optional[str], client_id: str, prepared: dict, priority: int = PRIORITY_QUEUE) -> bool:
+        # tokens are only handed out once the scheduler has a slot for them,
+        # peer-served transfers don't count against the server's global cap
+        async with self.scheduler.slot(client_id, priority, counted=source_id is None):
+            return await self._run_transfer(source_id, client_id, prepared)
+
+    async def _run_transfer(self, source_id: Optional[str], client_id: str, prepared: dict) -> bool:
+        # sends one file to one client, from the server (source_id=None) or from a peer holding it
+        client = self.clients.get(client_id)
+        if not client:
+            return False
+
+        extra = {'sha256': prepared['sha256']} if prepared.get('sha256') else {}
+        if prepared.get('compressed'):
+            extra['convert'] = 'true'
+
+        try:
+            if source_id is None:
+                token = self.http_server.create_download_token(prepared['path'])
+            else:
+                source = self.clients.get(source_id)
+                if not source:
+                    return False
+
+                # ask the peer to expose its copy, it answers with a token on its own endpoint
+                reply = await self._rpc(source_id, Commands.PEER_OFFER, timeout=15, priority=SEND_BULK, filename=prepared['filename'])
+
+                token = reply['token']
+                extra['host'] = source.ip
+                extra['port'] = reply.get('port', source.peer_port)
+                self.http_server.expect_transfer(token)
+
+        except Exception as e:
+            Log.error(f"  {client.get_display_name()}: could not get a download token ({e})")
+            return False
+
+        command = ProtocolParser.build_command(
+            Commands.DOWNLOAD_TOKEN,
+            token=token,
+            filename=prepared['filename'],
+            size=prepared['size'],
+            **extra
+        )
+
+        await self.ws_server.send(client_id, command, priority=SEND_BULK)
+
+        via = f" via {self.clients[source_id].get_display_name()}" if source_id else ""
+        Log.file(f"  {client.get_display_name()}: Download token sent{via}")
+
+        # allow ~1MB/s before giving up, with a 60s floor for small files
+        timeout = max(60, prepared['size'] / (1024 * 1024))
+
+        # a client converting locally only replies once ffmpeg is done
+        ack_timeout = max(60, timeout) if prepared.get('compressed') else ACK_TIMEOUT
+
+        try:
+            message = await self.http_server.wait_transfer(token, timeout=timeout, ack_timeout=ack_timeout)
+
+            if prepared.get('compressed'):
+                Log.file(f"  {client.get_display_name()}: {message}")
+            return True
+        except TransferError as e:
+            Log.error(f"  {client.get_display_name()}: {prepared['filename']} - {e}")
+            return False
+
+    async def _distribute(self, target_clients: List[str], prepared: dict, priority: int = PRIORITY_QUEUE) -> List[str]:
+        # swarm fan-out: the server and every client that received the file
+        # (and has a peer endpoint) serve up to peer_fanout clients at once,
+        # so the number of holders roughly doubles each round
+        pending = list(target_clients)
+        holders = {None: 0} # source -> active uploads, None = server
+        failed_peers = set()
+        running = {}
+        attempts = {}
+        succeeded = []
+        started = time.monotonic()
+
+        while pending or running:
+            for source_id in list(holders):
+                if source_id in failed_peers:
+                    continue
+
+                while pending and holders[source_id] < self.peer_fanout:
+                    target = pending.pop(0)
+                    holders[source_id] += 1
+                    task = asyncio.create_task(self._transfer_via(source_id, target, prepared, priority))
+                    running[task] = (source_id, target)
+
+            if not running:
+                break
+
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in finished:
+                source_id, target = running.pop(task)
+
+                if source_id in holders:
+                    holders[source_id] -= 1
+
+                if not task.cancelled() and task.exception() is None and task.result():
+                    succeeded.append(target)
+
+                    client = self.clients.get(target)
+                    if client and client.peer_port and client.ip:
+                        holders[target] = 0
+                    continue
+
+                # failed peers stop serving, the target gets retried (the server is always a holder)
+                if source_id is not None:
+                    failed_peers.add(source_id)
+
+                attempts[target] = attempts.get(target, 0) + 1
+                if attempts[target] < 2 and target in self.clients:
+                    pending.append(target)
+
+        Log.file(f"  Distributed {prepared['filename']} to {len(succeeded)} client(s) in {time.monotonic() - started:.1f}s ({len(holders) - len(failed_peers)} holders)")
+        return succeeded
+    
+    def _bundleable(self, prepared: dict) -> bool:
+        return not prepared.get('compressed') and prepared['size'] <= BUNDLE_FILE_LIMIT
+
+    async def _send_many(self, items: List[tuple], priority: int = PRIORITY_QUEUE) -> List[tuple]:
+        # sends (prepared, target clients) pairs: clients needing several files
+        # get them as bundles over a single connection, others one by one.
+        # prepared files are discarded afterwards, returns (prepared, clients
+        # that received it) for those that reached at least one client
+        per_client: Dict[str, List[dict]] = {}
+
+        for prepared, clients in items:
+            for client_id in clients:
+                if client_id in self.clients:
+                    per_client.setdefault(client_id, []).append(prepared)
+
+        # bundle entries carry their hash, checked by the client while extracting
+        loop = asyncio.get_event_loop()
+        for prepared, _ in items:
+            if not prepared.get('sha256'):
+                prepared['sha256'] = await loop.run_in_executor(None, hash_file, prepared['path'])
+
+        delivered: Dict[int, List[str]] = {} # id(prepared) -> clients that received it
+
+        async def send_to(client_id: str, files: List[dict]):
+            client = self.clients.get(client_id)
+
+            if client and client.can_bundle and len(files) >= BUNDLE_MIN_FILES:
+                for batch in self._split_bundle(files):
+                    if await self._send_bundle(client_id, batch, priority):
+                        for prepared in batch:
+                            delivered.setdefault(id(prepared), []).append(client_id)
+                return
+
+            results = await asyncio.gather(*[self._transfer_via(None, client_id, prepared, priority) for prepared in files])
+
+            for prepared, ok in zip(files, results):
+                if ok:
+                    delivered.setdefault(id(prepared), []).append(client_id)
+
+        await asyncio.gather(*[send_to(client_id, files) for client_id, files in per_client.items()])
+
+        for prepared, _ in items:
+            self._discard_prepared(prepared)
+
+        return [(prepared, delivered[id(prepared)]) for prepared, _ in items if id(prepared) in delivered]
+
+    def _split_bundle(self, files: List[dict]) -> List[List[dict]]:
+        batches = [[]]
+        size = 0
+
+        for prepared in files:
+            if batches[-1] and (len(batches[-1]) >= BUNDLE_MAX_FILES or size + prepared['size'] > BUNDLE_MAX_BYTES):
+                batches.append([])
+                size = 0
+
+            batches[-1].append(prepared)
+            size += prepared['size']
+
+        return batches
+
+    async def _send_bundle(self, client_id: str, files: List[dict], priority: int = PRIORITY_QUEUE) -> bool:
+        # one token, one connection and one ack for the whole batch
+        client = self.clients.get(client_id)
+        if not client:
+            return False
+
+        async with self.scheduler.slot(client_id, priority):
+            token = self.http_server.create_bundle_token(files)
+            total = sum(prepared['size'] for prepared in files)
 
             command = ProtocolParser.build_command(
-                Commands.DOWNLOAD_TOKEN,
+                Commands.BUNDLE_TOKEN,
                 token=token,
-                filename=filename,
-                size=filesize
+                count=len(files),
+                size=total
             )
 
-            await self.ws_server.send(client_id, command)
-            Log.file(f"  {client.get_display_name()}: Download token sent")
+            await self.ws_server.send(client_id, command, priority=SEND_BULK)
+            Log.file(f"  {client.get_display_name()}: Bundle token sent ({len(files)} files)")
 
-            success_count += 1
+            # same ~1MB/s allowance as single files
+            timeout = max(60, total / (1024 * 1024))
+
+            try:
+                await self.http_server.wait_transfer(token, timeout=timeout)
+                return True
+            except TransferError as e:
+                Log.error(f"  {client.get_display_name()}: bundle - {e}")
+                return False
+
+    async def _upload_folder_contents(self, client_targets: str, folder_path: str, transcode: str = "server"):
+        # staged pipeline: conversions (bounded by the converter pool) feed a
+        # bounded queue drained by transfer workers, so file N+1 converts
+        # while file N is being transferred
 
-        Log.broadcast(f"Upload tokens sent to {success_count}/{len(target_clients)} clients")
-        return success_count > 0
-    
-    async def _upload_folder_contents(self, client_targets: str, folder_path: str):
         if not os.path.exists(folder_path) or not os.path.isdir(folder_path):
             Log.error(f"Folder {folder_path} not found")
             return False
 
         files = [
-            f for f in os.listdir(folder_path)
+            f for f in sorted(os.listdir(folder_path))
             if os.path.isfile(os.path.join(folder_path, f))
         ]
 
@@ -886,28 +1387,107 @@ class BotWaveServer:
             Log.warning(f"No files found in {folder_path}")
             return False
 
+        target_clients = self._parse_client_targets(client_targets)
+        if not target_clients:
+            Log.warning("No client(s) found matching the query")
+            return False
+
         Log.file(f"Found {len(files)} file(s) in {folder_path}")
-        overall_success = 0
 
+        pending = asyncio.Queue()
         for idx, filename in enumerate(files, 1):
-            full_path = os.path.join(folder_path, filename)
             ext = os.path.splitext(filename)[1].lower().lstrip(".")
 
             if ext == "wav" or ext in SUPPORTED_EXTENSIONS:
-                Log.file(f"[{idx}/{len(files)}] Processing {filename}...")
-                if await self.upload_file(client_targets, full_path):
-                    overall_success += 1
+                pending.put_nowait((idx, filename))
             else:
                 Log.warning(f"Skipping unsupported file: {filename}")
 
-            if idx < len(files):
-                await asyncio.sleep(0.5)
+        # bounded, so conversions can't run arbitrarily far ahead of transfers
+        prepared_queue = asyncio.Queue(maxsize=self.transfer_workers * 2)
+        stats = {'files': 0, 'bytes': 0}
+        started = time.monotonic()
 
-        Log.file(f"Folder upload completed: {overall_success}/{len(files)} files")
-        return overall_success > 0
+        async def convert_stage():
+            while True:
+                try:
+                    idx, filename = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
 
+                Log.file(f"[{idx}/{len(files)}] Processing {filename}...")
+                prepared = await self._prepare_upload(os.path.join(folder_path, filename), transcode)
 
-    async def start_live(self, client_targets: str, frequency: float = 90.0, ps: str = "BotWave", rt: str = "Broadcasting", pi: str = "FFFF"):
+                if prepared:
+                    await prepared_queue.put(prepared)
+
+        # small files pile up here and leave as bundles instead of one token each,
+        # a batch is sent as soon as it fills while the rest keeps converting
+        batch = []
+        batches = []
+
+        def delivered(prepared: dict, received: List[str]):
+            # bytes count once per client that got the file
+            stats['files'] += 1
+            stats['bytes'] += prepared['size'] * len(received)
+
+        async def send_batch(items):
+            try:
+                for prepared, received in await self._send_many([(prepared, target_clients) for prepared in items]):
+                    delivered(prepared, received)
+            except Exception as e:
+                Log.error(f"  Bundle of {len(items)} files - {e}")
+
+        def flush_batch():
+            batches.append(asyncio.create_task(send_batch(batch[:])))
+            batch.clear()
+
+        async def transfer_stage():
+            while True:
+                prepared = await prepared_queue.get()
+                if prepared is None:
+                    return
+
+                if self._bundleable(prepared):
+                    batch.append(prepared)
+
+                    if len(batch) >= BUNDLE_FLUSH_FILES or sum(item['size'] for item in batch) >= BUNDLE_FLUSH_BYTES:
+                        flush_batch()
+                    continue
+
+                try:
+                    received = await self._send_upload(target_clients, prepared)
+                    if received:
+                        delivered(prepared, received)
+                except Exception as e:
+                    Log.error(f"  {prepared['filename']} - {e}")
+
+        converters = [asyncio.create_task(convert_stage()) for _ in range(self.converter.workers)]
+        transfers = [asyncio.create_task(transfer_stage()) for _ in range(self.transfer_workers)]
+
+        try:
+            await asyncio.gather(*converters)
+
+            for _ in transfers:
+                await prepared_queue.put(None)
+
+            await asyncio.gather(*transfers)
+
+            if batch:
+                flush_batch()
+
+            await asyncio.gather(*batches)
+        finally:
+            for task in converters + transfers + batches:
+                task.cancel()
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+
+        Log.file(f"Folder upload completed: {stats['files']}/{len(files)} files in {elapsed:.1f}s")
+        Log.file(f"  Throughput: {stats['files'] / elapsed:.2f} files/s, {stats['bytes'] / elapsed / (1024 * 1024):.2f} MB/s")
+        return stats['files'] > 0
+
+    async def start_live(self, client_targets: str, frequency: float = 90.0, ps: str = "BotWave", rt: str = "Broadcasting", pi: str = "FFFF"):
         
         target_clients = self._parse_client_targets(client_targets)
         if not target_clients:
@@ -959,12 +1539,24 @@ class BotWaveServer:
         Log.alsa(f"We're expecting {self.alsa.rate}kHz on {self.alsa.channels} channels.")
         return success_count > 0
     
-    async def download_file(self, client_targets: str, url: str):
+    async def download_file(self, client_targets: str, url: str, mode: Optional[str] = None):
+        mode = (mode or self.dl_mode).lower()
+        if mode not in ("client", "server"):
+            Log.error(f"Invalid download mode: {mode} (expected client or server)")
+            return False
+        
         target_clients = self._parse_client_targets(client_targets)
         if not target_clients:
             Log.warning("No client(s) found matching the query")
             return False
         
+        if mode == "server":
+            prepared = await self._fetch_url(url)
+            if not prepared:
+                return False
+            
+            return bool(await self._send_upload(target_clients, prepared))
+        
         Log.broadcast(f"Requesting download from {len(target_clients)} client(s)...")
         
         # Custom command for URL download
@@ -982,6 +1574,69 @@ class BotWaveServer:
             Log.file(f"  {client.get_display_name()}: Download request sent")
         
         return True
+
+    async def _fetch_url(self, url: str) -> Optional[dict]:
+        # server side dl: the url is fetched and converted once, then sent
+        # like an upload. later calls revalidate the cached wav with a
+        # conditional request instead of downloading it again
+        # returns a prepared upload (see _prepare_upload) or None on failure
+        try:
+            filename = PathValidator.sanitize_filename(os.path.basename(urllib.parse.urlparse(url).path))
+        except Exception as e:
+            Log.error(f"Invalid filename in url: {e}")
+            return None
+
+        name, ext = os.path.splitext(filename)
+        ext = ext.lower().lstrip(".")
+
+        if ext != "wav" and ext not in SUPPORTED_EXTENSIONS:
+            Log.error(f"Unsupported file type: .{ext}")
+            return None
+
+        loop = asyncio.get_event_loop()
+
+        try:
+            fetched = await loop.run_in_executor(None, self.url_cache.fetch, url, ext, progress_bar(filename))
+        except (DownloadError, OSError) as e:
+            Log.error(f"Download failed: {e}")
+            return None
+
+        if fetched is None:
+            entry = self.url_cache.cached(url)
+            Log.file(f"{filename} unchanged since last download, using cached copy")
+        else:
+            raw_path, validators = fetched
+            wav_path = raw_path
+
+            try:
+                if ext != "wav":
+                    wav_path = os.path.splitext(raw_path)[0] + ".wav"
+                    await self.converter.convert(raw_path, wav_path)
+
+                sha256 = await loop.run_in_executor(None, hash_file, wav_path)
+                entry = await loop.run_in_executor(None, self.url_cache.store, url, wav_path, validators, sha256)
+            except Exception as e:
+                Log.error(f"Conversion failed: {e}")
+                return None
+            finally:
+                for path in {raw_path, wav_path}:
+                    if os.path.exists(path):
+                        try:
+                            os.unlink(path)
+                        except OSError:
+                            pass
+
+        if not entry:
+            Log.error(f"Cached copy of {filename} is gone")
+            return None
+
+        return {
+            'path': entry['wav'],
+            'filename': PathValidator.sanitize_filename(name + ".wav"),
+            'size': entry['size'],
+            'temporary': False,
+            'sha256': entry['sha256']
+        }
     
 
     async def remove_file(self, client_targets: str, filename: str):
@@ -992,17 +1647,16 @@ class BotWaveServer:
         
         Log.broadcast(f"Removing '{filename}' from {len(target_clients)} client(s)...")
         
-        for client_id in target_clients:
-            if client_id not in self.clients:
-                Log.error(f"  {client_id}: Client not found")
-                continue
-            
-            client = self.clients[client_id]
-            
-            command = ProtocolParser.build_command(Commands.REMOVE_FILE, filename=filename)
-            await self.ws_server.send(client_id, command)
+        clients = self._connected(target_clients)
+        results = await self._fan_out(clients, Commands.REMOVE_FILE, filename=filename)
+        
+        for client_id, result in results.items():
+            name = self.clients[client_id].get_display_name() if client_id in self.clients else client_id
             
-            Log.file(f"  {client.get_display_name()}: Remove request sent")
+            if isinstance(result, Exception):
+                Log.error(f"  {name}: {self._describe_failure(result)}")
+            else:
+                Log.file(f"  {name}: {result.get('message', 'Removed')}")
         
         return True
     
@@ -1013,6 +1667,9 @@ class BotWaveServer:
         # - sync <clients> <source_client> - Sync from one client to others
         # - sync <clients> <folder/> - Sync from local folder to clients
         # - sync <folder/> <source_client> - Sync from client to local folder
+        #
+        # Manifests (name, size, sha256) are compared first, so only missing
+        # or changed files get transferred, and extra files are removed last.
         
         Log.warning("This feature is in beta and may be unstable.")
 
@@ -1042,106 +1699,38 @@ class BotWaveServer:
             
             Log.broadcast(f"Syncing from {source_client.get_display_name()} to local folder: {target_dir}")
             
-            files = await self._request_file_list(source_client_id)
+            files = await self._request_file_list(source_client_id, timeout=120, hashes=True)
             
             if not files:
                 Log.error("Could not get file list from client")
                 return False
             
-            if not files:
-                Log.warning(f"{source_client.get_display_name()} has no files")
-                return True
-            
-            Log.info(f"Found {len(files)} files to sync")
-            
-            success_count = 0
+            needed = {} # name -> expected sha256
             
             for file_info in files:
-                filename = file_info.get('name')
-
                 try:
-                    filename = PathValidator.sanitize_filename(filename)
+                    local_path = PathValidator.safe_join(target_dir, PathValidator.sanitize_filename(file_info.get('name')))
                 except SecurityError as e:
                     Log.error(f"Invalid filename from client: {e}")
                     continue
                 
-                try:
-                    temp_suffix = uuid.uuid4().hex[:8]
-                    temp_filename = f".sync_temp_{source_client_id}_{temp_suffix}_{filename}"
-                    
-                    try:
-                        temp_path = PathValidator.safe_join(target_dir, temp_filename)
-                        final_path = PathValidator.safe_join(target_dir, filename)
-                    except SecurityError as e:
-                        Log.error(f"Path traversal attempt in sync: {e}")
+                if os.path.isfile(local_path):
+                    local = await self._hash_local(local_path)
+                    if self._same_file(file_info, local):
                         continue
-                                    
-                    # FIX 1: Use size 0 instead of 1GB for upload token
-                    token = self.http_server.create_upload_token(temp_filename, 0)
-                    
-                    old_upload_dir = self.http_server.upload_dir
-                    self.http_server.upload_dir = target_dir
-                    
-                    command = ProtocolParser.build_command(
-                        Commands.UPLOAD_TOKEN,
-                        token=token,
-                        filename=filename,
-                        size=0
-                    )
-                    
-                    await self.ws_server.send(source_client_id, command)
-                    
-                    Log.file(f"  [{success_count + 1}/{len(files)}] Downloading {filename}...")
- 
-                    if not await self._wait_for_file_complete(temp_path):
-                            Log.error(f"  {filename} - file never unlocked")
-                            continue
-                    
-                    self.http_server.upload_dir = old_upload_dir
-                    
-                    if os.path.exists(temp_path):
-                        
-                        # FIX 3: More robust file replacement
-                        try:
-                            if os.path.exists(final_path):
-                                os.remove(final_path)
-                            os.rename(temp_path, final_path)
-                            
-                            file_size = os.path.getsize(final_path)
-                            Log.success(f"  {filename} ({file_size} bytes)")
-                            success_count += 1
-                        except PermissionError:
-                            # If still locked, try a few more times
-                            for retry in range(3):
-                                await asyncio.sleep(0.5)
-                                try:
-                                    if os.path.exists(final_path):
-                                        os.remove(final_path)
-                                    os.rename(temp_path, final_path)
-                                    
-                                    file_size = os.path.getsize(final_path)
-                                    Log.success(f"  {filename} ({file_size} bytes)")
-                                    success_count += 1
-                                    break
-                                except PermissionError:
-                                    if retry == 2:
-                                        raise
-                    else:
-                        Log.error(f"  {filename} - timeout")
-                        self.http_server.upload_dir = old_upload_dir
-                    
-                except Exception as e:
-                    Log.error(f"  {filename} - {e}")
-                    self.http_server.upload_dir = old_upload_dir
-                    # Clean up temp file if it exists
-                    try:
-                        if os.path.exists(temp_path):
-                            os.remove(temp_path)
-                    except:
-                        pass
-            
-            if success_count > 0:
-                Log.broadcast(f"Sync completed: {success_count}/{len(files)} files")
+                
+                needed[file_info.get('name')] = file_info.get('sha256')
+            
+            Log.info(f"Found {len(files)} files, {len(needed)} missing or changed")
+            
+            if not needed:
+                Log.broadcast("Sync completed: already up to date")
+                return True
+            
+            pulled = await self._pull_files(source_client_id, list(needed), target_dir, hashes=needed)
+            
+            if pulled:
+                Log.broadcast(f"Sync completed: {len(pulled)}/{len(needed)} files")
                 return True
             else:
                 Log.error("Sync failed: no files transferred")
@@ -1159,11 +1748,11 @@ class BotWaveServer:
             if not target_clients:
                 return False
             
-            supported_files = [
+            supported_files = sorted(
                 f for f in os.listdir(source_dir)
                 if os.path.isfile(os.path.join(source_dir, f)) and
                 (f.lower().endswith('.wav') or os.path.splitext(f)[1].lower().lstrip(".") in SUPPORTED_EXTENSIONS)
-            ]
+            )
 
             if not supported_files:
                 Log.warning(f"No supported files found in {source_dir}")
@@ -1172,19 +1761,77 @@ class BotWaveServer:
             Log.broadcast(f"Syncing from local folder: {source_dir} ({len(supported_files)} files)")
             Log.broadcast(f"Targets: {', '.join(target_clients)}")
             
-            # Clear files
-            Log.info("Clearing existing files on targets...")
-            await self.remove_file(','.join(target_clients), "all")
-            await asyncio.sleep(1)
+            manifests = await self._collect_manifests(target_clients)
+            if not manifests:
+                Log.error("Could not get file lists from targets")
+                return False
             
-            success = await self._upload_folder_contents(','.join(target_clients), source_dir)
+            stats = {'sent': 0, 'skipped': 0, 'failed': 0}
+            keep = set()
+            bundled = [] # (prepared, needing) of small files waiting for the next batch
+            batches = []
+            semaphore = asyncio.Semaphore(self.transfer_workers)
+            
+            async def send_batch(items):
+                sent = await self._send_many(items, PRIORITY_BACKGROUND)
+                stats['sent'] += len(sent)
+                stats['failed'] += len(items) - len(sent)
+            
+            def flush_bundled():
+                batches.append(asyncio.create_task(send_batch(bundled[:])))
+                bundled.clear()
+            
+            async def sync_one(name):
+                async with semaphore:
+                    path = os.path.join(source_dir, name)
+                    wav_name = self._synced_name(name)
+                    keep.add(wav_name)
+                    
+                    # already converted & hashed before = no need to convert again
+                    known = self.source_hashes.get(self._source_key(path))
+                    if known and not self._needing(manifests, wav_name, known):
+                        stats['skipped'] += 1
+                        return
+                    
+                    prepared = await self._prepare_upload(path)
+                    if not prepared:
+                        stats['failed'] += 1
+                        return
+                    
+                    keep.add(prepared['filename'])
+                    
+                    known = await self._hash_local(prepared['path'], source_path=path)
+                    needing = self._needing(manifests, prepared['filename'], known)
+                    prepared['sha256'] = known[1]
+                    
+                    if not needing:
+                        self._discard_prepared(prepared)
+                        stats['skipped'] += 1
+                        return
+                    
+                    if self._bundleable(prepared):
+                        bundled.append((prepared, needing))
+                        
+                        if len(bundled) >= BUNDLE_FLUSH_FILES or sum(item[0]['size'] for item in bundled) >= BUNDLE_FLUSH_BYTES:
+                            flush_bundled()
+                        return
+                    
+                    if await self._send_upload(needing, prepared, PRIORITY_BACKGROUND):
+                        stats['sent'] += 1
+                    else:
+                        stats['failed'] += 1
             
-            if success:
-                Log.broadcast("Sync completed successfully!")
-            else:
-                Log.error("Sync completed with errors")
+            await asyncio.gather(*[sync_one(name) for name in supported_files])
             
-            return success
+            if bundled:
+                flush_bundled()
+            
+            await asyncio.gather(*batches)
+            
+            removed = await self._remove_extras(manifests, keep)
+            
+            Log.broadcast(f"Sync completed: {stats['sent']} sent, {stats['skipped']} up to date, {stats['failed']} failed, {removed} removed")
+            return stats['failed'] == 0
         
         # Case 3: Sync FROM client TO clients
         else:
@@ -1214,129 +1861,225 @@ class BotWaveServer:
             
             Log.broadcast(f"Syncing from {source_client.get_display_name()} to {len(target_clients)} client(s)")
             
-            files = await self._request_file_list(source_client_id)
+            files, manifests = await asyncio.gather(
+                self._request_file_list(source_client_id, timeout=120, hashes=True),
+                self._collect_manifests(target_clients)
+            )
             
-            if not files:
+            if files is None:
                 Log.error("Could not get file list from source client")
                 return False
             
-            if not files:
-                Log.warning(f"Source client has no files")
-                return True
+            if not manifests:
+                Log.error("Could not get file lists from targets")
+                return False
             
             Log.info(f"Found {len(files)} files on source")
             
-            Log.info("Downloading files from source client...")
-            
-            temp_dir = tempfile.mkdtemp(prefix='botwave_sync_')
-            downloaded_files = []
+            # files are relayed one by one through a spool dir, each one is
+            # deleted as soon as every target that needed it got it
+            spool_dir = tempfile.mkdtemp(prefix='botwave_sync_')
+            stats = {'sent': 0, 'skipped': 0, 'failed': 0}
+            semaphore = asyncio.Semaphore(self.transfer_workers)
             
-            try:
-                for file_info in files:
-                    filename = file_info.get('name')
-                    
-                    try:
-                        temp_suffix = uuid.uuid4().hex[:8]
-                        temp_filename = f".sync_temp_{source_client_id}_{temp_suffix}_{filename}"
-                        temp_path = os.path.join(temp_dir, temp_filename)
-                        final_temp_path = os.path.join(temp_dir, filename)
-                        
-                        old_upload_dir = self.http_server.upload_dir
-                        self.http_server.upload_dir = temp_dir
-                        
-                        # FIX 1: Use size 0 instead of 1GB
-                        token = self.http_server.create_upload_token(temp_filename, 0)
-                        
-                        command = ProtocolParser.build_command(
-                            Commands.UPLOAD_TOKEN,
-                            token=token,
-                            filename=filename,
-                            size=0
-                        )
-                        
-                        await self.ws_server.send(source_client_id, command)
-                        
-                        Log.file(f"  Downloading {filename}...")
-                        
-                        if not await self._wait_for_file_complete(temp_path):
-                            Log.error(f"  {filename} - file never unlocked")
-                            continue
-
-                        
-                        self.http_server.upload_dir = old_upload_dir
-                        
-                        if os.path.exists(temp_path):
-                            # FIX 2: Add delay before rename
-                            await asyncio.sleep(0.2)
-                            os.rename(temp_path, final_temp_path)
-                            downloaded_files.append(filename)
-                            Log.success(f"  {filename}")
-                        else:
-                            Log.error(f"  {filename} - timeout")
-                            self.http_server.upload_dir = old_upload_dir
-                        
-                    except Exception as e:
-                        Log.error(f"  {filename} - {e}")
-                        self.http_server.upload_dir = old_upload_dir
-                
-                if not downloaded_files:
-                    Log.error("Failed to download any files from source")
-                    return False
+            async def sync_one(file_info):
+                needing = self._needing(manifests, file_info.get('name'), (file_info.get('size'), file_info.get('sha256')))
                 
-                Log.info(f"Downloaded {len(downloaded_files)} files to temp")
-                
-                Log.info("Clearing files on target clients...")
-                await self.remove_file(','.join(target_clients), "all")
-                await asyncio.sleep(1)
+                if not needing:
+                    stats['skipped'] += 1
+                    return
                 
-                Log.info("Uploading files to target clients...")
-                success = await self._upload_folder_contents(','.join(target_clients), temp_dir)
+                async with semaphore:
+                    filename = PathValidator.sanitize_filename(file_info['name'])
+                    
+                    if not await self._pull_file(source_client_id, filename, spool_dir, sha256=file_info.get('sha256')):
+                        stats['failed'] += 1
+                        return
+                    
+                    path = os.path.join(spool_dir, filename)
+                    prepared = {
+                        'path': path,
+                        'filename': filename,
+                        'size': os.path.getsize(path),
+                        'temporary': True,
+                        'sha256': file_info.get('sha256') # verified on arrival
+                    }
+                    
+                    if await self._send_upload(needing, prepared, PRIORITY_BACKGROUND):
+                        stats['sent'] += 1
+                    else:
+                        stats['failed'] += 1
+            
+            async def guarded(file_info):
+                try:
+                    await sync_one(file_info)
+                except Exception as e:
+                    Log.error(f"  {file_info.get('name')} - {e}")
+                    stats['failed'] += 1
+            
+            try:
+                await asyncio.gather(*[guarded(file_info) for file_info in files])
                 
-                if success:
-                    Log.broadcast("Sync completed successfully!")
-                else:
-                    Log.error("Sync completed with errors")
+                removed = await self._remove_extras(manifests, {f.get('name') for f in files})
                 
-                return success
+                Log.broadcast(f"Sync completed: {stats['sent']} sent, {stats['skipped']} up to date, {stats['failed']} failed, {removed} removed")
+                return stats['failed'] == 0
                 
             finally:
-                try:
-                    shutil.rmtree(temp_dir)
-                    Log.info("Cleaned up temporary files")
-                except Exception as e:
-                    Log.warning(f"Failed to remove temp directory: {e}")
+                self._remove_temp_dir(spool_dir)
 
-    async def _wait_for_file_complete(self, path, timeout=120):
-        last_size = -1
-        stable_cycles = 0
-        elapsed = 0
+    def _synced_name(self, filename: str) -> str:
+        # name a source file has on clients: wav files keep theirs (whatever
+        # the case of the extension), anything else is converted to .wav
+        name, ext = os.path.splitext(filename)
+        filename = filename if ext.lower() == '.wav' else name + '.wav'
+        
+        try:
+            return PathValidator.sanitize_filename(filename)
+        except SecurityError:
+            return filename
 
-        while elapsed < timeout:
-            if os.path.exists(path):
-                try:
-                    size = os.path.getsize(path)
+    def _source_key(self, path: str) -> Optional[tuple]:
+        try:
+            stat_info = os.stat(path)
+        except OSError:
+            return None
+        return (os.path.realpath(path), stat_info.st_size, stat_info.st_mtime_ns)
 
-                    with open(path, "rb"):
-                        pass
+    async def _hash_local(self, path: str, source_path: Optional[str] = None) -> tuple:
+        # (size, sha256) of a local file, cached per source file version
+        # source_path is the original when path is its converted copy
+        key = self._source_key(source_path or path)
+        
+        if key and key in self.source_hashes:
+            return self.source_hashes[key]
+        
+        loop = asyncio.get_event_loop()
+        sha256 = await loop.run_in_executor(None, hash_file, path)
+        result = (os.path.getsize(path), sha256)
+        
+        if key:
+            self.source_hashes[key] = result
+        
+        return result
 
-                    if size == last_size:
-                        stable_cycles += 1
-                    else:
-                        stable_cycles = 0
-                        last_size = size
+    def _same_file(self, file_info: Optional[dict], known: tuple) -> bool:
+        if not file_info:
+            return False
+        size, sha256 = known
+        return file_info.get('size') == size and bool(sha256) and file_info.get('sha256') == sha256
+
+    def _needing(self, manifests: Dict[str, dict], filename: str, known: tuple) -> List[str]:
+        # clients whose copy of filename is missing or different
+        return [
+            client_id for client_id, files in manifests.items()
+            if not self._same_file(files.get(filename), known)
+        ]
 
-                    if stable_cycles >= 3:
-                        return True
+    def _discard_prepared(self, prepared: dict):
+        if prepared['temporary']:
+            try:
+                os.unlink(prepared['path'])
+            except Exception:
+                pass
 
-                except:
-                    pass
+    async def _collect_manifests(self, client_ids: List[str]) -> Dict[str, dict]:
+        # {client_id: {filename: file_info}}, clients that didn't answer are left out
+        # clients pushing their file changes are answered from the fleet index
+        manifests = {
+            client_id: self.fleet_index.manifest(client_id)
+            for client_id in client_ids if self.fleet_index.tracks(client_id)
+        }
+        asked = [client_id for client_id in client_ids if client_id not in manifests]
+        
+        results = await asyncio.gather(*[
+            self._request_file_list(client_id, timeout=120, hashes=True) for client_id in asked
+        ])
+        
+        for client_id, files in zip(asked, results):
+            if files is None:
+                Log.error(f"  {client_id}: no file list, skipping")
+                continue
+            manifests[client_id] = {f['name']: f for f in files if f.get('name')}
+        
+        return manifests
 
-            await asyncio.sleep(0.5)
-            elapsed += 0.5
+    async def _remove_extras(self, manifests: Dict[str, dict], keep: set) -> int:
+        # returns how many removals the clients confirmed
+        async def remove(client_id: str, filename: str) -> bool:
+            try:
+                await self._rpc(client_id, Commands.REMOVE_FILE, timeout=CONTROL_TIMEOUT, priority=SEND_BULK, filename=filename)
+                return True
+            except Exception as e:
+                name = self.clients[client_id].get_display_name() if client_id in self.clients else client_id
+                Log.error(f"  {name}: could not remove {filename} ({self._describe_failure(e)})")
+                return False
+        
+        results = await asyncio.gather(*[
+            remove(client_id, filename)
+            for client_id, files in manifests.items()
+            for filename in sorted(set(files) - keep)
+        ])
+        
+        return sum(results)
 
-        return False
+    async def _pull_file(self, client_id: str, filename: str, dest_dir: str, timeout: float = 120, sha256: Optional[str] = None) -> bool:
+        # pulls are only used by sync, so they run as background transfers
+        async with self.scheduler.slot(client_id, PRIORITY_BACKGROUND):
+            return await self._run_pull(client_id, filename, dest_dir, timeout, sha256)
 
+    async def _run_pull(self, client_id: str, filename: str, dest_dir: str, timeout: float = 120, sha256: Optional[str] = None) -> bool:
+        # asks a client to upload one of its files into dest_dir
+        # with sha256 set, the http server rejects the file if it doesn't match
+        try:
+            filename = PathValidator.sanitize_filename(filename)
+            token = self.http_server.create_upload_token(filename, 0, dest_dir=dest_dir, sha256=sha256)
+        except SecurityError as e:
+            Log.error(f"Invalid filename from client: {e}")
+            return False
+        
+        extra = {'sha256': sha256} if sha256 else {}
+        
+        command = ProtocolParser.build_command(
+            Commands.UPLOAD_TOKEN,
+            token=token,
+            filename=filename,
+            size=0,
+            **extra
+        )
+        
+        await self.ws_server.send(client_id, command, priority=SEND_BULK)
+        
+        try:
+            await self.http_server.wait_transfer(token, timeout=timeout)
+        except TransferError as e:
+            Log.error(f"  {filename} - {e}")
+            return False
+        
+        # verified on arrival, remember the hash so the next sync doesn't reread it
+        if sha256:
+            path = os.path.join(dest_dir, filename)
+            key = self._source_key(path)
+            
+            if key:
+                self.source_hashes[key] = (os.path.getsize(path), sha256)
+        
+        Log.success(f"  {filename}")
+        return True
 
+    async def _pull_files(self, client_id: str, filenames: List[str], dest_dir: str, hashes: Optional[Dict[str, str]] = None) -> List[str]:
+        # pulls several files at once, bounded by the transfer workers count
+        # hashes maps filenames to their expected sha256, when known
+        semaphore = asyncio.Semaphore(self.transfer_workers)
+        hashes = hashes or {}
+        
+        async def pull(filename):
+            async with semaphore:
+                return await self._pull_file(client_id, filename, dest_dir, sha256=hashes.get(filename))
+        
+        results = await asyncio.gather(*[pull(name) for name in filenames])
+        
+        return [name for name, ok in zip(filenames, results) if ok]
 
     def _remove_temp_dir(self, directory: str):
         try:
@@ -1362,35 +2105,34 @@ class BotWaveServer:
             start_at = 0
             Log.broadcast(f"Starting broadcast ASAP")
         
-        command = ProtocolParser.build_command(
-            Commands.START,
-            filename=filename,
-            freq=frequency,
-            ps=ps,
-            rt=rt,
-            pi=pi,
-            loop='true' if loop else 'false',
-            start_at=start_at
-        )
+        command = {
+            'filename': filename,
+            'freq': frequency,
+            'ps': ps,
+            'rt': rt,
+            'pi': pi,
+            'loop': 'true' if loop else 'false',
+            'start_at': start_at
+        }
         
         success_count = 0
         total_count = len(target_clients)
         
         Log.broadcast(f"Starting broadcast on {total_count} client(s)...")
         
-        for client_id in target_clients:
-            if client_id not in self.clients:
-                Log.error(f"  {client_id}: Client not found")
-                continue
-            
-            client = self.clients[client_id]
-            
-            await self.ws_server.send(client_id, command)
+        clients = self._connected(target_clients)
+        results = await self._fan_out(clients, Commands.START, **command)
+        
+        for client_id, result in results.items():
+            name = self.clients[client_id].get_display_name() if client_id in self.clients else client_id
             
-            Log.success(f"  {client.get_display_name()}: START command sent")
-            success_count += 1
+            if isinstance(result, Exception):
+                Log.error(f"  {name}: START failed - {self._describe_failure(result)}")
+            else:
+                Log.success(f"  {name}: {result.get('message', 'Broadcast started')}")
+                success_count += 1
         
-        Log.broadcast(f"Broadcast start commands sent: {success_count}/{total_count}")
+        Log.broadcast(f"Broadcast started on {success_count}/{total_count} client(s)")
         self.onstart_handlers()
         return success_count > 0
 
@@ -1404,23 +2146,21 @@ class BotWaveServer:
             Log.warning("No client(s) found matching the query")
             return False
         
-        command = ProtocolParser.build_command(Commands.STOP)
-        
         success_count = 0
         
-        for client_id in target_clients:
-            if client_id not in self.clients:
-                Log.error(f"  {client_id}: Client not found")
-                continue
-            
-            client = self.clients[client_id]
-            
-            await self.ws_server.send(client_id, command)
+        clients = self._connected(target_clients)
+        results = await self._fan_out(clients, Commands.STOP)
+        
+        for client_id, result in results.items():
+            name = self.clients[client_id].get_display_name() if client_id in self.clients else client_id
             
-            Log.success(f"  {client.get_display_name()}: STOP command sent")
-            success_count += 1
+            if isinstance(result, Exception):
+                Log.error(f"  {name}: STOP failed - {self._describe_failure(result)}")
+            else:
+                Log.success(f"  {name}: {result.get('message', 'Broadcast stopped')}")
+                success_count += 1
         
-        Log.broadcast(f"Broadcast stop commands sent: {success_count}/{len(target_clients)}")
+        Log.broadcast(f"Broadcast stopped on {success_count}/{len(target_clients)} client(s)")
         self.onstop_handlers()
         return success_count > 0
 
@@ -1432,29 +2172,50 @@ class BotWaveServer:
         
         Log.client(f"Kicking {len(target_clients)} client(s)...")
         
-        for client_id in target_clients:
-            if client_id not in self.clients:
-                Log.error(f"  {client_id}: Client not found")
-                continue
-            
-            client = self.clients[client_id]
-            
-            command = ProtocolParser.build_command(Commands.KICK, reason=reason)
-            await self.ws_server.send(client_id, command)
+        command = ProtocolParser.build_command(Commands.KICK, reason=reason)
+        started = time.monotonic()
+        
+        async def kick(client):
+            # clients don't answer a kick, the deadline only bounds the send and the close
+            try:
+                await asyncio.wait_for(self.ws_server.send(client.client_id, command, wait=True), timeout=CONTROL_TIMEOUT)
+            except asyncio.TimeoutError:
+                Log.warning(f"  {client.get_display_name()}: kick message not delivered in time")
             
             try:
-                await client.websocket.close()
+                await asyncio.wait_for(client.websocket.close(), timeout=CONTROL_TIMEOUT)
             except:
                 pass
+        
+        clients = [self.clients[client_id] for client_id in self._connected(target_clients)]
+        
+        await asyncio.gather(*[kick(client) for client in clients])
+        
+        for client in clients:
+            # a kicked client can't resume its session, the rest is the usual
+            # disconnect cleanup (a no-op if the socket's own handler got there first)
+            self.sessions.pop(client.resume_token, None)
             
-            del self.clients[client_id]
+            if self.clients.get(client.client_id) is client:
+                await self._handle_client_disconnect(client.client_id)
             
             Log.success(f"  {client.get_display_name()}: Kicked - {reason}")
         
-        Log.client(f"Kick completed")
-        # self.ondisconnect_handlers() (is alr handeled by self.ws_server)
+        Log.client(f"Kick completed in {(time.monotonic() - started) * 1000:.0f}ms")
         return True
 
+    def _connected(self, client_ids: List[str]) -> List[str]:
+        # drops (and reports) targets that aren't connected anymore
+        connected = []
+        
+        for client_id in client_ids:
+            if client_id in self.clients:
+                connected.append(client_id)
+            else:
+                Log.error(f"  {client_id}: Client not found")
+        
+        return connected
+
     def _parse_client_targets(self, targets: str) -> List[str]:
         if not targets:
             Log.error("No targets specified")
@@ -1484,34 +2245,54 @@ class BotWaveServer:
         return valid_targets
 
 
-    async def list_files(self, client_targets: str):
+    async def list_files(self, client_targets: str, pattern: Optional[str] = None, max_age: Optional[str] = None):
         target_clients = self._parse_client_targets(client_targets)
         if not target_clients:
             Log.warning("No client(s) found matching the query")
             return False
         
+        filters = {}
+        
+        if pattern and pattern != '*':
+            filters['pattern'] = pattern
+        
+        if max_age:
+            age = self._parse_age(max_age)
+            if age is None:
+                Log.error(f"Invalid age: {max_age} (expected e.g. 30m, 2h, 7d)")
+                return False
+            filters['since'] = int(time.time() - age)
+        
         Log.info(f"Listing files from {len(target_clients)} client(s)")
         
-        futures = {}
-        for client_id in target_clients:
-            if client_id not in self.clients:
-                Log.error(f"  {client_id}: Client not found")
-                continue
-            
-            future = asyncio.Future()
-            futures[client_id] = future
-            self.pending_responses[f"{client_id}_files"] = future
-            
-            client = self.clients[client_id]
-            command = ProtocolParser.build_command(Commands.LIST_FILES)
-            await self.ws_server.send(client_id, command)
+        clients = self._connected(target_clients)
+        
+        # clients pushing their file changes are listed from the fleet index,
+        # it has no modification times so an age filter still asks them
+        indexed = [] if 'since' in filters else [client_id for client_id in clients if self.fleet_index.tracks(client_id)]
+        results = {client_id: self._indexed_files(client_id, pattern) for client_id in indexed}
+        asked = [client_id for client_id in clients if client_id not in results]
+        
+        # only the first page, clients count the rest
+        if asked:
+            results.update(await self._fan_out(asked, Commands.LIST_FILES, priority=SEND_BULK, compact='true', limit=LIST_DISPLAY_LIMIT, **filters))
         
-        for client_id, future in futures.items():
+        for client_id in clients:
+            reply = results[client_id]
+            
             try:
-                files = await asyncio.wait_for(future, timeout=10.0)
-                client = self.clients[client_id]
+                if isinstance(reply, Exception):
+                    raise reply
+                
+                if client_id in indexed:
+                    files = reply[:LIST_DISPLAY_LIMIT]
+                    total = len(reply)
+                else:
+                    files = self._decode_files(reply)
+                    total = int(reply.get('total') or len(files))
+                name = self.clients[client_id].get_display_name() if client_id in self.clients else client_id
                 
-                Log.success(f"  {client.get_display_name()}: {len(files)} file(s)")
+                Log.success(f"  {name}: {total} file(s)")
                 
                 if files:
                     for file_info in files:
@@ -1526,6 +2307,9 @@ class BotWaveServer:
                             size_str = f"{size / (1024 * 1024):.1f} MB"
                         
                         Log.print(f"    {filename} ({size_str})", 'white')
+                    
+                    if total > len(files):
+                        Log.print(f"    ... and {total - len(files)} more, narrow the listing with a pattern", 'yellow')
                 else:
                     Log.print("    No files found", 'yellow')
                     
@@ -1536,36 +2320,256 @@ class BotWaveServer:
         
         return True
     
-    async def _request_file_list(self, client_id: str, timeout: int = 30) -> Optional[list]:
+    async def _request_file_list(self, client_id: str, timeout: int = 30, hashes: bool = False, pattern: Optional[str] = None, since: Optional[float] = None) -> Optional[list]:
+        # whole listing, fetched page by page (timeout applies to each page)
         
         if client_id not in self.clients:
             Log.error(f"Client {client_id} not found")
             return None
         
-        future = asyncio.Future()
-        self.pending_responses[f"{client_id}_files"] = future
-        
-        if client_id in self.file_list_responses:
-            del self.file_list_responses[client_id]
+        options = {'compact': 'true', 'limit': LIST_PAGE_SIZE}
         
-        command = ProtocolParser.build_command(Commands.LIST_FILES)
-        await self.ws_server.send(client_id, command)
+        if hashes:
+            options['hashes'] = 'true'
+        if pattern:
+            options['pattern'] = pattern
+        if since:
+            options['since'] = since
         
         Log.file(f"Waiting for file list from {client_id}...")
         
         try:
-            files = await asyncio.wait_for(future, timeout=timeout)
-            return files
+            files = []
+            offset = 0
+            
+            while True:
+                reply = await self._rpc(client_id, Commands.LIST_FILES, timeout=timeout, priority=SEND_BULK, offset=offset, **options)
+                files.extend(self._decode_files(reply))
+                
+                # clients without paging send everything at once, without next
+                if not reply.get('next'):
+                    return files
+                
+                offset = int(reply['next'])
         
         except asyncio.TimeoutError:
             Log.error(f"Timeout waiting for file list from {client_id}")
-            if f"{client_id}_files" in self.pending_responses:
-                del self.pending_responses[f"{client_id}_files"]
             return None
         
         except Exception as e:
             Log.error(f"Error getting file list: {e}")
             return None
+    
+    def _apply_file_changes(self, client_id: str, kwargs: dict):
+        # FILES_CHANGED: a client's file events, reset=true starts a new snapshot
+        try:
+            changes = unpack_entries(json.loads(kwargs.get('changes') or '[]'), kwargs.get('fields', 'event,name,size,sha256').split(','))
+        except (ValueError, TypeError) as e:
+            Log.error(f"Invalid file changes from {client_id}: {e}")
+            return
+        
+        if kwargs.get('reset', '').lower() == 'true':
+            self.fleet_index.reset(client_id, [change for change in changes if change.get('event') != 'removed'])
+            return
+        
+        for change in changes:
+            if change.get('name'):
+                self.fleet_index.apply(client_id, change.get('event'), change['name'], change.get('size'), change.get('sha256'))
+    
+    def _apply_status(self, client_id: str, kwargs: dict):
+        # STATUS: a client's heartbeat, cached for list and the queue
+        client = self.clients.get(client_id)
+        if not client:
+            return
+        
+        status = {'broadcasting': kwargs.get('broadcasting', '').lower() == 'true'}
+        
+        if kwargs.get('file'):
+            status['file'] = kwargs['file']
+        
+        for key, cast in (('position', float), ('duration', float), ('loops', int), ('frequency', float), ('disk_free', int), ('cpu_temp', float), ('interval', float)):
+            try:
+                if kwargs.get(key) not in (None, ''):
+                    status[key] = cast(kwargs[key])
+            except ValueError:
+                pass
+        
+        client.status = status
+        client.status_at = time.monotonic()
+    
+    def _format_duration(self, seconds: float) -> str:
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+    
+    def _indexed_files(self, client_id: str, pattern: Optional[str] = None) -> List[dict]:
+        # a client's files from the fleet index, sorted like a listing
+        manifest = self.fleet_index.manifest(client_id)
+        names = sorted(fnmatch.filter(manifest, pattern) if pattern else manifest)
+        return [manifest[name] for name in names]
+    
+    def _decode_files(self, reply: dict) -> List[dict]:
+        # file list of a LIST_FILES reply, compact (fields=...) or not
+        files = json.loads(reply.get('files') or '[]')
+        
+        if reply.get('fields'):
+            files = unpack_entries(files, reply['fields'].split(','))
+        
+        return files
+    
+    def _parse_age(self, value: str) -> Optional[float]:
+        # "90", "30m", "2h", "7d" -> seconds
+        units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+        value = value.strip().lower()
+        
+        try:
+            if value and value[-1] in units:
+                return float(value[:-1]) * units[value[-1]]
+            return float(value)
+        except ValueError:
+            return None
+    
+    async def _rpc(self, client_id: str, command: str, timeout: float = 30, priority: int = SEND_CONTROL, **kwargs) -> dict:
+        """
+        Send a command to a client and wait for its reply.
+        
+        The command carries a request id (rid) that the client echoes back,
+        so any number of requests can be in flight for the same client.
+        
+        Args:
+            client_id (str): Target client
+            command (str): Command name
+            timeout (float): Seconds to wait for the reply
+            priority (int): Outbound queue priority (SEND_CONTROL or SEND_BULK)
+            **kwargs: Command arguments
+        
+        Returns:
+            dict: Arguments of the reply
+        
+        Raises:
+            RPCError: If the client answered with ERROR or disconnected
+            asyncio.TimeoutError: If there was no reply in time
+        """
+        if client_id not in self.clients:
+            raise RPCError("Client not found")
+        
+        rid = uuid.uuid4().hex[:12]
+        future = asyncio.get_running_loop().create_future()
+        self.pending_responses[rid] = (client_id, command, future)
+        
+        async def request():
+            await self.ws_server.send(client_id, ProtocolParser.build_command(command, rid=rid, **kwargs), priority=priority)
+            return await future
+        
+        # the deadline covers the send too, a stuck connection can't hold us
+        try:
+            return await asyncio.wait_for(request(), timeout=timeout)
+        finally:
+            self.pending_responses.pop(rid, None)
+    
+    def _resolve_rpc(self, client_id: str, command: str, kwargs: dict) -> bool:
+        # completes the _rpc waiting for this reply, False if nobody is
+        client = self.clients.get(client_id)
+        
+        if kwargs.get('rid'):
+            entry = self.pending_responses.get(kwargs['rid'])
+            
+            if client:
+                client.echoes_rid = True
+        
+        elif client and not client.echoes_rid:
+            entry = self._match_legacy_reply(client_id, command, kwargs)
+        
+        else:
+            entry = None
+        
+        if entry is None or entry[0] != client_id:
+            return False
+        
+        future = entry[2]
+        
+        # END answering a START = it couldn't even begin
+        if not future.done():
+            if command in (Commands.ERROR, Commands.END):
+                future.set_exception(RPCError(kwargs.get('message', 'Error')))
+            else:
+                future.set_result(kwargs)
+        
+        # the queue still has to hear about that END
+        return command != Commands.END
+    
+    def _match_legacy_reply(self, client_id: str, command: str, kwargs: dict) -> Optional[tuple]:
+        # clients without request ids handle one command at a time, so a reply
+        # answers the oldest pending request it fits: file lists carry files,
+        # other OKs are told apart by their message. an ERROR can't be, it goes
+        # to the oldest request
+        if command not in (Commands.OK, Commands.ERROR) or 'token' in kwargs:
+            return None # transfer acks belong to their TransferJob
+        
+        message = kwargs.get('message', '')
+        
+        for pending in self.pending_responses.values():
+            if pending[0] != client_id or pending[2].done():
+                continue
+            
+            if command == Commands.ERROR:
+                return pending
+            
+            if pending[1] == Commands.LIST_FILES:
+                if 'files' in kwargs:
+                    return pending
+            
+            elif message.startswith(LEGACY_REPLIES.get(pending[1], ())):
+                return pending
+        
+        return None
+    
+    async def _fan_out(self, client_ids: List[str], command: str, timeout: float = CONTROL_TIMEOUT, priority: int = SEND_CONTROL, **kwargs) -> Dict[str, object]:
+        """
+        Send a command to many clients at once and wait for their replies.
+        
+        Each client has its own deadline, so a slow or dead client only
+        delays its own result. A timing summary is logged at the end.
+        
+        Args:
+            client_ids (list): Target clients (must be connected)
+            command (str): Command name
+            timeout (float): Seconds each client has to answer
+            priority (int): Outbound queue priority (SEND_CONTROL or SEND_BULK)
+            **kwargs: Command arguments
+        
+        Returns:
+            dict: {client_id: reply arguments, or the exception it failed with}
+        """
+        started = time.monotonic()
+        acked = {}
+        
+        async def request(client_id):
+            try:
+                reply = await self._rpc(client_id, command, timeout=timeout, priority=priority, **kwargs)
+                acked[client_id] = time.monotonic() - started
+                return reply
+            except Exception as e:
+                return e
+        
+        results = dict(zip(client_ids, await asyncio.gather(*[request(client_id) for client_id in client_ids])))
+        
+        if acked:
+            Log.info(
+                f"{command}: {len(acked)}/{len(client_ids)} acknowledged, "
+                f"first after {min(acked.values()) * 1000:.0f}ms, last after {max(acked.values()) * 1000:.0f}ms"
+            )
+        
+        late = [client_id for client_id, result in results.items() if isinstance(result, asyncio.TimeoutError)]
+        if late:
+            Log.warning(f"{command}: no answer within {timeout:.0f}s from {', '.join(late)}")
+        
+        return results
+    
+    def _describe_failure(self, error: Exception) -> str:
+        if isinstance(error, asyncio.TimeoutError):
+            return "no answer in time"
+        return str(error) or type(error).__name__
         
 
     def display_help(self):
@@ -1614,11 +2618,13 @@ class BotWaveServer:
         Log.print("    morse pi1 message.txt", "cyan")
         Log.print("")
 
-        Log.print("upload <targets> <file|folder>", "bright_green")
+        Log.print("upload <targets> <file|folder> [server|client]", "bright_green")
         Log.print("  Upload a WAV file or a folder's files to client(s)", "white")
+        Log.print("  Compressed files are converted on the server, or on the clients with 'client'", "white")
         Log.print("  Examples:", "white")
         Log.print("    upload all broadcast.wav", "cyan")
         Log.print("    upload pi1,pi2 /home/bw/lib", "cyan")
+        Log.print("    upload all song.mp3 client", "cyan")
         Log.print("")
 
         Log.print("sync <targets|folder/> <source_target|folder/>", "bright_green")
@@ -1629,16 +2635,20 @@ class BotWaveServer:
         Log.print("    sync /backup/ pi1", "cyan")
         Log.print("")
 
-        Log.print("dl <targets> <url>", "bright_green")
+        Log.print("dl <targets> <url> [client|server]", "bright_green")
         Log.print("  Request client(s) to download a file from a URL", "white")
-        Log.print("  Example:", "white")
+        Log.print("  With 'server', the server downloads and converts it once, then sends it", "white")
+        Log.print("  Examples:", "white")
         Log.print("    dl all http://example.com/file.wav", "cyan")
+        Log.print("    dl all http://example.com/song.mp3 server", "cyan")
         Log.print("")
 
-        Log.print("lf <targets>", "bright_green")
-        Log.print("  List broadcastable files on client(s)", "white")
-        Log.print("  Example:", "white")
+        Log.print("lf <targets> [pattern] [max_age]", "bright_green")
+        Log.print("  List broadcastable files on client(s), optionally matching a pattern", "white")
+        Log.print("  or modified within max_age (e.g. 30m, 2h, 7d)", "white")
+        Log.print("  Examples:", "white")
         Log.print("    lf all", "cyan")
+        Log.print("    lf pi1 'news_*.wav' 1d", "cyan")
         Log.print("")
 
         Log.print("rm <targets> <filename|all>", "bright_green")
@@ -1653,6 +2663,12 @@ class BotWaveServer:
         Log.print("    kick pi1 Maintenance", "cyan")
         Log.print("")
 
+        Log.print("jobs [cancel <id|all>]", "bright_green")
+        Log.print("  List or cancel running file conversions", "white")
+        Log.print("  Example:", "white")
+        Log.print("    jobs cancel all", "cyan")
+        Log.print("")
+
         Log.print("handlers [filename]", "bright_green")
         Log.print("  List all handlers or commands in a specific handler file", "white")
         Log.print("  Example:", "white")
@@ -1704,6 +2720,17 @@ def main():
     parser.add_argument('--skip-checks', action='store_true', help='Skip system requirements checks')
     parser.add_argument('--ws', type=int, help='WebSocket port for remote shell access')
     parser.add_argument('--daemon', action='store_true', help='Run in non-interactive daemon mode')
+    parser.add_argument('--convert-workers', type=int, help='Maximum concurrent ffmpeg conversions (defaults to CPU count)')
+    parser.add_argument('--transfer-workers', type=int, default=4, help='Concurrent file transfers during folder uploads')
+    parser.add_argument('--peer-fanout', type=int, default=0, help='Let clients with a peer endpoint serve files to N peers each (0 = disabled)')
+    parser.add_argument('--transcode', choices=['server', 'client'], default='server', help='Where compressed uploads are converted to WAV by default')
+    parser.add_argument('--max-transfers', type=int, default=16, help='Maximum concurrent file transfers served by the server')
+    parser.add_argument('--client-transfers', type=int, default=2, help='Maximum concurrent file transfers per client')
+    parser.add_argument('--transfer-rate', type=float, default=0, help='Bandwidth limit for file transfers in MB/s (0 = unlimited)')
+    parser.add_argument('--live-transfer-rate', type=float, default=LIVE_TRANSFER_RATE / (1024 * 1024), help='Bandwidth limit for file transfers in MB/s while a live stream is running (0 = unlimited)')
+    parser.add_argument('--dl-mode', choices=['client', 'server'], default='client', help='Who downloads dl URLs by default: each client, or the server once')
+    parser.add_argument('--cache-dir', default='/opt/BotWave/cache', help='Directory where the server keeps downloaded URLs')
+    parser.add_argument('--ws-workers', type=int, default=0, help='Processes accepting client connections, sharing the port with SO_REUSEPORT (0 = in the main process)')
     args = parser.parse_args()
     
     server = BotWaveServer(
@@ -1714,7 +2741,18 @@ def main():
         passkey=args.pk,
         wait_start=args.wait_start,
         skip_checks=args.skip_checks,
-        handlers_dir=args.handlers_dir
+        handlers_dir=args.handlers_dir,
+        convert_workers=args.convert_workers,
+        transfer_workers=args.transfer_workers,
+        peer_fanout=args.peer_fanout,
+        transcode=args.transcode,
+        max_transfers=args.max_transfers,
+        client_transfers=args.client_transfers,
+        transfer_rate=args.transfer_rate * 1024 * 1024,
+        live_transfer_rate=args.live_transfer_rate * 1024 * 1024,
+        dl_mode=args.dl_mode,
+        cache_dir=args.cache_dir,
+        ws_workers=args.ws_workers
     )
     
     if args.daemon:
@@ -0,0 +1,61 @@
+import json
+import struct
+from typing import List, Optional
+
+# bulk transfer format, many files streamed over a single connection
+# a bundle is a sequence of entries, each one being:
+#   4 bytes big-endian header length | json header {name, size, sha256} | size bytes of data
+# a zero header length ends the bundle
+
+HEADER_LENGTH = struct.Struct(">I")
+MAX_HEADER_SIZE = 64 * 1024 # a header only holds a filename and a hash
+BUNDLE_END = HEADER_LENGTH.pack(0)
+
+class BundleError(Exception):
+    pass
+
+
+def encode_header(name: str, size: int, sha256: Optional[str]) -> bytes:
+    header = json.dumps({'name': name, 'size': size, 'sha256': sha256}).encode('utf-8')
+    return HEADER_LENGTH.pack(len(header)) + header
+
+
+async def read_header(stream) -> Optional[dict]:
+    """
+    Read the next entry header from a stream.
+
+    Args:
+        stream: Anything with an async readexactly(n) (aiohttp / asyncio StreamReader)
+
+    Returns:
+        dict: {'name', 'size', 'sha256'}, or None at the end of the bundle
+
+    Raises:
+        BundleError: If the header is invalid
+    """
+    length = HEADER_LENGTH.unpack(await stream.readexactly(HEADER_LENGTH.size))[0]
+
+    if length == 0:
+        return None
+
+    if length > MAX_HEADER_SIZE:
+        raise BundleError(f"Bundle header too large ({length} bytes)")
+
+    try:
+        header = json.loads((await stream.readexactly(length)).decode('utf-8'))
+        entry = {'name': str(header['name']), 'size': int(header['size']), 'sha256': header.get('sha256')}
+    except (ValueError, KeyError, TypeError) as e:
+        raise BundleError(f"Invalid bundle header: {e}")
+
+    if entry['size'] < 0:
+        raise BundleError(f"Invalid entry size for {entry['name']}")
+
+    return entry
+
+
+def bundle_size(entries: List[dict]) -> int:
+    # total length of the encoded bundle, entries need 'filename', 'size' and 'sha256'
+    return sum(
+        len(encode_header(entry['filename'], entry['size'], entry.get('sha256'))) + entry['size']
+        for entry in entries
+    ) + len(BUNDLE_END)
@@ -1,5 +1,12 @@
+import asyncio
+import re
 import subprocess
 import os
+import threading
+import time
+import uuid
+import wave
+from typing import Callable, Dict, Iterable, List, Optional
 
 from shared.logger import Log
 
@@ -9,17 +16,23 @@ SUPPORTED_EXTENSIONS = [
     "webm","mpeg","mpg"
 ]
 
+# containers that may need seeking (index at the end of the file), can't be decoded from a pipe
+SEEKABLE_ONLY_EXTENSIONS = ["mp4", "m4a", "mov", "alac"]
+
+DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
 class ConvertError(Exception):
     pass
 
 
 class Converter:
     @staticmethod
-    def convert_wav(source: str, destination: str, talk: bool = False):
+    def _build_command(source: str, destination: str) -> Optional[List[str]]:
+        # validates the job and returns the ffmpeg command, None = nothing to do
         ext = os.path.splitext(source)[1].lower().lstrip(".")
 
         if ext == "wav":
-            return
+            return None
 
         if ext not in SUPPORTED_EXTENSIONS:
             raise ConvertError("The source file does not seem to be a supported filetype for conversion.")
@@ -30,7 +43,11 @@ class Converter:
         if not os.path.exists(source):
             raise ConvertError(f"Source file does not exist: {source}")
 
-        cmd = [
+        return Converter._ffmpeg_command(source, destination)
+
+    @staticmethod
+    def _ffmpeg_command(source: str, destination: str) -> List[str]:
+        return [
             "ffmpeg",
             "-y",
             "-i", source,
@@ -41,6 +58,29 @@ class Converter:
             destination
         ]
 
+    @staticmethod
+    def wav_duration(path: str) -> Optional[float]:
+        # seconds of audio in a wav file, None if the header can't be read
+        try:
+            with wave.open(path, 'rb') as f:
+                rate = f.getframerate()
+                return f.getnframes() / rate if rate else None
+        except (OSError, EOFError, wave.Error):
+            return None
+
+    @staticmethod
+    def can_stream(ext: str) -> bool:
+        # whether convert_wav_stream can decode this type from a pipe
+        ext = ext.lower().lstrip(".")
+        return ext in SUPPORTED_EXTENSIONS and ext not in SEEKABLE_ONLY_EXTENSIONS
+
+    @staticmethod
+    def convert_wav(source: str, destination: str, talk: bool = False):
+        cmd = Converter._build_command(source, destination)
+
+        if cmd is None:
+            return
+
         Log.converter(f"Converting {source} -> {destination}")
 
         if talk:
@@ -73,3 +113,265 @@ class Converter:
                     Log.converter(f"ffmpeg stderr:\n{e.stderr}")
 
             raise ConvertError("Failed to convert file to WAV.") from e
+
+    @staticmethod
+    def convert_wav_stream(chunks: Iterable[bytes], destination: str, talk: bool = False):
+        # feeds chunks (e.g. a download) into ffmpeg's stdin as they arrive, so
+        # decoding overlaps the transfer and no compressed copy is written to disk.
+        # blocking, meant to run in an executor thread
+        if not destination.lower().endswith(".wav"):
+            raise ConvertError("Destination file must have a .wav extension.")
+
+        # ffmpeg writes a hidden .part file (so file listings skip it), renamed
+        # into place once the conversion succeeded, like downloads
+        part_path = os.path.join(os.path.dirname(destination), f".{os.path.basename(destination)}.part")
+        cmd = Converter._ffmpeg_command("pipe:0", part_path)
+        cmd[-1:-1] = ["-f", "wav"] # can't be guessed from the .part extension
+
+        Log.converter(f"Converting stream -> {destination}")
+
+        if talk:
+            Log.converter(f"ffmpeg command: {' '.join(cmd)}")
+
+        try:
+            process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE
+            )
+        except FileNotFoundError as e:
+            raise ConvertError("ffmpeg is not installed.") from e
+
+        # stderr is drained on the side, a full pipe would stall ffmpeg and us with it
+        stderr_lines = []
+        reader = threading.Thread(target=lambda: stderr_lines.extend(process.stderr), daemon=True)
+        reader.start()
+
+        try:
+            try:
+                for chunk in chunks:
+                    process.stdin.write(chunk)
+            except BrokenPipeError:
+                pass # ffmpeg exited early, its return code tells why
+            finally:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+
+            returncode = process.wait()
+
+        except BaseException:
+            # source failed (or we got interrupted), no partial wav left behind
+            process.kill()
+            process.wait()
+            Converter._remove_part(part_path)
+            raise
+
+        finally:
+            reader.join()
+
+        if talk and stderr_lines:
+            Log.converter(f"ffmpeg stderr:\n{b''.join(stderr_lines).decode('utf-8', errors='replace')}")
+
+        if returncode != 0:
+            Log.converter("ffmpeg conversion failed.")
+            Converter._remove_part(part_path)
+            raise ConvertError("Failed to convert file to WAV.")
+
+        os.replace(part_path, destination)
+        Log.converter("Conversion completed successfully")
+
+    @staticmethod
+    def _remove_part(path: str):
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    async def convert_wav_async(source: str, destination: str, talk: bool = False, progress_callback: Optional[Callable[[float], None]] = None):
+        # same as convert_wav, but runs ffmpeg as an asyncio subprocess so the event loop keeps running
+        cmd = Converter._build_command(source, destination)
+
+        if cmd is None:
+            return
+
+        # machine readable progress on stdout, logs stay on stderr
+        cmd = cmd[:-1] + ["-progress", "pipe:1", "-nostats", cmd[-1]]
+
+        Log.converter(f"Converting {source} -> {destination}")
+
+        if talk:
+            Log.converter(f"ffmpeg command: {' '.join(cmd)}")
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except FileNotFoundError as e:
+            raise ConvertError("ffmpeg is not installed.") from e
+
+        duration = [0.0]
+        stderr_lines = []
+
+        async def read_stderr():
+            async for raw in process.stderr:
+                line = raw.decode('utf-8', errors='replace')
+                stderr_lines.append(line)
+
+                if not duration[0]:
+                    match = DURATION_RE.search(line)
+                    if match:
+                        h, m, s = match.groups()
+                        duration[0] = int(h) * 3600 + int(m) * 60 + float(s)
+
+        async def read_progress():
+            async for raw in process.stdout:
+                key, _, value = raw.decode('utf-8', errors='replace').strip().partition("=")
+
+                # out_time_ms is in microseconds too (ffmpeg quirk)
+                if key in ("out_time_us", "out_time_ms") and duration[0] and progress_callback:
+                    try:
+                        progress_callback(min(int(value) / 1_000_000 / duration[0], 1.0))
+                    except ValueError:
+                        pass
+
+        try:
+            await asyncio.gather(read_stderr(), read_progress())
+            returncode = await process.wait()
+
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+            if os.path.exists(destination):
+                try:
+                    os.remove(destination)
+                except OSError:
+                    pass
+
+            Log.converter(f"Conversion cancelled: {source}")
+            raise
+
+        if talk and stderr_lines:
+            Log.converter(f"ffmpeg stderr:\n{''.join(stderr_lines)}")
+
+        if returncode != 0:
+            Log.converter("ffmpeg conversion failed.")
+            raise ConvertError("Failed to convert file to WAV.")
+
+        if progress_callback:
+            progress_callback(1.0)
+
+        Log.converter("Conversion completed successfully")
+
+
+class ConversionJob:
+    def __init__(self, source: str, destination: str):
+        self.id = uuid.uuid4().hex[:8]
+        self.source = source
+        self.destination = destination
+        self.state = "queued" # queued, running, done, failed, cancelled
+        self.progress = 0.0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.task: Optional[asyncio.Task] = None
+
+    def cancel(self) -> bool:
+        if self.task and not self.task.done():
+            self.task.cancel()
+            return True
+        return False
+
+    async def wait(self) -> str:
+        # shielded so a cancelled waiter doesn't kill a job others may wait on
+        try:
+            await asyncio.shield(self.task)
+        except asyncio.CancelledError:
+            if self.task.cancelled():
+                raise ConvertError("Conversion cancelled")
+            raise
+
+        return self.destination
+
+
+class ConversionPool:
+    
+    # bounded pool of concurrent ffmpeg jobs
+    # jobs are queued on a semaphore, so submitting never blocks the caller
+
+    MAX_FINISHED_JOBS = 50
+
+    def __init__(self, workers: Optional[int] = None, talk: bool = False):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.talk = talk
+        self.jobs: Dict[str, ConversionJob] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def submit(self, source: str, destination: str) -> ConversionJob:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+        job = ConversionJob(source, destination)
+        job.task = asyncio.create_task(self._run(job))
+        # errors are reported through wait(), avoid "exception never retrieved" noise
+        job.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self.jobs[job.id] = job
+        self._prune()
+        return job
+
+    async def convert(self, source: str, destination: str) -> str:
+        job = self.submit(source, destination)
+
+        try:
+            return await job.wait()
+        except asyncio.CancelledError:
+            # caller got cancelled, no need to keep ffmpeg running for nobody
+            job.cancel()
+            raise
+
+    def cancel(self, job_id: str) -> bool:
+        if job_id == "all":
+            return any([job.cancel() for job in list(self.jobs.values())])
+
+        job = self.jobs.get(job_id)
+        return job.cancel() if job else False
+
+    def active_jobs(self) -> List[ConversionJob]:
+        return [job for job in self.jobs.values() if job.state in ("queued", "running")]
+
+    async def _run(self, job: ConversionJob):
+        try:
+            async with self._semaphore:
+                job.state = "running"
+
+                def progress(value: float):
+                    job.progress = value
+
+                await Converter.convert_wav_async(job.source, job.destination, self.talk, progress)
+
+            job.state = "done"
+
+        except asyncio.CancelledError:
+            job.state = "cancelled"
+            raise
+        except Exception as e:
+            job.state = "failed"
+            job.error = str(e)
+            raise
+
+    def _prune(self):
+        finished = [
+            job for job in self.jobs.values()
+            if job.state not in ("queued", "running")
+        ]
+
+        for job in sorted(finished, key=lambda j: j.created_at)[:-self.MAX_FINISHED_JOBS or None]:
+            del self.jobs[job.id]
@@ -0,0 +1,193 @@
+import http.client
+import os
+import socket
+import time
+import urllib.error
+import urllib.request
+from typing import Callable, Iterator, Optional
+
+from shared.logger import Log
+from shared.protocol import PROTOCOL_VERSION
+
+DOWNLOAD_CHUNK_SIZE = 256 * 1024 # 256KB, memory use stays bounded whatever the file size
+USER_AGENT = f"BotWaveDownloads/{PROTOCOL_VERSION} (+https://github.com/dpipstudio/botwave/)"
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+class DownloadError(Exception):
+    pass
+
+
+class NotModified(DownloadError):
+    # conditional request answered with 304, the cached copy is still good
+    pass
+
+
+def open_url(url: str, connect_timeout: float = 15, read_timeout: float = 30, offset: int = 0, headers: Optional[dict] = None):
+    """
+    Open a url for streaming.
+
+    Args:
+        url (str): http(s) url
+        connect_timeout (float): Seconds allowed to connect and get the response headers
+        read_timeout (float): Seconds allowed between two reads of the body
+        offset (int): Resume from this byte (sends a Range header)
+        headers (dict): Extra request headers
+
+    Returns:
+        The urllib response, to be read in chunks and closed by the caller
+    """
+    headers = {"User-Agent": USER_AGENT, **(headers or {})}
+
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+
+    request = urllib.request.Request(url, headers=headers)
+    response = urllib.request.urlopen(request, timeout=connect_timeout)
+
+    # urllib only has one timeout, switch the socket to the read timeout once connected
+    try:
+        response.fp.raw._sock.settimeout(read_timeout)
+    except AttributeError:
+        pass
+
+    return response
+
+
+def stream(
+    url: str,
+    connect_timeout: float = 15,
+    read_timeout: float = 30,
+    retries: int = 3,
+    backoff: float = 2.0,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    headers: Optional[dict] = None,
+    on_response: Optional[Callable[[object], None]] = None
+) -> Iterator[bytes]:
+    """
+    Yield the body of a url in chunks, with bounded memory.
+
+    Failed attempts are retried with exponential backoff. Once data was
+    yielded, a retry resumes with a Range request and fails if the server
+    can't resume, since the consumer can't rewind.
+
+    Args:
+        url (str): http(s) url
+        connect_timeout (float): Seconds allowed to connect
+        read_timeout (float): Seconds allowed between two reads
+        retries (int): Extra attempts after the first failure
+        backoff (float): Base delay between attempts, doubled each time
+        progress_callback (callable): Called with (bytes received, total), total is 0 if unknown
+        headers (dict): Extra request headers (e.g. conditional ones)
+        on_response (callable): Called with the response headers of the first attempt
+
+    Raises:
+        NotModified: If a conditional request got a 304
+        DownloadError: If the download failed on every attempt
+    """
+    received = 0
+    total = 0
+    attempt = 0
+
+    while True:
+        try:
+            # conditional headers only make sense for the first request, not a resume
+            with open_url(url, connect_timeout, read_timeout, received, None if received else headers) as response:
+                length = int(response.headers.get('Content-Length') or 0)
+
+                if not received:
+                    total = length
+
+                    if on_response:
+                        on_response(response.headers)
+                elif response.status != 206:
+                    raise DownloadError("Server can't resume the download")
+
+                while True:
+                    chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+
+                    received += len(chunk)
+
+                    if progress_callback:
+                        progress_callback(received, total)
+
+                    yield chunk
+
+            if total and received < total:
+                raise ConnectionError(f"incomplete download ({received}/{total} bytes)")
+
+            return
+
+        except urllib.error.HTTPError as e:
+            last_error = f"HTTP {e.code}"
+
+            if e.code == 304:
+                raise NotModified(last_error)
+
+            if e.code not in RETRY_STATUSES:
+                raise DownloadError(last_error)
+        except (urllib.error.URLError, http.client.HTTPException, socket.timeout, ConnectionError) as e:
+            last_error = getattr(e, 'reason', None) or str(e) or type(e).__name__
+
+        attempt += 1
+
+        if attempt > retries:
+            raise DownloadError(f"Download failed after {attempt} attempts: {last_error}")
+
+        delay = backoff * (2 ** (attempt - 1))
+        Log.warning(f"Download failed ({last_error}), retrying in {delay:.0f}s ({attempt}/{retries})")
+        time.sleep(delay)
+
+
+def download(url: str, dest_path: str, progress_callback: Optional[Callable[[int, int], None]] = None, **kwargs) -> int:
+    """
+    Download a url to a file with bounded memory.
+
+    Data is written to dest_path + ".part" and only moved into place once complete.
+    Extra keyword arguments (timeouts, retries, headers...) are passed to stream().
+
+    Args:
+        url (str): http(s) url
+        dest_path (str): Final file path
+        progress_callback (callable): Called with (bytes received, total), total is 0 if unknown
+
+    Returns:
+        int: Size of the downloaded file
+
+    Raises:
+        DownloadError: If the download failed
+    """
+    part_path = dest_path + ".part"
+
+    try:
+        with open(part_path, 'wb') as f:
+            for chunk in stream(url, progress_callback=progress_callback, **kwargs):
+                f.write(chunk)
+
+            size = f.tell()
+
+        os.replace(part_path, dest_path)
+        return size
+
+    except BaseException:
+        if os.path.exists(part_path):
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+        raise
+
+
+def progress_bar(label: str) -> Callable[[int, int], None]:
+    # progress callback drawing the usual download bar, only when the size is known
+    def callback(received: int, total: int):
+        if total <= 0:
+            return
+
+        if received >= total:
+            Log.progress_bar(total, total, prefix=f'Downloaded {label} !', suffix='Complete', style='yellow', icon='FILE', auto_clear=True)
+        else:
+            Log.progress_bar(received, total, prefix=f'Downloading {label}:', suffix='Complete', style='yellow', icon='FILE', auto_clear=False)
+
+    return callback
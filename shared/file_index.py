@@ -0,0 +1,296 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+from shared.logger import Log
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+HASH_CHUNK_SIZE = 1024 * 1024 # 1MB
+WATCH_POLL_INTERVAL = 5 # seconds between rescans without inotify
+WATCH_SETTLE_DELAY = 0.5 # seconds of quiet before inotify events are processed
+
+def hash_file(path: str) -> str:
+    # sha256 of a whole file, read in big chunks
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def pack_entries(entries: List[dict], fields: List[str]) -> list:
+    # compact listing: one array per file, in the order of fields
+    return [[entry.get(field) for field in fields] for entry in entries]
+
+
+def unpack_entries(rows: list, fields: List[str]) -> List[dict]:
+    return [dict(zip(fields, row)) for row in rows]
+
+
+class FileIndex:
+    
+    # name -> size / mtime / sha256 of the files in a directory
+    # hashes are only recomputed when a file's size or mtime changed,
+    # and the index can be persisted so restarts don't rehash everything
+
+    def __init__(self, directory: str, extensions: Optional[tuple] = ('.wav',), index_file: Optional[str] = '.botwave_index.json'):
+        self.directory = directory
+        self.extensions = extensions
+        self.index_path = os.path.join(directory, index_file) if index_file else None
+        self.entries: Dict[str, dict] = {}
+        self._lock = threading.Lock() # scans run in executor threads
+        self._dirty = False
+
+        self._load()
+
+    def _load(self):
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except Exception as e:
+            Log.warning(f"Ignoring unreadable file index ({e})")
+            self.entries = {}
+
+    def save(self):
+        if not self.index_path or not self._dirty:
+            return
+
+        with self._lock:
+            tmp_path = self.index_path + '.tmp'
+
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.entries, f)
+                os.replace(tmp_path, self.index_path)
+                self._dirty = False
+            except OSError as e:
+                Log.warning(f"Could not save file index: {e}")
+
+    def matches(self, name: str) -> bool:
+        if name.startswith('.'):
+            return False
+        return not self.extensions or name.lower().endswith(self.extensions)
+
+    def get(self, name: str, with_hash: bool = True) -> Optional[dict]:
+        """
+        Get the up-to-date entry of a file.
+        
+        Args:
+            name (str): File name (inside the indexed directory)
+            with_hash (bool): Compute the sha256 if it isn't known yet
+        
+        Returns:
+            dict: {'name', 'size', 'mtime', 'sha256'} or None if the file is gone
+        """
+        path = os.path.join(self.directory, name)
+
+        try:
+            stat_info = os.stat(path)
+        except OSError:
+            self.remove(name)
+            return None
+
+        with self._lock:
+            entry = self.entries.get(name)
+
+            if not entry or entry['size'] != stat_info.st_size or entry['mtime'] != stat_info.st_mtime_ns:
+                entry = {'size': stat_info.st_size, 'mtime': stat_info.st_mtime_ns, 'sha256': None}
+                self.entries[name] = entry
+                self._dirty = True
+
+        if with_hash and not entry['sha256']:
+            sha256 = hash_file(path)
+
+            with self._lock:
+                entry['sha256'] = sha256
+                self._dirty = True
+
+        return {'name': name, **entry}
+
+    def update(self, name: str, sha256: str):
+        # record a hash computed elsewhere (e.g. while the file was written)
+        path = os.path.join(self.directory, name)
+
+        try:
+            stat_info = os.stat(path)
+        except OSError:
+            return
+
+        with self._lock:
+            self.entries[name] = {'size': stat_info.st_size, 'mtime': stat_info.st_mtime_ns, 'sha256': sha256}
+            self._dirty = True
+
+    def remove(self, name: str):
+        with self._lock:
+            if self.entries.pop(name, None) is not None:
+                self._dirty = True
+
+    def scan(self, with_hashes: bool = False) -> List[dict]:
+        """
+        Walk the directory and refresh the index.
+        
+        Args:
+            with_hashes (bool): Compute missing hashes (slow on first run)
+        
+        Returns:
+            list: Entries sorted by name
+        """
+        try:
+            names = [
+                name for name in os.listdir(self.directory)
+                if self.matches(name) and os.path.isfile(os.path.join(self.directory, name))
+            ]
+        except OSError as e:
+            Log.error(f"Could not list {self.directory}: {e}")
+            return []
+
+        with self._lock:
+            for stale in set(self.entries) - set(names):
+                del self.entries[stale]
+                self._dirty = True
+
+        entries = []
+
+        for name in sorted(names):
+            entry = self.get(name, with_hash=with_hashes)
+            if entry:
+                entries.append(entry)
+
+        self.save()
+        return entries
+
+
+class IndexWatcher:
+
+    # keeps a FileIndex current and reports what changed, as lists of
+    # {'event': 'added' | 'modified' | 'removed', 'name', 'size', 'sha256'}
+    # uses inotify when inotify_simple is installed, else rescans periodically
+    # on_change is called from the watcher thread
+
+    def __init__(self, index: FileIndex, on_change: Callable[[List[dict]], None], poll_interval: float = WATCH_POLL_INTERVAL):
+        self.index = index
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.known: Dict[str, tuple] = {} # name -> (size, mtime)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def snapshot(self) -> List[dict]:
+        """
+        Scan the directory, the baseline later changes are reported against.
+        Send it before calling start(), so no change can overtake it.
+
+        Returns:
+            list: Current entries (with hashes)
+        """
+        entries = self.index.scan(with_hashes=True)
+        self.known = {entry['name']: (entry['size'], entry['mtime']) for entry in entries}
+        return entries
+
+    def start(self):
+        # watches from the last snapshot on, anything that changed in between
+        # is picked up by a first rescan
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        if INotify is None:
+            self._refresh()
+            while not self._stop.wait(self.poll_interval):
+                self._refresh()
+            return
+
+        inotify = None
+        mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.MOVED_FROM | flags.DELETE | flags.CREATE
+
+        try:
+            inotify = INotify()
+            inotify.add_watch(self.index.directory, mask)
+            self._refresh() # changes between the snapshot and the watch
+
+            while not self._stop.is_set():
+                names = {event.name for event in inotify.read(timeout=1000)}
+                if not names:
+                    continue
+
+                # a copy fires many events, wait for it to settle
+                while True:
+                    more = {event.name for event in inotify.read(timeout=int(WATCH_SETTLE_DELAY * 1000))}
+                    if not more:
+                        break
+                    names |= more
+
+                self._refresh(names)
+        except OSError as e:
+            Log.warning(f"inotify unavailable ({e}), watching {self.index.directory} by polling")
+            while not self._stop.wait(self.poll_interval):
+                self._refresh()
+        finally:
+            if inotify:
+                inotify.close()
+
+    def _refresh(self, names: Optional[set] = None):
+        # names = only look at those (inotify), None = rescan everything
+        try:
+            if names is None:
+                current = {entry['name']: (entry['size'], entry['mtime']) for entry in self.index.scan()}
+                names = set(current) | set(self.known)
+            else:
+                current = {}
+                for name in names:
+                    if not self.index.matches(name):
+                        continue
+                    try:
+                        stat_info = os.stat(os.path.join(self.index.directory, name))
+                        current[name] = (stat_info.st_size, stat_info.st_mtime_ns)
+                    except OSError:
+                        pass
+
+            changes = []
+
+            for name in sorted(names):
+                if not self.index.matches(name):
+                    continue
+
+                before, after = self.known.get(name), current.get(name)
+
+                if before == after:
+                    continue
+
+                if after is None:
+                    self.index.remove(name)
+                    self.known.pop(name, None)
+                    changes.append({'event': 'removed', 'name': name, 'size': None, 'sha256': None})
+                    continue
+
+                entry = self.index.get(name)
+                if not entry:
+                    continue
+
+                self.known[name] = (entry['size'], entry['mtime'])
+                changes.append({'event': 'added' if before is None else 'modified', 'name': name, 'size': entry['size'], 'sha256': entry['sha256']})
+
+            if changes:
+                self.index.save()
+                self.on_change(changes)
+
+        except Exception as e:
+            Log.warning(f"File watcher error: {e}")
@@ -0,0 +1,87 @@
+from typing import Dict, Iterable, List, Set
+
+class FleetIndex:
+
+    # files held by every client, kept current from the FILES_CHANGED events
+    # they push. presence is a bitset per file name (bit n = client slot n),
+    # so "who lacks X" or "files common to all" are a few integer operations
+
+    def __init__(self):
+        self.slots: Dict[str, int] = {}
+        self.presence: Dict[str, int] = {}
+        self.files: Dict[str, Dict[str, dict]] = {} # client_id -> name -> {'size', 'sha256'}
+        self._free: List[int] = []
+
+    def tracks(self, client_id: str) -> bool:
+        return client_id in self.slots
+
+    def reset(self, client_id: str, entries: Iterable[dict]):
+        # full snapshot of a client, replaces whatever we knew about it
+        self.drop(client_id)
+
+        self.slots[client_id] = self._free.pop() if self._free else len(self.slots)
+        self.files[client_id] = {}
+
+        for entry in entries:
+            self.apply(client_id, 'added', entry['name'], entry.get('size'), entry.get('sha256'))
+
+    def apply(self, client_id: str, event: str, name: str, size=None, sha256=None):
+        if client_id not in self.slots:
+            return
+
+        bit = 1 << self.slots[client_id]
+
+        if event == 'removed':
+            self.files[client_id].pop(name, None)
+            self._clear(name, bit)
+            return
+
+        self.files[client_id][name] = {'size': size, 'sha256': sha256}
+        self.presence[name] = self.presence.get(name, 0) | bit
+
+    def drop(self, client_id: str):
+        slot = self.slots.pop(client_id, None)
+        if slot is None:
+            return
+
+        for name in self.files.pop(client_id, {}):
+            self._clear(name, 1 << slot)
+
+        self._free.append(slot)
+
+    def _clear(self, name: str, bit: int):
+        remaining = self.presence.get(name, 0) & ~bit
+
+        if remaining:
+            self.presence[name] = remaining
+        else:
+            self.presence.pop(name, None)
+
+    def mask(self, client_ids: Iterable[str]) -> int:
+        mask = 0
+        for client_id in client_ids:
+            if client_id in self.slots:
+                mask |= 1 << self.slots[client_id]
+        return mask
+
+    def names(self, client_id: str) -> Set[str]:
+        return set(self.files.get(client_id, {}))
+
+    def manifest(self, client_id: str) -> Dict[str, dict]:
+        # {name: {'name', 'size', 'sha256'}}, same shape as a listed file
+        return {name: {'name': name, **info} for name, info in self.files.get(client_id, {}).items()}
+
+    def lacking(self, name: str, client_ids: Iterable[str]) -> List[str]:
+        # tracked clients among client_ids that don't have name
+        presence = self.presence.get(name, 0)
+        return [
+            client_id for client_id in client_ids
+            if client_id in self.slots and not presence & (1 << self.slots[client_id])
+        ]
+
+    def common(self, client_ids: Iterable[str]) -> Set[str]:
+        # names present on every tracked client among client_ids
+        mask = self.mask(client_ids)
+        if not mask:
+            return set()
+        return {name for name, presence in self.presence.items() if presence & mask == mask}
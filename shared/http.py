@@ -1,16 +1,208 @@
 import aiofiles
 import asyncio
+import hashlib
 import os
 import ssl
 import time
 import uuid
 from aiohttp import web, ClientSession, TCPConnector
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
+from shared.bundle import BUNDLE_END, BundleError, bundle_size, encode_header, read_header
 from shared.logger import Log
+from shared.scheduler import TransferScheduler
 from shared.security import PathValidator, SecurityError
 
 CHUNK_SIZE = 65536 # 64KB, here so we have the value centralized
+ACK_TIMEOUT = 15 # how long we wait for the client's OK/ERROR once the http side is done
+HASH_HEADER = 'X-Content-SHA256' # sender's hash of an uploaded file
+WRITE_BLOCK_SIZE = 1024 * 1024 # 1MB, received chunks are coalesced into writes of this size
+
+class TransferError(Exception):
+    pass
+
+
+class ChunkWriter:
+    
+    # receive-side file writer: chunks are coalesced into WRITE_BLOCK_SIZE
+    # writes done by a dedicated thread, with one write in flight while the
+    # next block fills up. the file is preallocated when the size is known
+    # (less fragmentation on sd cards) and fsynced once, on close
+    
+    def __init__(self, path: str, size: int = 0):
+        self.path = path
+        self.size = size
+        self.written = 0
+        self._buffer = bytearray()
+        self._fd = None
+        self._pending = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bw-writer")
+    
+    async def __aenter__(self):
+        try:
+            await self._run(self._open)
+        except BaseException:
+            self._executor.shutdown(wait=False)
+            raise
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.close()
+        else:
+            await self.close(sync=False)
+    
+    def _open(self):
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        
+        if self.size > 0 and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(self._fd, 0, self.size)
+            except OSError:
+                pass # not supported by the filesystem, plain writes still work
+    
+    def _write_block(self, data: bytes):
+        view = memoryview(data)
+        
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+    
+    def _finish(self, sync: bool):
+        try:
+            # preallocated more than we got (short transfer), don't leave zeros behind
+            if self.size > self.written:
+                os.ftruncate(self._fd, self.written)
+            
+            if sync:
+                os.fsync(self._fd)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+    
+    def _run(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+    
+    async def write(self, chunk: bytes):
+        self._buffer += chunk
+        self.written += len(chunk)
+        
+        if len(self._buffer) >= WRITE_BLOCK_SIZE:
+            # whole blocks only, the tail waits for more data
+            cut = len(self._buffer) - len(self._buffer) % WRITE_BLOCK_SIZE
+            data = bytes(self._buffer[:cut])
+            del self._buffer[:cut]
+            
+            await self._submit(data)
+    
+    async def _submit(self, data: bytes):
+        if self._pending:
+            await self._pending
+        
+        self._pending = self._run(self._write_block, data)
+    
+    async def close(self, sync: bool = True):
+        try:
+            if self._fd is None:
+                return
+            
+            if sync:
+                if self._buffer:
+                    await self._submit(bytes(self._buffer))
+                    self._buffer.clear()
+                
+                if self._pending:
+                    await self._pending
+            else:
+                # aborting, a failed write in flight doesn't matter anymore
+                if self._pending:
+                    try:
+                        await self._pending
+                    except Exception:
+                        pass
+            
+            self._pending = None
+            await self._run(self._finish, sync)
+        finally:
+            self._executor.shutdown(wait=False)
+
+
+class TransferJob:
+    
+    # tracks one token: the http side (bytes sent / received) and the
+    # client's OK/ERROR reply, the transfer is complete when both resolved
+    
+    def __init__(self, token: str, kind: str):
+        loop = asyncio.get_running_loop()
+        
+        self.token = token
+        self.kind = kind # 'download' or 'upload' (seen from the client)
+        self.started = loop.create_future() # the client reached the http server
+        self.http_done = loop.create_future()
+        self.acked = loop.create_future()
+        self.created_at = time.time()
+        
+        # failures are reported through wait(), nobody may be waiting
+        for future in (self.http_done, self.acked):
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    
+    def start(self):
+        if not self.started.done():
+            self.started.set_result(True)
+    
+    def finish_http(self, error: Optional[str] = None):
+        self.start()
+        
+        if self.http_done.done():
+            return
+        
+        if error:
+            self.http_done.set_exception(TransferError(error))
+        else:
+            self.http_done.set_result(True)
+    
+    def ack(self, ok: bool, message: str = ''):
+        if self.acked.done():
+            return
+        
+        if ok:
+            self.acked.set_result(message)
+        else:
+            self.acked.set_exception(TransferError(message or "Client reported an error"))
+    
+    def fail(self, error: str):
+        self.finish_http(error)
+        self.ack(False, error)
+    
+    async def wait(self, timeout: float, ack_timeout: float = ACK_TIMEOUT, start_timeout: Optional[float] = None):
+        # the client may still be busy with earlier transfers, so timeout only
+        # counts from when it reaches the http server (or replies ERROR without
+        # ever reaching it). then whichever side resolves first decides, and
+        # the other gets a grace period
+        try:
+            for futures, limit in (({self.started, self.acked}, start_timeout or timeout), ({self.http_done, self.acked}, timeout)):
+                done, _ = await asyncio.wait(
+                    futures,
+                    timeout=limit,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                if not done:
+                    raise asyncio.TimeoutError()
+                
+                if self.acked in done:
+                    break
+            
+            for future in done:
+                future.result()
+            
+            await asyncio.wait_for(asyncio.shield(self.http_done), timeout=timeout)
+            return await asyncio.wait_for(asyncio.shield(self.acked), timeout=ack_timeout)
+        
+        except asyncio.TimeoutError:
+            raise TransferError("Transfer timed out")
+
 
 class BWHTTPFileServer:
     
@@ -23,7 +215,8 @@ class BWHTTPFileServer:
         port: int,
         ssl_context: ssl.SSLContext,
         upload_dir: str,
-        token_lifetime: int = 300
+        token_lifetime: int = 300,
+        scheduler: Optional[TransferScheduler] = None
     ):
 
         self.host = host
@@ -31,25 +224,40 @@ class BWHTTPFileServer:
         self.ssl_context = ssl_context
         self.upload_dir = upload_dir
         self.token_lifetime = token_lifetime
+        self.scheduler = scheduler # optional, rate limits bulk transfers
 
         self.upload_tokens: Dict[str, dict] = {}
         self.download_tokens: Dict[str, dict] = {}
+        self.bundle_tokens: Dict[str, dict] = {}
         self.stream_tokens: Dict[str, dict] = {}
+        self.transfers: Dict[str, TransferJob] = {}
         
         self.app = None
         self.runner = None
         
         os.makedirs(upload_dir, exist_ok=True)
         
-        asyncio.create_task(self._cleanup_expired_tokens())
+        self._cleanup_task = asyncio.create_task(self._cleanup_expired_tokens())
     
-    def create_upload_token(self, filename: str, size: int) -> str:
+    def create_upload_token(self, filename: str, size: int, dest_dir: Optional[str] = None, sha256: Optional[str] = None) -> str:
+        # each token carries its own destination, so concurrent pulls into
+        # different directories never have to touch self.upload_dir
+        filename = PathValidator.sanitize_filename(filename)
+        dest_dir = os.path.realpath(dest_dir or self.upload_dir)
+        
+        if not os.path.isdir(dest_dir):
+            raise SecurityError(f"Destination is not a directory: {dest_dir}")
+        
         token = uuid.uuid4().hex
         self.upload_tokens[token] = {
             'filename': filename,
+            'temp_name': f".upload_{token[:12]}_{filename}",
+            'dest_dir': dest_dir,
             'size': size,
+            'sha256': sha256,
             'expires': time.time() + self.token_lifetime
         }
+        self.transfers[token] = TransferJob(token, 'upload')
         return token
     
     def create_download_token(self, filepath: str) -> str:
@@ -58,6 +266,17 @@ class BWHTTPFileServer:
             'filepath': filepath,
             'expires': time.time() + self.token_lifetime
         }
+        self.transfers[token] = TransferJob(token, 'download')
+        return token
+    
+    def create_bundle_token(self, entries: List[dict]) -> str:
+        # entries: [{'path', 'filename', 'size', 'sha256'}], streamed as one bundle
+        token = uuid.uuid4().hex
+        self.bundle_tokens[token] = {
+            'entries': entries,
+            'expires': time.time() + self.token_lifetime
+        }
+        self.transfers[token] = TransferJob(token, 'download')
         return token
     
     def create_stream_token(self, audio_generator, rate: int = 48000, channels: int = 2) -> str:
@@ -70,11 +289,72 @@ class BWHTTPFileServer:
         }
         return token
     
+    def expect_transfer(self, token: str):
+        # track a transfer served by someone else (e.g. a peer), only the client's reply matters
+        job = TransferJob(token, 'download')
+        job.finish_http()
+        self.transfers[token] = job
+    
+    def complete_transfer(self, token: str, ok: bool, message: str = ''):
+        # called when the client replies OK/ERROR for a token
+        job = self.transfers.get(token)
+        
+        if job:
+            job.ack(ok, message)
+    
+    async def wait_transfer(self, token: str, timeout: float = 120, ack_timeout: float = ACK_TIMEOUT) -> str:
+        """
+        Wait until a transfer is done on both ends.
+        
+        Args:
+            token (str): Upload or download token
+            timeout (float): Seconds to wait for the http transfer once the client started it
+            ack_timeout (float): Seconds to wait for the client's reply once the http transfer is done
+        
+        Returns:
+            str: The client's OK message
+        
+        Raises:
+            TransferError: If the transfer failed, was rejected or timed out
+        """
+        job = self.transfers.get(token)
+        
+        if not job:
+            raise TransferError("Unknown transfer token")
+        
+        try:
+            # the token is useless after its lifetime, so that's how long the client gets to start
+            return await job.wait(timeout, ack_timeout, start_timeout=max(timeout, self.token_lifetime))
+        finally:
+            self.transfers.pop(token, None)
+            self.upload_tokens.pop(token, None)
+            self.download_tokens.pop(token, None)
+            self.bundle_tokens.pop(token, None)
+    
+    def _start_transfer(self, token: str):
+        job = self.transfers.get(token)
+        
+        if job:
+            job.start()
+    
+    def _fail_transfer(self, token: str, error: str):
+        job = self.transfers.get(token)
+        
+        if job:
+            job.finish_http(error)
+    
+    def _finish_transfer(self, token: str):
+        job = self.transfers.get(token)
+        
+        if job:
+            job.finish_http()
+    
     async def start(self):
         self.app = web.Application(client_max_size=1024**3)  # max 1gb
         
         self.app.router.add_post('/upload/{token}', self._handle_upload)
         self.app.router.add_get('/download/{token}', self._handle_download)
+        self.app.router.add_get('/bundle/{token}', self._handle_bundle)
         self.app.router.add_get('/stream/{token}', self._handle_pcm_stream)
         
         self.runner = web.AppRunner(self.app)
@@ -91,6 +371,8 @@ class BWHTTPFileServer:
         Log.server(f"HTTP file server started on https://{self.host}:{self.port}")
     
     async def stop(self):
+        self._cleanup_task.cancel()
+        
         if self.runner:
             await self.runner.cleanup()
     
@@ -101,55 +383,86 @@ class BWHTTPFileServer:
             return web.Response(status=404, text="Invalid token")
         
         token_data = self.upload_tokens[token]
+        self._start_transfer(token)
         
         if time.time() > token_data['expires']:
-            del self.upload_tokens[token]
+            self.upload_tokens.pop(token, None)
+            self._fail_transfer(token, "Token expired")
             return web.Response(status=403, text="Token expired")
         
         try:
             filename = PathValidator.sanitize_filename(token_data['filename'])
         except SecurityError as e:
             Log.error(f"Security violation in upload: {e}")
+            self._fail_transfer(token, "Invalid filename")
             return web.Response(status=403, text="Invalid filename")
         
         expected_size = token_data['size']
         
+        dest_dir = token_data['dest_dir']
+        
         try:
-            filepath = PathValidator.safe_join(self.upload_dir, filename)
+            final_path = PathValidator.safe_join(dest_dir, filename)
+            filepath = PathValidator.safe_join(dest_dir, token_data['temp_name'])
         except SecurityError as e:
             Log.error(f"Path traversal attempt in upload: {e}")
+            self._fail_transfer(token, "Invalid file path")
             return web.Response(status=403, text="Invalid file path")
         
+        # expected from the token (server side knowledge) or else from the sender
+        expected_hash = token_data.get('sha256') or request.headers.get(HASH_HEADER)
+        
         try:
             bytes_received = 0
+            digest = hashlib.sha256()
             
-            async with aiofiles.open(filepath, 'wb') as f:
+            # written under a temp name, only renamed into place once complete
+            # and hashed on the way, so verifying needs no second read
+            async with ChunkWriter(filepath, expected_size) as f:
                 async for chunk in request.content.iter_chunked(CHUNK_SIZE):
                     await f.write(chunk)
+                    digest.update(chunk)
                     bytes_received += len(chunk)
+                    
+                    if self.scheduler:
+                        await self.scheduler.throttle(len(chunk))
             
             actual_size = os.path.getsize(filepath)
             
             if expected_size > 0 and actual_size != expected_size:
-                os.remove(filepath)
+                self._fail_transfer(token, f"Size mismatch: expected {expected_size}, got {actual_size}")
                 return web.Response(
                     status=400,
                     text=f"Size mismatch: expected {expected_size}, got {actual_size}"
                 )
             
-            del self.upload_tokens[token]
+            if expected_hash and digest.hexdigest() != expected_hash.lower():
+                self._fail_transfer(token, "Hash mismatch")
+                return web.Response(status=400, text="Hash mismatch")
+            
+            os.replace(filepath, final_path)
+            
+            self.upload_tokens.pop(token, None)
+            self._finish_transfer(token)
             
             return web.Response(status=200, text="Upload successful")
         
         except Exception as e:
-            # cleanup partial files
+            self._fail_transfer(token, f"Upload error: {str(e)}")
+            return web.Response(status=500, text=f"Upload error: {str(e)}")
+        
+        except BaseException:
+            # sender went away (aiohttp cancels the handler), nobody gets a response
+            self._fail_transfer(token, "Upload interrupted")
+            raise
+        
+        finally:
+            # whatever is left under the temp name is partial or rejected
             if os.path.exists(filepath):
                 try:
                     os.remove(filepath)
-                except:
+                except OSError:
                     pass
-            
-            return web.Response(status=500, text=f"Upload error: {str(e)}")
     
     async def _handle_download(self, request: web.Request) -> web.StreamResponse:
         token = request.match_info['token']
@@ -158,15 +471,18 @@ class BWHTTPFileServer:
             return web.Response(status=404, text="Invalid or expired token")
         
         token_data = self.download_tokens[token]
+        self._start_transfer(token)
         
         if time.time() > token_data['expires']:
-            del self.download_tokens[token]
+            self.download_tokens.pop(token, None)
+            self._fail_transfer(token, "Token expired")
             return web.Response(status=403, text="Token expired")
         
         filepath = token_data['filepath']
         
         if not os.path.exists(filepath):
-            del self.download_tokens[token]
+            self.download_tokens.pop(token, None)
+            self._fail_transfer(token, "File not found")
             return web.Response(status=404, text="File not found")
         
         try:
@@ -189,16 +505,86 @@ class BWHTTPFileServer:
                     chunk = await f.read(CHUNK_SIZE)
                     if not chunk:
                         break
+                    
+                    if self.scheduler:
+                        await self.scheduler.throttle(len(chunk))
+                    
                     await response.write(chunk)
             
             await response.write_eof()
             
-            del self.download_tokens[token]
+            self.download_tokens.pop(token, None)
+            self._finish_transfer(token)
             
             return response
         
         except Exception as e:
+            self._fail_transfer(token, f"Download error: {str(e)}")
             return web.Response(status=500, text=f"Download error: {str(e)}")
+        
+        except BaseException:
+            # receiver went away (aiohttp cancels the handler)
+            self._fail_transfer(token, "Download interrupted")
+            raise
+    
+    async def _handle_bundle(self, request: web.Request) -> web.StreamResponse:
+        token = request.match_info['token']
+        
+        if token not in self.bundle_tokens:
+            return web.Response(status=404, text="Invalid or expired token")
+        
+        token_data = self.bundle_tokens.pop(token)
+        self._start_transfer(token)
+        
+        if time.time() > token_data['expires']:
+            self._fail_transfer(token, "Token expired")
+            return web.Response(status=403, text="Token expired")
+        
+        entries = token_data['entries']
+        
+        for entry in entries:
+            if not os.path.exists(entry['path']):
+                self._fail_transfer(token, f"File not found: {entry['filename']}")
+                return web.Response(status=404, text=f"File not found: {entry['filename']}")
+        
+        response = web.StreamResponse(
+            status=200,
+            headers={
+                'Content-Type': 'application/octet-stream',
+                'Content-Length': str(bundle_size(entries))
+            }
+        )
+        
+        await response.prepare(request)
+        
+        try:
+            for entry in entries:
+                await response.write(encode_header(entry['filename'], entry['size'], entry.get('sha256')))
+                
+                async with aiofiles.open(entry['path'], 'rb') as f:
+                    remaining = entry['size']
+                    
+                    while remaining > 0:
+                        chunk = await f.read(min(CHUNK_SIZE, remaining))
+                        if not chunk:
+                            raise TransferError(f"{entry['filename']} changed while being sent")
+                        
+                        remaining -= len(chunk)
+                        
+                        if self.scheduler:
+                            await self.scheduler.throttle(len(chunk))
+                        
+                        await response.write(chunk)
+            
+            await response.write_eof()
+            self._finish_transfer(token)
+        
+        except BaseException as e:
+            # headers are already out (or the client went away), it sees a truncated bundle
+            self._fail_transfer(token, f"Bundle error: {str(e) or type(e).__name__}")
+            raise
+        
+        return response
     
     async def _handle_pcm_stream(self, request: web.Request) -> web.StreamResponse:
         token = request.match_info['token']
@@ -229,6 +615,10 @@ class BWHTTPFileServer:
         
         await response.prepare(request)
         
+        # live audio is never throttled, bulk transfers slow down instead
+        if self.scheduler:
+            self.scheduler.live_started()
+        
         try:
             loop = asyncio.get_event_loop()
             
@@ -260,6 +650,9 @@ class BWHTTPFileServer:
             
             if token in self.stream_tokens:
                 del self.stream_tokens[token]
+            
+            if self.scheduler:
+                self.scheduler.live_stopped()
         
         return response
     
@@ -298,6 +691,7 @@ class BWHTTPFileServer:
             ]
             for token in expired_upload:
                 del self.upload_tokens[token]
+                self._fail_transfer(token, "Token expired")
             
             expired_download = [
                 token for token, data in self.download_tokens.items()
@@ -305,6 +699,15 @@ class BWHTTPFileServer:
             ]
             for token in expired_download:
                 del self.download_tokens[token]
+                self._fail_transfer(token, "Token expired")
+            
+            expired_bundle = [
+                token for token, data in self.bundle_tokens.items()
+                if current_time > data['expires']
+            ]
+            for token in expired_bundle:
+                del self.bundle_tokens[token]
+                self._fail_transfer(token, "Token expired")
             
             expired_stream = [
                 token for token, data in self.stream_tokens.items()
@@ -312,14 +715,53 @@ class BWHTTPFileServer:
             ]
             for token in expired_stream:
                 del self.stream_tokens[token]
+            
+            # jobs nobody waited for
+            stale_transfers = [
+                token for token, job in self.transfers.items()
+                if current_time > job.created_at + self.token_lifetime * 2
+            ]
+            for token in stale_transfers:
+                self.transfers.pop(token).fail("Transfer expired")
 
 
 class BWHTTPFileClient:
     
-    def __init__(self, ssl_context: ssl.SSLContext):
+    # one long-lived session per endpoint (server or peer), so connections
+    # are kept alive and reused instead of doing a tcp + tls handshake per file
+    
+    def __init__(self, ssl_context: ssl.SSLContext, limit: int = 4, keepalive_timeout: float = 60):
         self.ssl_context = ssl_context
+        self.limit = max(1, limit) # connections per endpoint
+        self.keepalive_timeout = keepalive_timeout
+        self._sessions: Dict[tuple, ClientSession] = {}
     
-    async def upload_file(self, server_host: str, server_port: int, token: str, filepath: str, progress_callback: Optional[callable] = None) -> bool:
+    def _session(self, host: str, port: int) -> ClientSession:
+        session = self._sessions.get((host, port))
+        
+        if session is None or session.closed:
+            # ssl connector that ignores self-signed certs
+            connector = TCPConnector(
+                ssl=self.ssl_context,
+                limit=self.limit,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            session = ClientSession(connector=connector)
+            self._sessions[(host, port)] = session
+        
+        return session
+    
+    async def close(self):
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        
+        for session in sessions:
+            try:
+                await session.close()
+            except Exception:
+                pass
+    
+    async def upload_file(self, server_host: str, server_port: int, token: str, filepath: str, progress_callback: Optional[callable] = None, sha256: Optional[str] = None) -> bool:
 
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"File not found: {filepath}")
@@ -328,88 +770,209 @@ class BWHTTPFileClient:
         url = f"https://{server_host}:{server_port}/upload/{token}"
         
         try:
-            # ssl connector that ignores self-signed certs
-            connector = TCPConnector(ssl=self.ssl_context)
-            
-            async with ClientSession(connector=connector) as session:
-                async with aiofiles.open(filepath, 'rb') as f:
-                    # Create async generator for chunked upload
-                    async def file_sender():
-                        bytes_sent = 0
-                        while True:
-                            chunk = await f.read(CHUNK_SIZE)
-                            if not chunk:
-                                break
-                            bytes_sent += len(chunk)
-                            
-                            if progress_callback:
-                                progress_callback(bytes_sent, file_size)
-                            
-                            yield chunk
-                    
-                    async with session.post(url, data=file_sender()) as response:
-                        if response.status == 200:
-                            return True
-                        else:
-                            error_text = await response.text()
-                            Log.error(f"Upload failed: {error_text}")
-                            return False
+            session = self._session(server_host, server_port)
+            
+            async with aiofiles.open(filepath, 'rb') as f:
+                # Create async generator for chunked upload
+                async def file_sender():
+                    bytes_sent = 0
+                    while True:
+                        chunk = await f.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        bytes_sent += len(chunk)
+                        
+                        if progress_callback:
+                            progress_callback(bytes_sent, file_size)
+                        
+                        yield chunk
+                
+                # lets the receiver verify the file even if it didn't know the hash
+                headers = {HASH_HEADER: sha256} if sha256 else None
+                
+                async with session.post(url, data=file_sender(), headers=headers) as response:
+                    if response.status == 200:
+                        return True
+                    else:
+                        error_text = await response.text()
+                        Log.error(f"Upload failed: {error_text}")
+                        return False
         
         except Exception as e:
             Log.error(f"Upload error: {e}")
             return False
     
-    async def download_file(self, server_host: str, server_port: int, token: str, save_path: str, progress_callback: Optional[callable] = None) -> bool:
+    async def download_file(self, server_host: str, server_port: int, token: str, save_path: str, progress_callback: Optional[callable] = None, expected_sha256: Optional[str] = None) -> Optional[str]:
+        """
+        Download a file into save_path.
+        
+        The file is written to save_path + ".part", hashed on the way and only
+        renamed into place once its size (and hash, if expected) matched.
+        
+        Returns:
+            str: sha256 of the file on success, None on failure
+        """
         url = f"https://{server_host}:{server_port}/download/{token}"
+        part_path = save_path + ".part"
         
         try:
-            # Create SSL connector that ignores self-signed certs
-            connector = TCPConnector(ssl=self.ssl_context)
+            session = self._session(server_host, server_port)
             
-            async with ClientSession(connector=connector) as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        Log.error(f"Download failed: {error_text}")
-                        return False
+            async with session.get(url) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    Log.error(f"Download failed: {error_text}")
+                    return None
+                
+                total_size = int(response.headers.get('Content-Length', 0))
+                
+                bytes_received = 0
+                digest = hashlib.sha256()
+                
+                async with ChunkWriter(part_path, total_size) as f:
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        await f.write(chunk)
+                        digest.update(chunk)
+                        bytes_received += len(chunk)
+                        
+                        if progress_callback:
+                            progress_callback(bytes_received, total_size)
+            
+            if total_size and bytes_received != total_size:
+                raise TransferError(f"Size mismatch: expected {total_size}, got {bytes_received}")
+            
+            sha256 = digest.hexdigest()
+            
+            if expected_sha256 and sha256 != expected_sha256.lower():
+                raise TransferError("Hash mismatch")
+            
+            os.replace(part_path, save_path)
+            return sha256
+        
+        except Exception as e:
+            Log.error(f"Download error: {e}")
+            
+            if os.path.exists(part_path):
+                try:
+                    os.remove(part_path)
+                except OSError:
+                    pass
+            
+            return None
+        
+    async def download_bundle(self, server_host: str, server_port: int, token: str, dest_dir: str, progress_callback: Optional[callable] = None) -> Tuple[List[Tuple[str, str]], List[str]]:
+        """
+        Download a bundle and extract it into dest_dir on the fly.
+        
+        Each entry is written to a .part file, hashed on the way and only
+        renamed into place if it matches its header. Entries extracted before
+        an error are kept.
+        
+        Returns:
+            tuple: ([(filename, sha256)] extracted, [error messages])
+        """
+        url = f"https://{server_host}:{server_port}/bundle/{token}"
+        extracted = []
+        errors = []
+        part_path = None
+        
+        try:
+            session = self._session(server_host, server_port)
+            
+            async with session.get(url) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    Log.error(f"Bundle download failed: {error_text}")
+                    return extracted, [error_text]
+                
+                total_size = int(response.headers.get('Content-Length', 0))
+                bytes_received = 0
+                
+                while True:
+                    entry = await read_header(response.content)
+                    if entry is None:
+                        break
                     
-                    total_size = int(response.headers.get('Content-Length', 0))
+                    # bytes are always consumed, even for a rejected entry, to stay in sync
+                    try:
+                        filename = PathValidator.sanitize_filename(entry['name'])
+                        final_path = PathValidator.safe_join(dest_dir, filename)
+                        part_path = final_path + ".part"
+                    except SecurityError as e:
+                        errors.append(f"{entry['name']}: {e}")
+                        filename = None
                     
-                    bytes_received = 0
+                    digest = hashlib.sha256()
                     
-                    async with aiofiles.open(save_path, 'wb') as f:
-                        async for chunk in response.content.iter_chunked(65536):
-                            await f.write(chunk)
+                    async def copy_entry(write=None):
+                        nonlocal bytes_received
+                        remaining = entry['size']
+                        
+                        while remaining > 0:
+                            chunk = await response.content.read(min(CHUNK_SIZE, remaining))
+                            if not chunk:
+                                raise BundleError("Bundle ended in the middle of an entry")
+                            
+                            remaining -= len(chunk)
                             bytes_received += len(chunk)
+                            digest.update(chunk)
+                            
+                            if write:
+                                await write(chunk)
                             
                             if progress_callback:
                                 progress_callback(bytes_received, total_size)
                     
-                    return True
+                    if filename:
+                        async with ChunkWriter(part_path, entry['size']) as f:
+                            await copy_entry(f.write)
+                    else:
+                        await copy_entry()
+                    
+                    if not filename:
+                        continue
+                    
+                    sha256 = digest.hexdigest()
+                    
+                    if entry['sha256'] and sha256 != entry['sha256'].lower():
+                        os.remove(part_path)
+                        errors.append(f"{filename}: hash mismatch")
+                    else:
+                        os.replace(part_path, final_path)
+                        extracted.append((filename, sha256))
+                    
+                    part_path = None
         
         except Exception as e:
-            Log.error(f"Download error: {e}")
-            return False
+            Log.error(f"Bundle download error: {e}")
+            errors.append(str(e) or type(e).__name__)
+            
+            if part_path and os.path.exists(part_path):
+                try:
+                    os.remove(part_path)
+                except OSError:
+                    pass
         
+        return extracted, errors
+    
     async def stream_pcm_generator(self, server_host: str, server_port: int, token: str, rate: int = 48000, channels: int = 2, chunk_size: int = 1024):
         url = f"https://{server_host}:{server_port}/stream/{token}"
         
         try:
-            connector = TCPConnector(ssl=self.ssl_context)
+            session = self._session(server_host, server_port)
             
-            async with ClientSession(connector=connector) as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        Log.error(f"Stream failed: {error_text}")
-                        return
-                    
-                    Log.success(f"Connected to PCM stream (rate={rate}, channels={channels})")
-                    
-                    async for chunk in response.content.iter_chunked(chunk_size * channels * 2):
-                        yield chunk
-                    
-                    Log.info("Stream ended")
+            async with session.get(url) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    Log.error(f"Stream failed: {error_text}")
+                    return
+                
+                Log.success(f"Connected to PCM stream (rate={rate}, channels={channels})")
+                
+                async for chunk in response.content.iter_chunked(chunk_size * channels * 2):
+                    yield chunk
+                
+                Log.info("Stream ended")
                     
         except Exception as e:
             Log.error(f"Stream error: {e}")
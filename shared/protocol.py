@@ -1,12 +1,38 @@
+import json
+import re
 import shlex
-from typing import Dict, Tuple
+from typing import Dict, Tuple, Union
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 PROTOCOL_VERSION = "2.0.2"
 
+# message framings, best first. "text" is the command line format below and
+# is always understood, the structured ones are negotiated at registration
+# (VER framing=... / REGISTER_OK framing=...) and skip tokenizing entirely
+FRAMINGS = ('msgpack', 'json', 'text') if msgpack else ('json', 'text')
+
+# one piece of a shell-like token, same rules as shlex.split (posix mode):
+# plain chars, 'single quoted', "double quoted" (only \\ and \" escaped) or \x
+_TOKEN_RE = re.compile(r"""
+    (?P<space>[ \t\r\n]+)
+  | (?P<plain>[^ \t\r\n'"\\]+)
+  | '(?P<single>[^']*)'
+  | "(?P<double>(?:[^"\\]|\\.)*)"
+  | \\(?P<escaped>.)
+  | (?P<error>["'\\])
+""", re.VERBOSE | re.DOTALL)
+_DOUBLE_ESCAPE_RE = re.compile(r'\\([\\"])')
+_NEEDS_QUOTING_RE = re.compile(r"""[ \t\r\n'"\\]""")
+
 
 class Commands:
     
     # auth
+    HELLO = 'HELLO' # REGISTER, AUTH and VER in one message
     AUTH = 'AUTH'
     VER = 'VER'
     REGISTER = 'REGISTER'
@@ -24,14 +50,23 @@ class Commands:
     UPLOAD_TOKEN = 'UPLOAD_TOKEN'
     DOWNLOAD_TOKEN = 'DOWNLOAD_TOKEN'
     DOWNLOAD_URL = 'DOWNLOAD_URL'
+    BUNDLE_TOKEN = 'BUNDLE_TOKEN'
     STREAM_TOKEN = 'STREAM_TOKEN'
     
+    # peer distribution
+    PEER_OFFER = 'PEER_OFFER'
+    PEER_TOKEN = 'PEER_TOKEN'
+    
     # client managment
     KICK = 'KICK'
     
     # file managment
     LIST_FILES = 'LIST_FILES'
     REMOVE_FILE = 'REMOVE_FILE'
+    FILES_CHANGED = 'FILES_CHANGED'
+    
+    # client state heartbeat
+    STATUS = 'STATUS'
     
     # responses
     OK = 'OK'
@@ -40,17 +75,69 @@ class Commands:
     AUTH_FAILED = 'AUTH_FAILED'
     VERSION_MISMATCH = 'VERSION_MISMATCH'
 
+def split(line: str) -> list:
+    """
+    Split a command line like shlex.split does, without its per-character lexer.
+
+    Raises:
+        ValueError: "No closing quotation" / "No escaped character", as shlex
+    """
+    tokens = []
+    current = None
+
+    for match in _TOKEN_RE.finditer(line):
+        kind = match.lastgroup
+
+        if kind == 'space':
+            if current is not None:
+                tokens.append(current)
+                current = None
+            continue
+
+        if kind == 'error':
+            quote = match.group(kind)
+
+            # shlex reports a backslash at the very end, even inside a quote
+            if quote == '\\' or (quote == '"' and _ends_with_escape(line[match.end():])):
+                raise ValueError("No escaped character")
+            raise ValueError("No closing quotation")
+
+        value = match.group(kind)
+
+        if kind == 'double' and '\\' in value:
+            value = _DOUBLE_ESCAPE_RE.sub(r'\1', value)
+
+        current = value if current is None else current + value
+
+    if current is not None:
+        tokens.append(current)
+
+    return tokens
+
+
+def _ends_with_escape(text: str) -> bool:
+    # odd number of trailing backslashes = the last one escapes nothing
+    return (len(text) - len(text.rstrip('\\'))) % 2 == 1
+
+
+def quote(value: str) -> str:
+    # quotes a token only when split() would alter it
+    if value and not _NEEDS_QUOTING_RE.search(value):
+        return value
+    return shlex.quote(value)
+
+
 class ProtocolParser:
     # parse protocol commands
     # should be able to support: COMMAND arg1 arg2 'quoted arg' key=value key2='value with spaces'
     
     @staticmethod
-    def parse_command(line: str) -> Dict:
+    def parse_command(line: Union[str, bytes]) -> Dict:
         """
         Parse a command line into structured data.
         
         Args:
-            line (str): Command line to parse
+            line (str): Command line to parse, or a json (str) / msgpack (bytes) frame
         
         Returns:
             dict: {
@@ -67,12 +154,21 @@ class ProtocolParser:
                 'kwargs': {'freq': '90.0', 'ps': 'My Radio'}
             }
         """
-        line = line.strip()
+        if isinstance(line, (bytes, bytearray)):
+            return ProtocolParser.parse_frame(line)
+        
+        # only the whitespace split() and shlex separate on, str.strip() would
+        # also eat \x0b, \x0c... that belong to the last token
+        line = line.strip(' \t\r\n')
         if not line:
             return {'command': '', 'args': [], 'kwargs': {}}
         
+        # no command starts with a brace, so this can only be a json frame
+        if line[0] == '{':
+            return ProtocolParser.parse_frame(line)
+        
         try:
-            tokens = shlex.split(line)
+            tokens = split(line)
         except ValueError as e:
             raise ValueError(f"Invalid command syntax: {e}")
         
@@ -117,21 +213,85 @@ class ProtocolParser:
         parts = [command.upper()]
         
         for arg in args:
-            arg_str = str(arg)
-            if ' ' in arg_str or "'" in arg_str or '"' in arg_str:
-                parts.append(shlex.quote(arg_str))
-            else:
-                parts.append(arg_str)
+            parts.append(quote(str(arg)))
         
         for key, value in kwargs.items():
-            value_str = str(value)
-            if ' ' in value_str or "'" in value_str or '"' in value_str:
-                parts.append(f"{key}={shlex.quote(value_str)}")
-            else:
-                parts.append(f"{key}={value_str}")
+            parts.append(f"{key}={quote(str(value))}")
         
         return ' '.join(parts)
     
+    @staticmethod
+    def build_frame(framing: str, command: str, *args, **kwargs) -> Union[str, bytes]:
+        """
+        Build a message in a negotiated framing.
+        
+        Args:
+            framing (str): "text", "json" or "msgpack" (see FRAMINGS)
+            command (str): Command name
+            *args: Positional arguments
+            **kwargs: Key-value pairs
+        
+        Returns:
+            str or bytes: A command line for "text", a json object for "json"
+                          and msgpack bytes (sent as a binary message) for "msgpack"
+        """
+        if framing == 'text' or framing not in FRAMINGS:
+            return ProtocolParser.build_command(command, *args, **kwargs)
+        
+        # values stay strings, handlers read the same thing whatever the framing
+        frame = {
+            'command': command.upper(),
+            'args': [str(arg) for arg in args],
+            'kwargs': {key: str(value) for key, value in kwargs.items()}
+        }
+        
+        if framing == 'msgpack':
+            return msgpack.packb(frame)
+        
+        return json.dumps(frame)
+    
+    @staticmethod
+    def parse_frame(frame: Union[str, bytes]) -> Dict:
+        # json or msgpack frame -> same structure as parse_command
+        try:
+            if isinstance(frame, str):
+                data = json.loads(frame)
+            elif msgpack:
+                data = msgpack.unpackb(frame)
+            else:
+                raise ValueError("msgpack is not installed")
+            
+            command = str(data['command']).upper()
+            args = [str(arg) for arg in data.get('args', [])]
+            kwargs = {str(key): str(value) for key, value in data.get('kwargs', {}).items()}
+        except Exception as e: # msgpack has its own exception types
+            raise ValueError(f"Invalid frame: {e}")
+        
+        return {
+            'command': command,
+            'args': args,
+            'kwargs': kwargs
+        }
+    
+    @staticmethod
+    def negotiate_framing(offered: str) -> str:
+        """
+        Pick the framing to use from what the other side offered.
+        
+        Args:
+            offered (str): Comma separated framings, best first (empty for old peers)
+        
+        Returns:
+            str: The best framing both sides support, "text" if none
+        """
+        offered = [name.strip().lower() for name in (offered or '').split(',')]
+        
+        for framing in FRAMINGS:
+            if framing in offered:
+                return framing
+        
+        return 'text'
+    
     @staticmethod
     def parse_response(line: str) -> Tuple[str, str]:
         """
@@ -169,4 +329,8 @@ class ProtocolParser:
         """
         if message:
             return ProtocolParser.build_command(status, message=message)
-        return status.upper()
\ No newline at end of file
+        return status.upper()
+
+class RPCError(Exception):
+    # a client answered a request with ERROR, or went away before answering
+    pass
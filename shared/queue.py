@@ -199,19 +199,28 @@ class Queue:
         self.show("")
     
     async def _get_all_client_files(self, client_ids: List[str]) -> Dict[str, Set[str]]:
-        """Retrieve file lists from all specified clients."""
-        client_files = {}
-        
-        for client_id in client_ids:
-            try:
-                files = await self.server._request_file_list(client_id, timeout=10)
-                if files:
-                    client_files[client_id] = set(f['name'] for f in files)
-                else:
-                    Log.warning(f"No files from {client_id}")
-                    client_files[client_id] = set()
-            except Exception as e:
-                Log.error(f"Error getting files from {client_id}: {e}")
+        """Retrieve file lists from all specified clients.
+        
+        Clients that push their file changes are answered from the fleet
+        index, the others are asked (all at once).
+        """
+        fleet = self.server.fleet_index
+        client_files = {client_id: fleet.names(client_id) for client_id in client_ids if fleet.tracks(client_id)}
+        asked = [client_id for client_id in client_ids if client_id not in client_files]
+        
+        results = await asyncio.gather(
+            *[self.server._request_file_list(client_id, timeout=10) for client_id in asked],
+            return_exceptions=True
+        )
+        
+        for client_id, files in zip(asked, results):
+            if isinstance(files, Exception):
+                Log.error(f"Error getting files from {client_id}: {files}")
+                client_files[client_id] = set()
+            elif files:
+                client_files[client_id] = set(f['name'] for f in files)
+            else:
+                Log.warning(f"No files from {client_id}")
                 client_files[client_id] = set()
         
         return client_files
@@ -219,19 +228,28 @@ class Queue:
     def _resolve_file_specs(self, file_specs: List[str], client_files: Dict[str, Set[str]]) -> tuple[List[str], Dict[str, Set[str]]]:
         """Resolve file specs to actual files that exist on ALL clients.
         
+        Clients tracked by the fleet index are answered from its presence
+        bitsets, the others from their listed files.
+        
         Returns:
             (common_files, missing_per_client)
         """
         if not client_files:
             return [], {}
         
-        non_empty_client_files = [files for files in client_files.values() if files]
+        non_empty = [client_id for client_id, files in client_files.items() if files]
         
-        if not non_empty_client_files:
+        if not non_empty:
             return [], {}
         
+        fleet = self.server.fleet_index
+        tracked = [client_id for client_id in client_files if fleet.tracks(client_id)]
+        
         # Find intersection of all client files
-        common_files = set.intersection(*non_empty_client_files)
+        if all(fleet.tracks(client_id) for client_id in non_empty):
+            common_files = fleet.common(non_empty)
+        else:
+            common_files = set.intersection(*[client_files[client_id] for client_id in non_empty])
         
         matched = set()
         requested_files = set()
@@ -263,7 +281,13 @@ class Queue:
         # Calculate missing files per client
         missing_per_client = {}
         if requested_files:
+            for name in requested_files:
+                for client_id in fleet.lacking(name, tracked):
+                    missing_per_client.setdefault(client_id, set()).add(name)
+            
             for client_id, files in client_files.items():
+                if client_id in tracked:
+                    continue
                 missing = requested_files - files
                 if missing:
                     missing_per_client[client_id] = missing
@@ -344,9 +368,17 @@ class Queue:
                 Log.print("Client positions:", 'yellow')
                 for client_id, index in self.client_indices.items():
                     if client_id in self.server.clients:
-                        client_name = self.server.clients[client_id].get_display_name()
+                        client = self.server.clients[client_id]
+                        client_name = client.get_display_name()
                         current_file = self.queue[index] if index < len(self.queue) else "finished"
-                        Log.print(f"  {client_name}: [{index + 1}/{len(self.queue)}] {current_file}", 'cyan')
+                        line = f"  {client_name}: [{index + 1}/{len(self.queue)}] {current_file}"
+                        
+                        # playback position from the client's last STATUS heartbeat
+                        position = client.playback_position() if client.is_broadcasting(current_file) else None
+                        if position is not None:
+                            line += f" ({self.server._format_duration(position)})"
+                        
+                        Log.print(line, 'cyan')
             
             Log.print("\nQueue:", 'yellow')
             for i, filename in enumerate(self.queue, 1):
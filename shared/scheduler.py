@@ -0,0 +1,169 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+# priority classes, lower goes first
+PRIORITY_LIVE = 0 # live pcm streams, never queued nor throttled
+PRIORITY_QUEUE = 1 # files needed for a broadcast or an interactive upload
+PRIORITY_BACKGROUND = 2 # sync and other bulk transfers
+
+LIVE_TRANSFER_RATE = 2 * 1024 * 1024 # bytes/s left to bulk transfers while a live stream runs
+
+class TokenBucket:
+
+    # rate limiter for byte streams, rate is in bytes/s (0 = unlimited)
+    # callers take the bytes first and sleep off the debt, so a chunk
+    # bigger than the bucket never blocks forever
+
+    def __init__(self, rate: float = 0):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def set_rate(self, rate: float):
+        self._refill()
+        self.rate = rate
+        self.tokens = min(self.tokens, rate)
+
+    def _refill(self):
+        now = time.monotonic()
+
+        if self.rate > 0:
+            # capacity is one second worth of bytes
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+
+        self.updated = now
+
+    async def consume(self, amount: int):
+        if self.rate <= 0:
+            return
+
+        # the lock keeps waiters in arrival order
+        async with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+            if self.tokens < 0:
+                await asyncio.sleep(-self.tokens / self.rate)
+
+
+class TransferScheduler:
+
+    # decides when a transfer may start and how fast bulk bytes flow
+    # - slots: a global cap (server-sent transfers only) and a per-client cap,
+    #   waiters are served by priority then arrival order
+    # - throttle: one token bucket shared by all bulk transfers, slowed
+    #   down to live_rate while a live stream is running
+
+    def __init__(self, max_active: int = 16, per_client: int = 2, rate: float = 0, live_rate: float = LIVE_TRANSFER_RATE):
+        self.max_active = max(1, max_active)
+        self.per_client = max(1, per_client)
+        self.rate = rate
+        self.live_rate = live_rate
+        self.bucket = TokenBucket(rate)
+
+        self.active = 0
+        self.active_per_client: Dict[str, int] = {}
+        self.live_streams = 0
+
+        self._waiters: List[tuple] = [] # heap of (priority, seq, client_id, counted, future)
+        self._seq = itertools.count()
+
+    @asynccontextmanager
+    async def slot(self, client_id: str, priority: int = PRIORITY_QUEUE, counted: bool = True):
+        # counted=False for transfers that don't use server bandwidth (peer to peer)
+        await self._acquire(client_id, priority, counted)
+
+        try:
+            yield
+        finally:
+            self._release(client_id, counted)
+
+    async def throttle(self, amount: int):
+        await self.bucket.consume(amount)
+
+    def live_started(self):
+        self.live_streams += 1
+        self._apply_rate()
+
+    def live_stopped(self):
+        self.live_streams = max(0, self.live_streams - 1)
+        self._apply_rate()
+
+    def pending(self) -> int:
+        return sum(1 for entry in self._waiters if not entry[4].done())
+
+    def _apply_rate(self):
+        rate = self.rate
+
+        if self.live_streams and self.live_rate > 0:
+            rate = min(rate, self.live_rate) if rate > 0 else self.live_rate
+
+        if rate != self.bucket.rate:
+            self.bucket.set_rate(rate)
+
+    def _can_start(self, client_id: str, counted: bool) -> bool:
+        if counted and self.active >= self.max_active:
+            return False
+
+        return self.active_per_client.get(client_id, 0) < self.per_client
+
+    def _take(self, client_id: str, counted: bool):
+        if counted:
+            self.active += 1
+
+        self.active_per_client[client_id] = self.active_per_client.get(client_id, 0) + 1
+
+    async def _acquire(self, client_id: str, priority: int, counted: bool):
+        if not self._waiters and self._can_start(client_id, counted):
+            self._take(client_id, counted)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), client_id, counted, future))
+        self._wake()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            # granted right before being cancelled, give the slot back
+            if future.done() and not future.cancelled():
+                self._release(client_id, counted)
+            raise
+
+    def _release(self, client_id: str, counted: bool):
+        if counted:
+            self.active -= 1
+
+        remaining = self.active_per_client.get(client_id, 0) - 1
+
+        if remaining > 0:
+            self.active_per_client[client_id] = remaining
+        else:
+            self.active_per_client.pop(client_id, None)
+
+        self._wake()
+
+    def _wake(self):
+        # grants slots in priority order, skipping waiters blocked by their client's cap
+        blocked = []
+
+        while self._waiters:
+            entry = heapq.heappop(self._waiters)
+            _, _, client_id, counted, future = entry
+
+            if future.done():
+                continue
+
+            if self._can_start(client_id, counted):
+                self._take(client_id, counted)
+                future.set_result(None)
+            else:
+                blocked.append(entry)
+
+        for entry in blocked:
+            heapq.heappush(self._waiters, entry)
@@ -1,7 +1,8 @@
 import asyncio
+import itertools
 import ssl
 import websockets
-from typing import Callable, Dict, Optional
+from typing import Callable, Dict, Optional, Union
 from websockets.server import WebSocketServerProtocol
 from websockets.client import WebSocketClientProtocol
 from shared.logger import Log
@@ -9,6 +10,41 @@ from shared.logger import Log
 PING_INTERVAL = 30
 PING_TIMEOUT = 5
 
+# outbound messages go through a bounded queue per client, written by its own task
+SEND_QUEUE_SIZE = 256
+SEND_QUEUE_TIMEOUT = 10 # seconds a full queue may take to make room before the client is dropped
+SEND_CONTROL = 0 # commands, sent first
+SEND_BULK = 1 # transfer tokens and other non urgent messages
+
+class Outbox:
+
+    # messages waiting to be written to one client, by priority then order
+    # items are (priority, seq, message, future or None)
+
+    def __init__(self, websocket: WebSocketServerProtocol, size: int = SEND_QUEUE_SIZE):
+        self.websocket = websocket
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue(size)
+        self.seq = itertools.count()
+        self.task: Optional[asyncio.Task] = None
+        self.overflowed = False # client is being dropped, refuse anything new
+
+        # metrics
+        self.sent = 0
+        self.dropped = 0
+        self.peak = 0
+
+    def metrics(self) -> dict:
+        return {'queued': self.queue.qsize(), 'peak': self.peak, 'sent': self.sent, 'dropped': self.dropped}
+
+    def discard(self):
+        # whatever is left won't be sent, unblock anyone waiting on it
+        while not self.queue.empty():
+            _, _, _, done = self.queue.get_nowait()
+            self.dropped += 1
+            if done and not done.done():
+                done.set_result(False)
+
+
 class BWWebSocketServer:
     def __init__(self, host: str, port: int, ssl_context: ssl.SSLContext, on_message_callback: Callable, on_connect_callback: Callable, on_disconnect_callback: Callable
     ):
@@ -24,6 +60,9 @@ class BWWebSocketServer:
         
         self.pending_clients: Dict[WebSocketServerProtocol, dict] = {}
         
+        self.outboxes: Dict[str, Outbox] = {}
+        self.overflows = 0 # clients dropped because their queue stayed full
+        
         self.server = None
         self.running = False
     
@@ -64,6 +103,7 @@ class BWWebSocketServer:
                             client_id = temp_data['client_id']
                             del self.pending_clients[websocket]
                             self.clients[client_id] = websocket
+                            self._open_outbox(client_id, websocket)
                             await self.on_connect(client_id, websocket)
                 else:
                     # registred = process normally
@@ -80,7 +120,12 @@ class BWWebSocketServer:
             if websocket in self.pending_clients:
                 del self.pending_clients[websocket]
             
-            if client_id and client_id in self.clients:
+            # a reconnection may already own this id, only close our own outbox
+            outbox = self.outboxes.get(client_id)
+            if outbox and outbox.websocket is websocket:
+                self._close_outbox(client_id)
+            
+            if client_id and self.clients.get(client_id) is websocket:
                 del self.clients[client_id]
                 await self.on_disconnect(client_id)
     
@@ -88,26 +133,110 @@ class BWWebSocketServer:
         if websocket in self.pending_clients:
             self.pending_clients[websocket]['client_id'] = client_id
     
-    async def send(self, client_id: str, message: str):
-        # send a msg to a client
-
-        if client_id in self.clients:
+    async def send(self, client_id: str, message: Union[str, bytes], priority: int = SEND_CONTROL, wait: bool = False) -> bool:
+        """
+        Queue a message for a client.
+        
+        Returns once the message is queued, so a slow client doesn't hold
+        the caller. If its queue stays full for SEND_QUEUE_TIMEOUT, the
+        client is considered stuck and disconnected.
+        
+        Args:
+            client_id (str): Target client
+            message (str | bytes): Message (bytes are sent as a binary frame)
+            priority (int): SEND_CONTROL or SEND_BULK
+            wait (bool): Also wait until the message was written
+        
+        Returns:
+            bool: False if the message was dropped (or failed to send, with wait)
+        """
+        outbox = self.outboxes.get(client_id)
+        if not outbox or outbox.overflowed:
+            return False
+        
+        done = asyncio.get_running_loop().create_future() if wait else None
+        item = (priority, next(outbox.seq), message, done)
+        
+        try:
+            outbox.queue.put_nowait(item)
+        except asyncio.QueueFull:
             try:
-                await self.clients[client_id].send(message)
-            except Exception as e:
-                Log.error(
-                    f"Error sending to {client_id} "
-                    f"({type(e).__name__}): {repr(e)}"
-                    )
+                await asyncio.wait_for(outbox.queue.put(item), timeout=SEND_QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                outbox.dropped += 1
+                
+                if outbox.overflowed:
+                    return False
+                
+                outbox.overflowed = True
+                self.overflows += 1
+                Log.warning(f"Send queue of {client_id} stayed full ({outbox.queue.maxsize} messages), disconnecting it")
+                asyncio.ensure_future(outbox.websocket.close())
+                return False
+        
+        outbox.peak = max(outbox.peak, outbox.queue.qsize())
+        
+        if done:
+            return await done
+        
+        return True
     
-    async def broadcast(self, message: str, exclude: Optional[str] = None):
+    async def broadcast(self, message: Union[str, bytes], exclude: Optional[str] = None):
         tasks = []
-        for client_id, websocket in self.clients.items():
+        for client_id in list(self.clients):
             if client_id != exclude:
-                tasks.append(websocket.send(message))
+                tasks.append(self.send(client_id, message))
         
         if tasks:
             await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def metrics(self) -> Dict[str, dict]:
+        # {client_id: {'queued', 'peak', 'sent', 'dropped'}}
+        return {client_id: outbox.metrics() for client_id, outbox in self.outboxes.items()}
+    
+    def _open_outbox(self, client_id: str, websocket: WebSocketServerProtocol):
+        self._close_outbox(client_id)
+        
+        outbox = Outbox(websocket)
+        outbox.task = asyncio.create_task(self._writer(client_id, outbox))
+        self.outboxes[client_id] = outbox
+    
+    def _close_outbox(self, client_id: str):
+        outbox = self.outboxes.pop(client_id, None)
+        
+        if outbox:
+            outbox.task.cancel()
+            outbox.discard()
+    
+    async def _writer(self, client_id: str, outbox: Outbox):
+        while True:
+            _, _, message, done = await outbox.queue.get()
+            
+            try:
+                await outbox.websocket.send(message)
+                outbox.sent += 1
+                
+                if done and not done.done():
+                    done.set_result(True)
+            
+            except asyncio.CancelledError:
+                # outbox closed mid-send, discard() can't see this one anymore
+                if done and not done.done():
+                    done.set_result(False)
+                raise
+            
+            except Exception as e:
+                if done and not done.done():
+                    done.set_result(False)
+                
+                if isinstance(e, websockets.exceptions.ConnectionClosed):
+                    outbox.discard()
+                    return
+                
+                Log.error(
+                    f"Error sending to {client_id} "
+                    f"({type(e).__name__}): {repr(e)}"
+                    )
 
 
 class BWWebSocketClient:    
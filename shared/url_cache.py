@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional, Tuple
+
+from shared.downloader import download, NotModified
+from shared.logger import Log
+
+class URLCache:
+
+    # server side copies of remote files, so a url sent to several clients is
+    # fetched and converted once. only the final wav is kept, along with the
+    # ETag / Last-Modified validators used to revalidate it with a conditional
+    # request. least recently used entries go once the cache outgrows max_bytes
+
+    def __init__(self, directory: str, max_bytes: int = 2 * 1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock() # fetches run in executor threads
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def cached(self, url: str) -> Optional[dict]:
+        """
+        Get the cache entry of a url.
+
+        Returns:
+            dict: {'url', 'wav', 'size', 'sha256', 'etag', 'last_modified', 'fetched_at'}
+                  or None if the url isn't cached (or its wav is gone)
+        """
+        meta_path = self._meta_path(self._key(url))
+
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get('url') != url or not os.path.isfile(entry.get('wav', '')):
+            return None
+
+        # mtime of the metadata = last use, for pruning
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+
+        return entry
+
+    def fetch(self, url: str, ext: str, progress_callback: Optional[Callable[[int, int], None]] = None) -> Optional[Tuple[str, dict]]:
+        """
+        Download a url unless the cached copy is still current.
+
+        Args:
+            url (str): http(s) url
+            ext (str): Extension of the remote file, kept on the downloaded copy
+            progress_callback (callable): Download progress callback
+
+        Returns:
+            None if the cached entry is still good, else (downloaded path, validators)
+            to convert and pass to store()
+
+        Raises:
+            DownloadError: If the download failed
+        """
+        os.makedirs(self.directory, exist_ok=True)
+
+        entry = self.cached(url)
+        headers = {}
+
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        validators = {}
+
+        def on_response(response_headers):
+            validators['etag'] = response_headers.get('ETag')
+            validators['last_modified'] = response_headers.get('Last-Modified')
+
+        # unique name, the same url may be fetched twice at once
+        path = os.path.join(self.directory, f".{self._key(url)}_{uuid.uuid4().hex[:8]}.{ext}")
+
+        try:
+            download(url, path, progress_callback=progress_callback, headers=headers, on_response=on_response)
+        except NotModified:
+            return None
+
+        return path, validators
+
+    def store(self, url: str, wav_path: str, validators: Dict[str, Optional[str]], sha256: str) -> dict:
+        # moves a converted wav into the cache and records it
+        key = self._key(url)
+        final_path = os.path.join(self.directory, f"{key}.wav")
+
+        entry = {
+            'url': url,
+            'wav': final_path,
+            'size': os.path.getsize(wav_path),
+            'sha256': sha256,
+            'etag': validators.get('etag'),
+            'last_modified': validators.get('last_modified'),
+            'fetched_at': time.time()
+        }
+
+        with self._lock:
+            os.replace(wav_path, final_path)
+
+            tmp_path = self._meta_path(key) + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._meta_path(key))
+
+        self.prune()
+        return entry
+
+    def prune(self):
+        with self._lock:
+            entries = []
+
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json'):
+                    continue
+
+                key = name[:-5]
+                meta_path = os.path.join(self.directory, name)
+                wav_path = os.path.join(self.directory, f"{key}.wav")
+
+                try:
+                    size = os.path.getsize(wav_path) if os.path.exists(wav_path) else 0
+                    entries.append((os.path.getmtime(meta_path), size, meta_path, wav_path))
+                except OSError:
+                    continue
+
+            total = sum(entry[1] for entry in entries)
+
+            for _, size, meta_path, wav_path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+
+                for path in (meta_path, wav_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+                total -= size
+                Log.file(f"Pruned cached download ({size} bytes)")
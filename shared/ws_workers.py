@@ -0,0 +1,297 @@
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import ssl
+import struct
+import tempfile
+import websockets
+from typing import Dict, List, Optional, Tuple, Union
+
+from shared.logger import Log
+from shared.socket import BWWebSocketServer, PING_INTERVAL, PING_TIMEOUT
+
+# optional multi-process websocket front end. worker processes share the
+# websocket port (SO_REUSEPORT), each one doing tls, websocket framing,
+# compression and pings for its share of the clients. messages are relayed
+# to the main process over a unix socket, where BWWebSocketServer sees each
+# client through a RemoteSocket, so all the server logic stays in one place.
+#
+# bus frames: 1 byte kind | 4 bytes connection id | 4 bytes length | payload
+
+FRAME_HEADER = struct.Struct(">BII")
+FRAME_OPEN = 1 # payload: json [ip, port] of the client
+FRAME_TEXT = 2
+FRAME_BINARY = 3
+FRAME_CLOSE = 4 # worker -> main: client gone, main -> worker: close it
+FRAME_READY = 5 # worker -> main: listening
+
+WORKER_QUEUE_SIZE = 256 # messages waiting to be written to one client by a worker
+WORKER_START_TIMEOUT = 30 # seconds for the workers to start listening
+
+
+def encode_frame(kind: int, conn_id: int, payload: bytes = b'') -> bytes:
+    return FRAME_HEADER.pack(kind, conn_id, len(payload)) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[int, int, bytes]:
+    kind, conn_id, length = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    payload = await reader.readexactly(length) if length else b''
+    return kind, conn_id, payload
+
+
+def encode_message(conn_id: int, message: Union[str, bytes]) -> bytes:
+    if isinstance(message, bytes):
+        return encode_frame(FRAME_BINARY, conn_id, message)
+    return encode_frame(FRAME_TEXT, conn_id, message.encode('utf-8'))
+
+
+class RemoteSocket:
+
+    # a client websocket held by a worker process, with the parts of the
+    # websocket interface BWWebSocketServer and the server use
+
+    def __init__(self, writer: asyncio.StreamWriter, conn_id: int, remote_address: tuple):
+        self.writer = writer
+        self.conn_id = conn_id
+        self.remote_address = remote_address
+        self.closed = False
+        self._incoming: asyncio.Queue = asyncio.Queue()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Union[str, bytes]:
+        message = await self._incoming.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+    def feed(self, message: Optional[Union[str, bytes]]):
+        # None = the worker reported the client gone
+        if message is None:
+            self.closed = True
+        self._incoming.put_nowait(message)
+
+    async def send(self, message: Union[str, bytes]):
+        if self.closed or self.writer.is_closing():
+            return
+
+        self.writer.write(encode_message(self.conn_id, message))
+        await self.writer.drain()
+
+    async def close(self):
+        # the worker answers with FRAME_CLOSE once the client is gone
+        if self.closed or self.writer.is_closing():
+            return
+
+        self.writer.write(encode_frame(FRAME_CLOSE, self.conn_id))
+        await self.writer.drain()
+
+
+class WorkerPool:
+    def __init__(self, ws_server: BWWebSocketServer, workers: int, cert_path: str, key_path: str):
+        self.ws_server = ws_server
+        self.workers = workers
+        self.cert_path = cert_path
+        self.key_path = key_path
+
+        self.bus_path = os.path.join(tempfile.gettempdir(), f"botwave-ws-{os.getpid()}.sock")
+        self.bus = None
+        self.processes: List[multiprocessing.Process] = []
+        self.sockets: Dict[Tuple[int, int], RemoteSocket] = {} # (worker, conn id) -> socket
+        self.worker_ids = itertools.count()
+        self.listening = 0 # workers accepting clients
+        self.all_listening = asyncio.Event()
+
+    async def start(self):
+        if os.path.exists(self.bus_path):
+            os.remove(self.bus_path)
+
+        self.bus = await asyncio.start_unix_server(self._handle_worker, self.bus_path)
+        os.chmod(self.bus_path, 0o600)
+
+        # spawn, forking a process running an event loop in a thread isn't safe
+        context = multiprocessing.get_context('spawn')
+
+        for index in range(self.workers):
+            process = context.Process(
+                target=run_worker,
+                args=(index, self.ws_server.host, self.ws_server.port, self.cert_path, self.key_path, self.bus_path),
+                name=f"botwave-ws-{index}",
+                daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+
+        # spawned workers take a while to import and bind
+        try:
+            await asyncio.wait_for(self.all_listening.wait(), timeout=WORKER_START_TIMEOUT)
+        except asyncio.TimeoutError:
+            Log.warning(f"Only {self.listening} of {self.workers} WebSocket workers started listening")
+
+        self.ws_server.running = True
+        Log.server(f"WebSocket server started on wss://{self.ws_server.host}:{self.ws_server.port} ({self.workers} worker processes)")
+
+    async def stop(self):
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+
+        for process in self.processes:
+            await asyncio.get_running_loop().run_in_executor(None, process.join, 5)
+
+        self.processes.clear()
+
+        # their clients went with them, end the handlers still reading from them
+        for sock in self.sockets.values():
+            sock.feed(None)
+        self.sockets.clear()
+
+        if self.bus:
+            self.bus.close()
+            await self.bus.wait_closed()
+
+        if os.path.exists(self.bus_path):
+            os.remove(self.bus_path)
+
+    async def _handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        worker = next(self.worker_ids)
+
+        try:
+            while True:
+                kind, conn_id, payload = await read_frame(reader)
+                key = (worker, conn_id)
+
+                if kind == FRAME_OPEN:
+                    sock = RemoteSocket(writer, conn_id, tuple(json.loads(payload)))
+                    self.sockets[key] = sock
+                    asyncio.create_task(self.ws_server._handle_client(sock, "/"))
+
+                elif kind == FRAME_CLOSE:
+                    sock = self.sockets.pop(key, None)
+                    if sock:
+                        sock.feed(None)
+
+                elif kind == FRAME_READY:
+                    self.listening += 1
+                    if self.listening >= self.workers:
+                        self.all_listening.set()
+
+                elif key in self.sockets:
+                    self.sockets[key].feed(payload if kind == FRAME_BINARY else payload.decode('utf-8'))
+
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            # its clients went with it
+            for key in [key for key in self.sockets if key[0] == worker]:
+                self.sockets.pop(key).feed(None)
+
+            writer.close()
+
+            if self.ws_server.running:
+                Log.warning(f"WebSocket worker {worker} disconnected from the bus")
+
+
+def run_worker(index: int, host: str, port: int, cert_path: str, key_path: str, bus_path: str):
+    try:
+        asyncio.run(_worker(index, host, port, cert_path, key_path, bus_path))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _worker(index: int, host: str, port: int, cert_path: str, key_path: str, bus_path: str):
+    ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    ssl_context.load_cert_chain(cert_path, key_path)
+
+    reader, writer = await asyncio.open_unix_connection(bus_path)
+
+    conn_ids = itertools.count(1)
+    connections: Dict[int, tuple] = {} # conn id -> (websocket, send queue)
+
+    async def write_bus(data: bytes):
+        writer.write(data)
+        await writer.drain()
+
+    async def client_writer(websocket, outbox: asyncio.Queue):
+        # one writer per client, a slow one doesn't hold the bus
+        while True:
+            message = await outbox.get()
+
+            try:
+                if message is None:
+                    await websocket.close()
+                    return
+
+                await websocket.send(message)
+            except websockets.exceptions.ConnectionClosed:
+                return
+
+    async def handle_client(websocket, path):
+        conn_id = next(conn_ids)
+        outbox = asyncio.Queue(WORKER_QUEUE_SIZE)
+        connections[conn_id] = (websocket, outbox)
+        sender = asyncio.create_task(client_writer(websocket, outbox))
+
+        try:
+            await write_bus(encode_frame(FRAME_OPEN, conn_id, json.dumps(list(websocket.remote_address[:2])).encode('utf-8')))
+
+            async for message in websocket:
+                await write_bus(encode_message(conn_id, message))
+
+        except (websockets.exceptions.ConnectionClosed, ConnectionError):
+            pass
+        finally:
+            connections.pop(conn_id, None)
+            sender.cancel()
+
+            if not writer.is_closing():
+                try:
+                    await write_bus(encode_frame(FRAME_CLOSE, conn_id))
+                except ConnectionError:
+                    pass
+
+    server = await websockets.serve(
+        handle_client,
+        host,
+        port,
+        ssl=ssl_context,
+        ping_interval=PING_INTERVAL,
+        ping_timeout=PING_TIMEOUT,
+        reuse_port=True
+    )
+
+    await write_bus(encode_frame(FRAME_READY, 0))
+
+    try:
+        while True:
+            kind, conn_id, payload = await read_frame(reader)
+
+            if conn_id not in connections:
+                continue
+
+            websocket, outbox = connections[conn_id]
+
+            if kind == FRAME_CLOSE:
+                message = None
+            else:
+                message = payload if kind == FRAME_BINARY else payload.decode('utf-8')
+
+            try:
+                outbox.put_nowait(message)
+            except asyncio.QueueFull:
+                # the main process has its own bounded queue, this one only fills for a stuck client.
+                # forgotten here so it's closed once, the rest of its frames are dropped
+                Log.warning(f"WebSocket worker {index}: send queue of connection {conn_id} is full, closing it")
+                del connections[conn_id]
+                asyncio.ensure_future(websocket.close())
+
+    except (asyncio.IncompleteReadError, ConnectionError):
+        # main process is gone
+        pass
+    finally:
+        writer.close()
+        server.close()
+        await server.wait_closed()
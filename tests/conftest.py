@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+
+# same as the programs do, so tests import the shared dir as a package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from server.server import BotWaveClient, BotWaveServer
+from shared.protocol import ProtocolParser
+
+
+class FakeWSServer:
+    # stands in for BWWebSocketServer: records what the server sends, parsed,
+    # and passes it on to the client's socket once registration gave it one
+
+    def __init__(self):
+        self.sent = [] # (client_id, parsed command)
+        self.sockets = {}
+        self.on_send = None # async (client_id, parsed command), e.g. to answer like a client would
+
+    def register_client(self, websocket, client_id):
+        self.sockets[client_id] = websocket
+
+    async def send(self, client_id, message, priority=0, wait=False):
+        parsed = ProtocolParser.parse_command(message)
+        self.sent.append((client_id, parsed))
+
+        if client_id in self.sockets:
+            await self.sockets[client_id].send(message)
+
+        if self.on_send:
+            await self.on_send(client_id, parsed)
+
+        return True
+
+
+@pytest.fixture
+def make_server(tmp_path):
+    # BotWaveServer(*client ids connected, **constructor arguments) with its
+    # directories under tmp_path and a FakeWSServer in place of the socket
+    def make(*client_ids, **kwargs):
+        server = BotWaveServer(upload_dir=str(tmp_path / 'uploads'), handlers_dir=str(tmp_path), cache_dir=str(tmp_path / 'cache'), **kwargs)
+        server.ws_server = FakeWSServer()
+
+        for client_id in client_ids:
+            server.clients[client_id] = BotWaveClient(client_id, None, {'hostname': client_id}, '')
+
+        return server
+
+    return make
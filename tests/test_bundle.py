@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import pytest
+
+from shared.bundle import BUNDLE_END, HEADER_LENGTH, MAX_HEADER_SIZE, BundleError, bundle_size, encode_header, read_header
+
+
+def reader(data: bytes) -> asyncio.StreamReader:
+    stream = asyncio.StreamReader()
+    stream.feed_data(data)
+    stream.feed_eof()
+    return stream
+
+
+def read(data: bytes):
+    async def run():
+        return await read_header(reader(data))
+    return asyncio.run(run())
+
+
+def test_header_round_trip():
+    assert read(encode_header('a b.wav', 12, 'ff')) == {'name': 'a b.wav', 'size': 12, 'sha256': 'ff'}
+
+
+def test_end_marker():
+    assert read(BUNDLE_END) is None
+
+
+def test_entries_follow_each_other():
+    async def run():
+        stream = reader(encode_header('one.wav', 3, None) + b'abc' + encode_header('two.wav', 0, None) + BUNDLE_END)
+        first = await read_header(stream)
+        data = await stream.readexactly(first['size'])
+        second = await read_header(stream)
+        return first, data, second, await read_header(stream)
+
+    first, data, second, end = asyncio.run(run())
+    assert first['name'] == 'one.wav' and data == b'abc'
+    assert second == {'name': 'two.wav', 'size': 0, 'sha256': None}
+    assert end is None
+
+
+def test_oversized_header():
+    with pytest.raises(BundleError):
+        read(HEADER_LENGTH.pack(MAX_HEADER_SIZE + 1))
+
+
+@pytest.mark.parametrize('header', [b'not json', b'{"size": 1}', b'{"name": "x", "size": "big"}', b'{"name": "x", "size": -1}'])
+def test_invalid_header(header):
+    with pytest.raises(BundleError):
+        read(HEADER_LENGTH.pack(len(header)) + header)
+
+
+def test_truncated_header():
+    with pytest.raises(asyncio.IncompleteReadError):
+        read(encode_header('x.wav', 1, None)[:-2])
+
+
+def test_bundle_size():
+    entries = [{'filename': 'a.wav', 'size': 10, 'sha256': 'x'}, {'filename': 'b.wav', 'size': 0}]
+    expected = len(encode_header('a.wav', 10, 'x')) + 10 + len(encode_header('b.wav', 0, None)) + len(BUNDLE_END)
+    assert bundle_size(entries) == expected
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import sys
+import wave
+
+import pytest
+
+from shared.converter import ConversionPool, ConvertError, Converter
+
+# stands in for ffmpeg: copies stdin to the output path (last argument)
+COPY = "import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, open(sys.argv[-1], 'wb'))"
+FAIL = COPY + "; sys.exit(1)"
+# stands in for a running ffmpeg: marks itself running, writes part of the output, then takes its time
+SLOW = (
+    "import os, sys, time; out = sys.argv[-1]; open(out + '.pid', 'w').write(str(os.getpid()));"
+    "open(out + '.running', 'w').close(); open(out, 'wb').write(b'RIFF'); time.sleep(float(sys.argv[1]));"
+    "os.remove(out + '.running')"
+)
+
+
+def fake_ffmpeg(monkeypatch, script):
+    monkeypatch.setattr(Converter, "_ffmpeg_command", staticmethod(
+        lambda source, destination: [sys.executable, "-c", script, destination]
+    ))
+
+
+def slow_ffmpeg(monkeypatch, seconds):
+    monkeypatch.setattr(Converter, "_ffmpeg_command", staticmethod(
+        lambda source, destination: [sys.executable, "-c", SLOW, str(seconds), destination]
+    ))
+
+
+def test_stream_conversion_renames_into_place(tmp_path, monkeypatch):
+    fake_ffmpeg(monkeypatch, COPY)
+    destination = tmp_path / "song.wav"
+    seen = []
+
+    def chunks():
+        yield b"RIFF"
+        # nothing under the final name while the conversion runs
+        seen.append(destination.exists())
+        yield b"data"
+
+    Converter.convert_wav_stream(chunks(), str(destination))
+
+    assert seen == [False]
+    assert destination.read_bytes() == b"RIFFdata"
+    assert os.listdir(tmp_path) == ["song.wav"]
+
+
+def test_failed_stream_conversion_leaves_nothing(tmp_path, monkeypatch):
+    fake_ffmpeg(monkeypatch, FAIL)
+
+    with pytest.raises(ConvertError):
+        Converter.convert_wav_stream(iter([b"RIFF"]), str(tmp_path / "song.wav"))
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_interrupted_stream_conversion_leaves_nothing(tmp_path, monkeypatch):
+    fake_ffmpeg(monkeypatch, COPY)
+
+    def chunks():
+        yield b"RIFF"
+        raise OSError("connection reset")
+
+    with pytest.raises(OSError):
+        Converter.convert_wav_stream(chunks(), str(tmp_path / "song.wav"))
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_wav_duration(tmp_path):
+    path = tmp_path / "song.wav"
+
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(48000)
+        f.writeframes(b"\0" * 4 * 48000 * 3)
+
+    assert Converter.wav_duration(str(path)) == 3
+    assert Converter.wav_duration(str(tmp_path / "missing.wav")) is None
+
+    (tmp_path / "bad.wav").write_bytes(b"not a wav")
+    assert Converter.wav_duration(str(tmp_path / "bad.wav")) is None
+
+
+def test_pool_caps_concurrent_conversions(tmp_path, monkeypatch):
+    slow_ffmpeg(monkeypatch, 0.3)
+    (tmp_path / "song.mp3").write_bytes(b"mp3")
+
+    async def run():
+        pool = ConversionPool(workers=2)
+        conversions = asyncio.gather(*[
+            pool.convert(str(tmp_path / "song.mp3"), str(tmp_path / f"{index}.wav")) for index in range(5)
+        ])
+        most = 0
+
+        while not conversions.done():
+            most = max(most, len(list(tmp_path.glob("*.running"))))
+            await asyncio.sleep(0.01)
+
+        return most, await conversions, pool
+
+    most, destinations, pool = asyncio.run(run())
+    assert most == 2
+    assert destinations == [str(tmp_path / f"{index}.wav") for index in range(5)]
+    assert [job.state for job in pool.jobs.values()] == ["done"] * 5
+
+
+def test_cancelled_job_kills_ffmpeg_and_removes_its_output(tmp_path, monkeypatch):
+    slow_ffmpeg(monkeypatch, 30)
+    (tmp_path / "song.mp3").write_bytes(b"mp3")
+    destination = tmp_path / "song.wav"
+
+    async def run():
+        pool = ConversionPool(workers=1)
+        job = pool.submit(str(tmp_path / "song.mp3"), str(destination))
+
+        # cancelled while ffmpeg is writing
+        while not (tmp_path / "song.wav.running").exists():
+            await asyncio.sleep(0.01)
+
+        assert pool.cancel(job.id)
+
+        # killed, not left to finish
+        with pytest.raises(ConvertError):
+            await asyncio.wait_for(job.wait(), timeout=5)
+
+        return job
+
+    job = asyncio.run(run())
+    assert job.state == "cancelled"
+    assert not destination.exists()
+
+    with pytest.raises(ProcessLookupError):
+        os.kill(int((tmp_path / "song.wav.pid").read_text()), 0)
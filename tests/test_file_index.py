@@ -0,0 +1,138 @@
+import hashlib
+import os
+import threading
+
+import pytest
+
+import shared.file_index as file_index
+from shared.file_index import FileIndex, IndexWatcher, pack_entries, unpack_entries
+
+
+def write(directory, name, data: bytes):
+    with open(os.path.join(directory, name), 'wb') as f:
+        f.write(data)
+
+
+def test_scan_hashes_matching_files(tmp_path):
+    write(tmp_path, 'a.wav', b'aaa')
+    write(tmp_path, 'B.WAV', b'bb')
+    write(tmp_path, 'notes.txt', b'x')
+    write(tmp_path, '.hidden.wav', b'x')
+
+    entries = FileIndex(str(tmp_path)).scan(with_hashes=True)
+
+    assert [entry['name'] for entry in entries] == ['B.WAV', 'a.wav']
+    assert entries[1]['sha256'] == hashlib.sha256(b'aaa').hexdigest()
+
+
+def test_index_is_persisted_and_reused(tmp_path, monkeypatch):
+    write(tmp_path, 'a.wav', b'aaa')
+    FileIndex(str(tmp_path)).scan(with_hashes=True)
+
+    # unchanged files are not hashed again
+    monkeypatch.setattr(file_index, 'hash_file', lambda path: (_ for _ in ()).throw(AssertionError(path)))
+    entries = FileIndex(str(tmp_path)).scan(with_hashes=True)
+    assert entries[0]['sha256'] == hashlib.sha256(b'aaa').hexdigest()
+
+
+def test_changed_file_is_rehashed(tmp_path):
+    write(tmp_path, 'a.wav', b'aaa')
+    index = FileIndex(str(tmp_path))
+    index.scan(with_hashes=True)
+
+    write(tmp_path, 'a.wav', b'longer')
+    assert index.get('a.wav')['sha256'] == hashlib.sha256(b'longer').hexdigest()
+
+
+def test_removed_file_leaves_the_index(tmp_path):
+    write(tmp_path, 'a.wav', b'aaa')
+    index = FileIndex(str(tmp_path))
+    index.scan()
+
+    os.remove(os.path.join(tmp_path, 'a.wav'))
+    assert index.scan() == []
+    assert index.get('a.wav') is None
+
+
+def test_pack_round_trip():
+    entries = [{'name': 'a.wav', 'size': 1, 'sha256': 'x'}, {'name': 'b.wav', 'size': 2, 'sha256': None}]
+    fields = ['name', 'size', 'sha256']
+    assert unpack_entries(pack_entries(entries, fields), fields) == entries
+
+
+def test_watcher_reports_changes(tmp_path):
+    write(tmp_path, 'keep.wav', b'k')
+    write(tmp_path, 'gone.wav', b'g')
+    write(tmp_path, 'edit.wav', b'e')
+
+    changes = []
+    watcher = IndexWatcher(FileIndex(str(tmp_path)), changes.extend)
+    baseline = watcher.snapshot()
+    assert {entry['name'] for entry in baseline} == {'keep.wav', 'gone.wav', 'edit.wav'}
+
+    os.remove(os.path.join(tmp_path, 'gone.wav'))
+    write(tmp_path, 'edit.wav', b'edited')
+    write(tmp_path, 'new.wav', b'n')
+    write(tmp_path, 'ignored.txt', b'n')
+    watcher._refresh()
+
+    events = {change['name']: change for change in changes}
+    assert set(events) == {'gone.wav', 'edit.wav', 'new.wav'}
+    assert events['gone.wav']['event'] == 'removed'
+    assert events['edit.wav']['event'] == 'modified'
+    assert events['edit.wav']['sha256'] == hashlib.sha256(b'edited').hexdigest()
+    assert events['new.wav']['event'] == 'added'
+
+    # nothing new, nothing reported
+    changes.clear()
+    watcher._refresh()
+    assert changes == []
+
+
+def test_watcher_thread_polls(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_index, 'INotify', None)
+    seen = threading.Event()
+    changes = []
+
+    def on_change(batch):
+        changes.extend(batch)
+        seen.set()
+
+    watcher = IndexWatcher(FileIndex(str(tmp_path)), on_change, poll_interval=0.05)
+    watcher.snapshot()
+    watcher.start()
+
+    try:
+        write(tmp_path, 'late.wav', b'l')
+        assert seen.wait(2)
+    finally:
+        watcher.stop()
+
+    assert changes[0]['name'] == 'late.wav'
+
+
+@pytest.mark.parametrize("inotify", [False, True])
+def test_watcher_reports_changes_made_before_start(tmp_path, monkeypatch, inotify):
+    if inotify and file_index.INotify is None:
+        pytest.skip("inotify_simple is not installed")
+    if not inotify:
+        monkeypatch.setattr(file_index, 'INotify', None)
+    seen = threading.Event()
+    changes = []
+
+    def on_change(batch):
+        changes.extend(batch)
+        seen.set()
+
+    # the snapshot is sent, then something lands before the watch begins
+    watcher = IndexWatcher(FileIndex(str(tmp_path)), on_change, poll_interval=60)
+    assert watcher.snapshot() == []
+    write(tmp_path, 'between.wav', b'b')
+    watcher.start()
+
+    try:
+        assert seen.wait(2)
+    finally:
+        watcher.stop()
+
+    assert [change['name'] for change in changes] == ['between.wav']
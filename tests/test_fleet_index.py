@@ -0,0 +1,64 @@
+from shared.fleet_index import FleetIndex
+
+
+def entry(name, size=1, sha256='h'):
+    return {'name': name, 'size': size, 'sha256': sha256}
+
+
+def test_reset_and_apply():
+    index = FleetIndex()
+    index.reset('a', [entry('x.wav'), entry('y.wav')])
+
+    index.apply('a', 'added', 'z.wav', 3, 'hz')
+    index.apply('a', 'removed', 'x.wav')
+    index.apply('a', 'modified', 'y.wav', 5, 'hy')
+
+    assert index.names('a') == {'y.wav', 'z.wav'}
+    assert index.manifest('a')['y.wav'] == {'name': 'y.wav', 'size': 5, 'sha256': 'hy'}
+    assert 'x.wav' not in index.presence
+
+
+def test_apply_ignores_untracked_clients():
+    index = FleetIndex()
+    index.apply('ghost', 'added', 'x.wav', 1, 'h')
+    assert not index.tracks('ghost')
+    assert index.presence == {}
+
+
+def test_reset_replaces_previous_snapshot():
+    index = FleetIndex()
+    index.reset('a', [entry('old.wav')])
+    index.reset('a', [entry('new.wav')])
+    assert index.names('a') == {'new.wav'}
+    assert 'old.wav' not in index.presence
+
+
+def test_common_and_lacking():
+    index = FleetIndex()
+    index.reset('a', [entry('x.wav'), entry('y.wav')])
+    index.reset('b', [entry('x.wav')])
+
+    assert index.common(['a', 'b']) == {'x.wav'}
+    assert index.lacking('y.wav', ['a', 'b', 'untracked']) == ['b']
+    assert index.common(['untracked']) == set()
+
+
+def test_drop_frees_presence_and_slot():
+    index = FleetIndex()
+    index.reset('a', [entry('x.wav')])
+    index.reset('b', [entry('x.wav')])
+    slot = index.slots['a']
+
+    index.drop('a')
+    assert not index.tracks('a')
+    assert index.lacking('x.wav', ['b']) == []
+    assert index.presence['x.wav'] == 1 << index.slots['b']
+
+    # a later client reuses the slot, without inheriting a's files
+    index.reset('c', [])
+    assert index.slots['c'] == slot
+    assert index.lacking('x.wav', ['c']) == ['c']
+
+    index.drop('b')
+    assert index.presence == {}
+    index.drop('b') # dropping twice is harmless
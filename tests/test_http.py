@@ -0,0 +1,175 @@
+import asyncio
+import os
+
+import pytest
+
+from shared.http import CHUNK_SIZE, WRITE_BLOCK_SIZE, BWHTTPFileServer, ChunkWriter, TransferError, TransferJob
+
+
+def test_transfer_timeout_starts_when_client_begins():
+    async def run():
+        job = TransferJob("token", 'download')
+
+        async def client():
+            # stuck behind an earlier transfer for longer than the timeout
+            await asyncio.sleep(0.3)
+            job.start()
+            await asyncio.sleep(0.1)
+            job.finish_http()
+            job.ack(True, "done")
+
+        asyncio.create_task(client())
+        return await job.wait(timeout=0.2, ack_timeout=0.2, start_timeout=1)
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_transfer_never_started_times_out():
+    async def run():
+        job = TransferJob("token", 'download')
+        await job.wait(timeout=0.1, ack_timeout=0.1)
+
+    with pytest.raises(TransferError, match="timed out"):
+        asyncio.run(run())
+
+
+def test_transfer_error_before_start():
+    async def run():
+        job = TransferJob("token", 'download')
+        job.ack(False, "disk full")
+        await job.wait(timeout=1, ack_timeout=1)
+
+    with pytest.raises(TransferError, match="disk full"):
+        asyncio.run(run())
+
+
+class FakeContent:
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+
+    async def iter_chunked(self, size):
+        for chunk in self.chunks:
+            yield chunk
+        if self.error:
+            raise self.error
+
+
+class FakeRequest:
+    def __init__(self, token, content):
+        self.match_info = {'token': token}
+        self.headers = {}
+        self.content = content
+
+
+async def upload(tmp_path, content, size):
+    server = BWHTTPFileServer("127.0.0.1", 0, None, str(tmp_path))
+    token = server.create_upload_token("song.wav", size)
+    job = server.transfers[token]
+
+    try:
+        response = await server._handle_upload(FakeRequest(token, content))
+    except asyncio.CancelledError:
+        response = None
+    finally:
+        await server.stop()
+
+    return response, job, server
+
+
+def test_upload_renames_into_place(tmp_path):
+    async def run():
+        response, job, server = await upload(tmp_path, FakeContent([b"RIFF", b"data"]), 8)
+        job.ack(True)
+        return response.status, await job.wait(1), server.upload_tokens
+
+    assert asyncio.run(run()) == (200, '', {})
+    assert os.listdir(tmp_path) == ["song.wav"]
+
+
+def test_cancelled_upload_cleans_up_and_fails_job(tmp_path):
+    async def run():
+        content = FakeContent([b"RIFF"], asyncio.CancelledError())
+        response, job, _ = await upload(tmp_path, content, 8)
+        assert response is None
+        await job.wait(1)
+
+    with pytest.raises(TransferError, match="interrupted"):
+        asyncio.run(run())
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_short_upload_is_rejected(tmp_path):
+    async def run():
+        response, job, _ = await upload(tmp_path, FakeContent([b"RIFF"]), 8)
+        assert response.status == 400
+        await job.wait(1)
+
+    with pytest.raises(TransferError, match="Size mismatch"):
+        asyncio.run(run())
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_chunk_writer_truncates_short_transfer(tmp_path):
+    path = tmp_path / "song.wav"
+
+    async def run():
+        # preallocated for 3MB, only 100 bytes arrive
+        async with ChunkWriter(str(path), 3 * 1024 * 1024) as f:
+            await f.write(b"x" * 100)
+
+    asyncio.run(run())
+    assert path.read_bytes() == b"x" * 100
+
+
+def test_chunk_writer_coalesces_blocks(tmp_path):
+    path = tmp_path / "song.wav"
+    data = os.urandom(WRITE_BLOCK_SIZE * 2 + 12345)
+
+    async def run():
+        async with ChunkWriter(str(path), len(data)) as f:
+            for start in range(0, len(data), CHUNK_SIZE):
+                await f.write(data[start:start + CHUNK_SIZE])
+
+    asyncio.run(run())
+    assert path.read_bytes() == data
+
+
+def test_upload_is_fsynced_before_rename(tmp_path, monkeypatch):
+    events = []
+    fsync, replace = os.fsync, os.replace
+
+    def record_fsync(fd):
+        events.append(('fsync', os.fstat(fd).st_size))
+        fsync(fd)
+
+    def record_replace(source, destination):
+        events.append(('replace', os.path.basename(destination)))
+        replace(source, destination)
+
+    monkeypatch.setattr(os, 'fsync', record_fsync)
+    monkeypatch.setattr(os, 'replace', record_replace)
+
+    async def run():
+        response, _, _ = await upload(tmp_path, FakeContent([b"RIFF", b"data"]), 8)
+        return response.status
+
+    assert asyncio.run(run()) == 200
+    assert events == [('fsync', 8), ('replace', "song.wav")]
+
+
+def test_aborted_write_is_not_fsynced(tmp_path, monkeypatch):
+    events = []
+    monkeypatch.setattr(os, 'fsync', lambda fd: events.append(fd))
+
+    async def run():
+        async with ChunkWriter(str(tmp_path / "song.wav"), 8) as f:
+            await f.write(b"RIFF")
+            raise ValueError("connection lost")
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
+
+    assert events == []
@@ -0,0 +1,58 @@
+import random
+import shlex
+
+import pytest
+
+from shared.protocol import ProtocolParser, split
+
+# quoting, escapes, separators and whitespace shlex treats as plain chars
+ALPHABET = "ab= '\"\\\t\n\x0b\x0c"
+
+
+def shlex_result(line):
+    try:
+        return shlex.split(line)
+    except ValueError as e:
+        return str(e)
+
+
+def split_result(line):
+    try:
+        return split(line)
+    except ValueError as e:
+        return str(e)
+
+
+def test_split_matches_shlex():
+    rng = random.Random(41)
+
+    for _ in range(20000):
+        line = ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 12)))
+        assert split_result(line) == shlex_result(line), repr(line)
+
+
+@pytest.mark.parametrize("line", ["CMD a\x0c", "CMD \x0bx", "CMD x='y'\x0b", "\x0cCMD a"])
+def test_parse_keeps_non_separator_whitespace(line):
+    tokens = shlex.split(line)
+    parsed = ProtocolParser.parse_command(line)
+
+    assert parsed['command'] == tokens[0].upper()
+    assert parsed['args'] + [f"{k}={v}" for k, v in parsed['kwargs'].items()] == tokens[1:]
+
+
+def test_build_parse_round_trip():
+    rng = random.Random(42)
+
+    for _ in range(5000):
+        args = [''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 6))) for _ in range(2)]
+        value = ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 6)))
+        parsed = ProtocolParser.parse_command(ProtocolParser.build_command('CMD', *[a for a in args if '=' not in a], key=value))
+
+        assert parsed['args'] == [a for a in args if '=' not in a]
+        assert parsed['kwargs'] == {'key': value}
+
+
+def test_frames_round_trip():
+    for framing in ('json', 'text'):
+        frame = ProtocolParser.build_frame(framing, 'LIST_FILES', files='a b.wav')
+        assert ProtocolParser.parse_command(frame) == {'command': 'LIST_FILES', 'args': [], 'kwargs': {'files': 'a b.wav'}}
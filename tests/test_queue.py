@@ -0,0 +1,24 @@
+from shared.queue import Queue
+
+
+def make_queue(make_server, listings, tracked=()):
+    server = make_server()
+
+    for client_id in tracked:
+        server.fleet_index.reset(client_id, [{'name': name} for name in listings[client_id]])
+
+    return Queue(server_instance=server)
+
+
+def test_resolve_from_fleet_index(make_server):
+    listings = {'a': {'x.wav', 'y.wav'}, 'b': {'x.wav'}}
+    queue = make_queue(make_server, listings, tracked=('a', 'b'))
+
+    assert queue._resolve_file_specs(['*.wav'], listings) == (['x.wav'], {'b': {'y.wav'}})
+
+
+def test_resolve_mixes_tracked_and_listed_clients(make_server):
+    listings = {'a': {'x.wav', 'y.wav'}, 'b': {'x.wav'}}
+    queue = make_queue(make_server, listings, tracked=('a',))
+
+    assert queue._resolve_file_specs(['x.wav', 'y.wav'], listings) == (['x.wav'], {'b': {'y.wav'}})
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from shared.protocol import Commands, ProtocolParser, RPCError
+
+
+async def reply(server, client_id, command, **kwargs):
+    await server._handle_client_message(client_id, ProtocolParser.build_command(command, **kwargs), None)
+
+
+def rid_of(server, command):
+    return next(parsed['kwargs']['rid'] for _, parsed in server.ws_server.sent if parsed['command'] == command)
+
+
+def test_replies_match_by_request_id(make_server):
+    async def run():
+        server = make_server('pi')
+        listing = asyncio.create_task(server._rpc('pi', Commands.LIST_FILES, timeout=1))
+        stop = asyncio.create_task(server._rpc('pi', Commands.STOP, timeout=1))
+        await asyncio.sleep(0.01)
+
+        # answered out of order, each reply finds its request
+        await reply(server, 'pi', Commands.OK, message="Broadcast stopped", rid=rid_of(server, Commands.STOP))
+        await reply(server, 'pi', Commands.OK, files='[]', rid=rid_of(server, Commands.LIST_FILES))
+
+        return await listing, await stop, server.pending_responses
+
+    listing, stop, pending = asyncio.run(run())
+    assert listing['files'] == '[]'
+    assert stop['message'] == "Broadcast stopped"
+    assert pending == {}
+
+
+def test_reply_from_another_client_is_ignored(make_server):
+    async def run():
+        server = make_server('pi', 'other')
+        request = asyncio.create_task(server._rpc('pi', Commands.STOP, timeout=0.1))
+        await asyncio.sleep(0.01)
+        await reply(server, 'other', Commands.OK, rid=rid_of(server, Commands.STOP))
+        await request
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
+
+
+def test_timeout_clears_pending_request(make_server):
+    async def run():
+        server = make_server('pi')
+        results = await server._fan_out(['pi'], Commands.START, timeout=0.05)
+        return results, server.pending_responses
+
+    results, pending = asyncio.run(run())
+    assert isinstance(results['pi'], asyncio.TimeoutError)
+    assert pending == {}
+
+
+def test_error_reply_raises(make_server):
+    async def run():
+        server = make_server('pi')
+        request = asyncio.create_task(server._rpc('pi', Commands.STOP, timeout=1))
+        await asyncio.sleep(0.01)
+        await reply(server, 'pi', Commands.ERROR, message="No broadcast running", rid=rid_of(server, Commands.STOP))
+        await request
+
+    with pytest.raises(RPCError, match="No broadcast running"):
+        asyncio.run(run())
+
+
+def test_legacy_replies_match_by_command(make_server):
+    async def run():
+        server = make_server('pi')
+        start = asyncio.create_task(server._rpc('pi', Commands.START, timeout=1))
+        listing = asyncio.create_task(server._rpc('pi', Commands.LIST_FILES, timeout=1))
+        await asyncio.sleep(0.01)
+
+        # an earlier transfer's reply doesn't answer the START
+        await reply(server, 'pi', Commands.OK, message="Downloaded song.wav")
+        assert not start.done()
+
+        await reply(server, 'pi', Commands.OK, message="Found 0 files", files='[]')
+        await reply(server, 'pi', Commands.OK, message="Broadcast started")
+
+        return await start, await listing
+
+    start, listing = asyncio.run(run())
+    assert start['message'] == "Broadcast started"
+    assert listing['files'] == '[]'
+
+
+def test_legacy_error_answers_oldest_request(make_server):
+    async def run():
+        server = make_server('pi')
+        stop = asyncio.create_task(server._rpc('pi', Commands.STOP, timeout=1))
+        await asyncio.sleep(0.01)
+        start = asyncio.create_task(server._rpc('pi', Commands.START, timeout=1))
+        await asyncio.sleep(0.01)
+
+        await reply(server, 'pi', Commands.ERROR, message="No broadcast running")
+        await reply(server, 'pi', Commands.OK, message="Broadcast started")
+
+        return await asyncio.gather(stop, start, return_exceptions=True)
+
+    stop, start = asyncio.run(run())
+    assert isinstance(stop, RPCError)
+    assert start['message'] == "Broadcast started"
+
+
+def test_rid_less_reply_ignored_once_client_echoes_rids(make_server):
+    async def run():
+        server = make_server('pi')
+        first = asyncio.create_task(server._rpc('pi', Commands.STOP, timeout=1))
+        await asyncio.sleep(0.01)
+        await reply(server, 'pi', Commands.OK, message="Broadcast stopped", rid=rid_of(server, Commands.STOP))
+        await first
+
+        second = asyncio.create_task(server._rpc('pi', Commands.STOP, timeout=0.1))
+        await asyncio.sleep(0.01)
+        await reply(server, 'pi', Commands.OK, message="Broadcast stopped")
+        await second
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
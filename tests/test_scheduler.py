@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+from shared.scheduler import TokenBucket, TransferScheduler, LIVE_TRANSFER_RATE, PRIORITY_QUEUE, PRIORITY_BACKGROUND
+
+
+def test_token_bucket_unlimited_never_waits():
+    async def run():
+        bucket = TokenBucket(0)
+        start = time.monotonic()
+        for _ in range(100):
+            await bucket.consume(10 * 1024 * 1024)
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) < 0.1
+
+
+def test_token_bucket_limits_rate():
+    async def run():
+        bucket = TokenBucket(100_000)
+        start = time.monotonic()
+        # first second worth is in the bucket, the rest must be waited for
+        for _ in range(12):
+            await bucket.consume(10_000)
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(run())
+    assert 0.15 < elapsed < 0.5
+
+
+def test_token_bucket_oversized_chunk_does_not_block_forever():
+    async def run():
+        bucket = TokenBucket(1_000_000)
+        await asyncio.wait_for(bucket.consume(1_200_000), timeout=1)
+
+    asyncio.run(run())
+
+
+def test_per_client_cap():
+    async def run():
+        scheduler = TransferScheduler(max_active=10, per_client=2)
+        order = []
+        release = asyncio.Event()
+
+        async def transfer(name):
+            async with scheduler.slot('a'):
+                order.append(name)
+                await release.wait()
+
+        tasks = [asyncio.create_task(transfer(i)) for i in range(3)]
+        await asyncio.sleep(0.01)
+        started = list(order)
+        pending = scheduler.pending()
+
+        release.set()
+        await asyncio.gather(*tasks)
+        return started, pending, scheduler.active, scheduler.active_per_client
+
+    started, pending, active, per_client = asyncio.run(run())
+    assert started == [0, 1]
+    assert pending == 1
+    assert active == 0 and per_client == {}
+
+
+def test_waiters_served_by_priority_then_arrival():
+    async def run():
+        scheduler = TransferScheduler(max_active=1, per_client=5)
+        order = []
+        gate = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot('x'):
+                await gate.wait()
+
+        async def transfer(name, client_id, priority):
+            async with scheduler.slot(client_id, priority):
+                order.append(name)
+
+        first = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.create_task(transfer('bg1', 'a', PRIORITY_BACKGROUND)),
+            asyncio.create_task(transfer('q1', 'b', PRIORITY_QUEUE)),
+            asyncio.create_task(transfer('bg2', 'c', PRIORITY_BACKGROUND)),
+            asyncio.create_task(transfer('q2', 'd', PRIORITY_QUEUE)),
+        ]
+        await asyncio.sleep(0.01)
+        gate.set()
+        await asyncio.gather(first, *tasks)
+        return order
+
+    assert asyncio.run(run()) == ['q1', 'q2', 'bg1', 'bg2']
+
+
+def test_uncounted_slots_skip_global_cap():
+    async def run():
+        scheduler = TransferScheduler(max_active=1, per_client=2)
+        async with scheduler.slot('a'):
+            # peer transfers don't use server bandwidth
+            await asyncio.wait_for(scheduler._acquire('b', PRIORITY_QUEUE, counted=False), timeout=0.1)
+            scheduler._release('b', counted=False)
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_gives_its_slot_back():
+    async def run():
+        scheduler = TransferScheduler(max_active=1, per_client=1)
+        gate = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot('a'):
+                await gate.wait()
+
+        async def waiter():
+            async with scheduler.slot('a'):
+                pass
+
+        first = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        second = asyncio.create_task(waiter())
+        await asyncio.sleep(0.01)
+        second.cancel()
+        gate.set()
+        await first
+        await asyncio.gather(second, return_exceptions=True)
+        return scheduler.active, scheduler.active_per_client
+
+    assert asyncio.run(run()) == (0, {})
+
+
+def test_live_stream_slows_bulk_rate():
+    async def run():
+        scheduler = TransferScheduler(rate=10_000_000, live_rate=1_000_000)
+        rates = [scheduler.bucket.rate]
+        scheduler.live_started()
+        rates.append(scheduler.bucket.rate)
+        scheduler.live_stopped()
+        rates.append(scheduler.bucket.rate)
+        return rates
+
+    assert asyncio.run(run()) == [10_000_000, 1_000_000, 10_000_000]
+
+
+def test_live_stream_throttles_by_default():
+    async def run():
+        scheduler = TransferScheduler()
+        scheduler.live_started()
+        return scheduler.bucket.rate
+
+    assert asyncio.run(run()) == LIVE_TRANSFER_RATE
@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+
+from shared.protocol import PROTOCOL_VERSION, Commands, ProtocolParser, RPCError
+
+
+class FakeWebSocket:
+    def __init__(self, ip='10.0.0.2'):
+        self.remote_address = (ip, 40000)
+        self.sent = []
+        self.closed = False
+
+    async def send(self, message):
+        self.sent.append(ProtocolParser.parse_command(message))
+
+    async def close(self):
+        self.closed = True
+
+
+def counting(server):
+    # counts the onconnect / ondisconnect handler runs
+    server.connects = 0
+    server.disconnects = 0
+
+    def onconnect():
+        server.connects += 1
+
+    def ondisconnect():
+        server.disconnects += 1
+
+    server.onconnect_handlers = onconnect
+    server.ondisconnect_handlers = ondisconnect
+    return server
+
+
+async def send(server, websocket, command, *args, **kwargs):
+    await server._handle_client_message(None, ProtocolParser.build_command(command, *args, **kwargs), websocket)
+
+
+async def hello(server, websocket, **kwargs):
+    kwargs.setdefault('version', PROTOCOL_VERSION)
+    await send(server, websocket, Commands.HELLO, hostname='pi', framing='json,text', **kwargs)
+    return websocket.sent[-1]
+
+
+def test_hello_registers_in_one_message(make_server):
+    server = counting(make_server(passkey='secret'))
+    websocket = FakeWebSocket()
+    reply = asyncio.run(hello(server, websocket, passkey='secret'))
+
+    assert reply['command'] == Commands.REGISTER_OK
+    assert reply['kwargs']['client_id'] == 'pi_10.0.0.2'
+    assert reply['kwargs']['framing'] == 'json'
+    assert reply['kwargs']['resumed'] == 'false'
+    assert server.clients['pi_10.0.0.2'].websocket is websocket
+    assert server.connects == 1
+    assert not websocket.closed
+
+
+def test_legacy_registration(make_server):
+    async def run():
+        server = counting(make_server(passkey='secret'))
+        websocket = FakeWebSocket()
+        await send(server, websocket, Commands.REGISTER, hostname='pi')
+        await send(server, websocket, Commands.AUTH, 'secret')
+        # nothing is answered before the version arrives
+        assert websocket.sent == []
+        await send(server, websocket, Commands.VER, PROTOCOL_VERSION)
+        return server, websocket
+
+    server, websocket = asyncio.run(run())
+    assert [reply['command'] for reply in websocket.sent] == [Commands.REGISTER_OK]
+    assert websocket.sent[0]['kwargs']['framing'] == 'text'
+    assert 'pi_10.0.0.2' in server.clients
+    assert server.connects == 1
+
+
+@pytest.mark.parametrize('passkey', [None, 'wrong'])
+def test_hello_with_a_bad_passkey_is_refused(make_server, passkey):
+    server = counting(make_server(passkey='secret'))
+    websocket = FakeWebSocket()
+    kwargs = {'passkey': passkey} if passkey else {}
+    reply = asyncio.run(hello(server, websocket, **kwargs))
+
+    assert reply['command'] == Commands.AUTH_FAILED
+    assert websocket.closed
+    assert server.clients == {}
+    assert server.connects == 0
+
+
+def test_legacy_auth_with_a_bad_passkey_is_refused(make_server):
+    async def run():
+        server = counting(make_server(passkey='secret'))
+        websocket = FakeWebSocket()
+        await send(server, websocket, Commands.REGISTER, hostname='pi')
+        await send(server, websocket, Commands.AUTH, 'wrong')
+        return server, websocket
+
+    server, websocket = asyncio.run(run())
+    assert websocket.sent[-1]['command'] == Commands.AUTH_FAILED
+    assert websocket.closed
+    assert server.clients == {}
+
+
+def test_incompatible_version_is_refused(make_server):
+    server = counting(make_server())
+    websocket = FakeWebSocket()
+    reply = asyncio.run(hello(server, websocket, version='0.0.1'))
+
+    assert reply['command'] == Commands.VERSION_MISMATCH
+    assert reply['kwargs']['server_version'] == PROTOCOL_VERSION
+    assert websocket.closed
+    assert server.clients == {}
+
+
+def test_resumed_session_keeps_its_id_and_skips_onconnect(make_server):
+    async def run():
+        server = counting(make_server())
+        first = await hello(server, FakeWebSocket('10.0.0.2'))
+        await server._handle_client_disconnect(first['kwargs']['client_id'])
+
+        # back from another address, as the same client
+        resumed = await hello(server, FakeWebSocket('10.0.0.9'), resume=first['kwargs']['resume'])
+        return server, first, resumed
+
+    server, first, resumed = asyncio.run(run())
+    assert resumed['kwargs']['client_id'] == first['kwargs']['client_id']
+    assert resumed['kwargs']['resumed'] == 'true'
+    assert resumed['kwargs']['resume'] != first['kwargs']['resume']
+    assert server.connects == 1
+
+
+def test_resume_tokens_are_single_use(make_server):
+    async def run():
+        server = counting(make_server())
+        first = await hello(server, FakeWebSocket('10.0.0.2'))
+        await server._handle_client_disconnect(first['kwargs']['client_id'])
+        await hello(server, FakeWebSocket('10.0.0.9'), resume=first['kwargs']['resume'])
+        return await hello(server, FakeWebSocket('10.0.0.7'), resume=first['kwargs']['resume'])
+
+    reply = asyncio.run(run())
+    assert reply['kwargs']['client_id'] == 'pi_10.0.0.7'
+    assert reply['kwargs']['resumed'] == 'false'
+
+
+def test_kick_runs_the_disconnect_cleanup(make_server):
+    async def run():
+        server = counting(make_server())
+        websocket = FakeWebSocket()
+        registered = await hello(server, websocket)
+        client_id = registered['kwargs']['client_id']
+        server.fleet_index.reset(client_id, [{'name': 'a.wav'}])
+
+        listing = asyncio.create_task(server._rpc(client_id, Commands.LIST_FILES, timeout=5))
+        await asyncio.sleep(0.01)
+
+        assert await server.kick_client(client_id, reason="maintenance")
+
+        with pytest.raises(RPCError):
+            await listing
+
+        return server, websocket, client_id, registered['kwargs']['resume']
+
+    server, websocket, client_id, token = asyncio.run(run())
+    assert websocket.closed
+    assert websocket.sent[-1]['command'] == Commands.KICK
+    assert client_id not in server.clients
+    assert not server.fleet_index.tracks(client_id)
+    # a kicked client can't come back as itself
+    assert token not in server.sessions
+    assert server.disconnects == 1
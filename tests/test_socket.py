@@ -0,0 +1,103 @@
+import asyncio
+
+import shared.socket as socket_module
+from shared.socket import BWWebSocketServer, SEND_BULK, SEND_CONTROL
+
+
+class FakeWebSocket:
+    def __init__(self, blocked=False):
+        self.sent = []
+        self.closed = False
+        self.unblock = asyncio.Event()
+        if not blocked:
+            self.unblock.set()
+
+    async def send(self, message):
+        await self.unblock.wait()
+        self.sent.append(message)
+
+    async def close(self):
+        self.closed = True
+
+
+async def noop(*args):
+    pass
+
+
+def make_server():
+    return BWWebSocketServer('127.0.0.1', 0, None, noop, noop, noop)
+
+
+def test_control_messages_go_before_bulk():
+    async def run():
+        server = make_server()
+        websocket = FakeWebSocket(blocked=True)
+        server._open_outbox('c', websocket)
+
+        await server.send('c', 'bulk1', SEND_BULK)
+        await server.send('c', 'bulk2', SEND_BULK)
+        await server.send('c', 'control', SEND_CONTROL)
+
+        websocket.unblock.set()
+        assert await server.send('c', 'last', SEND_BULK, wait=True)
+        server._close_outbox('c')
+        return websocket.sent
+
+    sent = asyncio.run(run())
+    # the writer may have picked bulk1 before control was queued
+    assert sent.index('control') < sent.index('bulk2')
+    assert sent[-1] == 'last'
+
+
+def test_full_queue_disconnects_the_client(monkeypatch):
+    monkeypatch.setattr(socket_module, 'SEND_QUEUE_TIMEOUT', 0.05)
+
+    async def run():
+        server = make_server()
+        websocket = FakeWebSocket(blocked=True)
+        server._open_outbox('c', websocket)
+        server.outboxes['c'].queue = asyncio.PriorityQueue(2)
+
+        results = [await server.send('c', f'm{i}') for i in range(4)]
+        await asyncio.sleep(0)
+
+        # later sends fail right away instead of waiting again
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results.append(await server.send('c', 'after'))
+        fast = loop.time() - start < 0.04
+
+        metrics = server.metrics()['c']
+        server._close_outbox('c')
+        return results, fast, websocket.closed, server.overflows, metrics
+
+    results, fast, closed, overflows, metrics = asyncio.run(run())
+    assert results[:3] == [True, True, True] # one taken by the writer, two queued
+    assert results[3:] == [False, False]
+    assert fast
+    assert closed
+    assert overflows == 1
+    assert metrics['dropped'] == 1
+
+
+def test_closing_mid_send_releases_the_waiter():
+    async def run():
+        server = make_server()
+        websocket = FakeWebSocket(blocked=True)
+        server._open_outbox('c', websocket)
+
+        # the writer has taken the message and is stuck writing it
+        waiter = asyncio.create_task(server.send('c', 'stuck', wait=True))
+        await asyncio.sleep(0.01)
+        server._close_outbox('c')
+
+        return await asyncio.wait_for(waiter, timeout=1)
+
+    assert asyncio.run(run()) is False
+
+
+def test_send_to_unknown_client():
+    async def run():
+        return await make_server().send('nobody', 'x')
+
+    assert asyncio.run(run()) is False
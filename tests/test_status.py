@@ -0,0 +1,24 @@
+def heartbeat(make_server, **kwargs):
+    server = make_server('pi')
+    client = server.clients['pi']
+    server._apply_status('pi', {'broadcasting': 'true', 'file': 'a.wav', **kwargs})
+    return client
+
+
+def test_position_moves_on_between_heartbeats(make_server):
+    client = heartbeat(make_server, position='10', duration='180.0')
+    client.status_at -= 5
+    assert round(client.playback_position()) == 15
+
+
+def test_looped_position_wraps(make_server):
+    client = heartbeat(make_server, position='58', duration='60.0', loops='2')
+    client.status_at -= 5
+
+    assert client.status['loops'] == 2
+    assert round(client.playback_position()) == 3
+
+
+def test_idle_client_has_no_position(make_server):
+    client = heartbeat(make_server, broadcasting='false', position='10')
+    assert client.playback_position() is None
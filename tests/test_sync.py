@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import os
+
+from shared.protocol import Commands, ProtocolParser
+
+
+def sync_server(make_server, manifests, failing=()):
+    server = make_server(*manifests)
+    server.uploads = []
+    server.batches = [] # (batch size, files prepared so far) per _send_many call
+    server.prepared = 0
+
+    # answers removals like a client would, refusing the ones in failing
+    async def remove_file(client_id, parsed):
+        if parsed['command'] != Commands.REMOVE_FILE:
+            return
+
+        filename = parsed['kwargs']['filename']
+
+        if filename in failing:
+            reply = ProtocolParser.build_command(Commands.ERROR, message="Permission denied", rid=parsed['kwargs']['rid'])
+        else:
+            manifests[client_id].pop(filename, None)
+            reply = ProtocolParser.build_command(Commands.OK, message=f"Removed {filename}", rid=parsed['kwargs']['rid'])
+
+        await server._handle_client_message(client_id, reply, None)
+
+    server.ws_server.on_send = remove_file
+
+    prepare_upload = server._prepare_upload
+
+    async def counting_prepare(path):
+        server.prepared += 1
+        return await prepare_upload(path)
+
+    async def collect_manifests(client_ids):
+        return {client_id: dict(manifests[client_id]) for client_id in client_ids}
+
+    async def send_upload(needing, prepared, priority):
+        server.uploads.append(prepared['filename'])
+        for client_id in needing:
+            manifests[client_id][prepared['filename']] = {'name': prepared['filename'], 'size': prepared['size'], 'sha256': prepared['sha256']}
+        return needing
+
+    server._collect_manifests = collect_manifests
+    server._send_upload = send_upload
+    server._prepare_upload = counting_prepare
+    server._send_many = lambda bundled, priority: send_many(server, bundled, priority)
+    server._parse_client_targets = lambda targets: targets.split(',')
+    return server
+
+
+async def send_many(server, bundled, priority):
+    server.batches.append((len(bundled), server.prepared))
+    sent = []
+    for prepared, needing in bundled:
+        received = await server._send_upload(needing, prepared, priority)
+        if received:
+            sent.append((prepared, received))
+    return sent
+
+
+def removals(server):
+    return [parsed['kwargs']['filename'] for _, parsed in server.ws_server.sent if parsed['command'] == 'REMOVE_FILE']
+
+
+def test_sync_keeps_mixed_case_wav_files(tmp_path, make_server):
+    source = tmp_path / 'source'
+    source.mkdir()
+    (source / 'Song.WAV').write_bytes(b'RIFF upper')
+    (source / 'other.Wav').write_bytes(b'RIFF mixed')
+    (source / 'plain.wav').write_bytes(b'RIFF lower')
+
+    manifests = {'pi': {'stale.wav': {'name': 'stale.wav', 'size': 1, 'sha256': 'x'}}}
+    server = sync_server(make_server, manifests)
+
+    async def run():
+        first = await server.sync_files('pi', str(source) + '/')
+        first_uploads = sorted(server.uploads)
+        first_removals = removals(server)
+
+        server.uploads.clear()
+        server.ws_server.sent.clear()
+
+        # second run: everything is there, nothing moves (known fast path)
+        second = await server.sync_files('pi', str(source) + '/')
+        return first, first_uploads, first_removals, second, server.uploads, removals(server)
+
+    first, first_uploads, first_removals, second, second_uploads, second_removals = asyncio.run(run())
+
+    assert first and second
+    assert first_uploads == ['Song.WAV', 'other.Wav', 'plain.wav']
+    assert first_removals == ['stale.wav']
+    assert second_uploads == []
+    assert second_removals == []
+    assert manifests['pi']['Song.WAV']['sha256'] == hashlib.sha256(b'RIFF upper').hexdigest()
+
+
+def test_synced_name(make_server):
+    server = sync_server(make_server, {})
+    assert server._synced_name('a.WAV') == 'a.WAV'
+    assert server._synced_name('a.mp3') == 'a.wav'
+    assert server._synced_name('a.tar.FLAC') == 'a.tar.wav'
+
+
+def test_sync_sends_bundles_while_preparing(tmp_path, make_server):
+    source = tmp_path / 'source'
+    source.mkdir()
+    for index in range(70):
+        (source / f'{index:02}.wav').write_bytes(b'RIFF %d' % index)
+
+    manifests = {'pi': {}}
+    server = sync_server(make_server, manifests)
+
+    assert asyncio.run(server.sync_files('pi', str(source) + '/'))
+    assert [size for size, _ in server.batches] == [32, 32, 6]
+    # the first batch went out before every file was prepared
+    assert server.batches[0][1] < 70
+    assert len(manifests['pi']) == 70
+
+
+def test_tracked_clients_are_not_asked_for_files(make_server):
+    server = make_server()
+    server.fleet_index.reset('pi', [{'name': 'a.wav', 'size': 1, 'sha256': 'h'}])
+
+    manifests = asyncio.run(server._collect_manifests(['pi']))
+
+    assert manifests == {'pi': {'a.wav': {'name': 'a.wav', 'size': 1, 'sha256': 'h'}}}
+    assert server.ws_server.sent == []
+
+
+def test_only_confirmed_removals_count(make_server):
+    manifests = {'pi': {'a.wav': {}, 'b.wav': {}, 'keep.wav': {}}}
+    server = sync_server(make_server, manifests, failing={'b.wav'})
+
+    removed = asyncio.run(server._remove_extras({'pi': dict(manifests['pi'])}, {'keep.wav'}))
+
+    assert removed == 1
+    assert set(manifests['pi']) == {'b.wav', 'keep.wav'}
+    assert server.pending_responses == {}
@@ -0,0 +1,46 @@
+import asyncio
+
+
+def test_folder_upload_sends_bundles_while_converting(tmp_path, make_server):
+    folder = tmp_path / 'jingles'
+    folder.mkdir()
+    for index in range(70):
+        (folder / f'{index:02}.mp3').write_bytes(b'mp3')
+
+    server = make_server('pi')
+    server.prepared = 0
+    server.batches = [] # (batch size, files prepared so far) per _send_many call
+
+    async def prepare_upload(path, transcode):
+        server.prepared += 1
+        await asyncio.sleep(0.001)
+        return {'filename': path.rsplit('/', 1)[1].replace('.mp3', '.wav'), 'path': path, 'size': 1000}
+
+    async def send_many(items, priority=0):
+        server.batches.append((len(items), server.prepared))
+        return [(prepared, clients) for prepared, clients in items]
+
+    server._prepare_upload = prepare_upload
+    server._send_many = send_many
+
+    assert asyncio.run(server._upload_folder_contents('pi', str(folder)))
+    assert [size for size, _ in server.batches] == [32, 32, 6]
+    # the first batch went out before every file was converted
+    assert server.batches[0][1] < 70
+
+
+def test_send_many_reports_the_clients_that_got_each_file(tmp_path, make_server):
+    server = make_server('pi', 'gone')
+    path = tmp_path / 'a.wav'
+    path.write_bytes(b'RIFF')
+    prepared = {'filename': 'a.wav', 'path': str(path), 'size': 4}
+
+    async def transfer_via(source_id, client_id, prepared, priority):
+        return client_id == 'pi'
+
+    server._transfer_via = transfer_via
+    server._discard_prepared = lambda prepared: None
+
+    sent = asyncio.run(server._send_many([(prepared, ['pi', 'gone'])]))
+
+    assert sent == [(prepared, ['pi'])]
@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class Remote:
+    # a local http server with one file and its ETag, answering conditional requests
+
+    def __init__(self):
+        self.body = b'mp3 v1'
+        self.etag = '"v1"'
+        self.statuses = []
+
+        remote = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.headers.get('If-None-Match') == remote.etag:
+                    remote.statuses.append(304)
+                    self.send_response(304)
+                    self.send_header('ETag', remote.etag)
+                    self.end_headers()
+                    return
+
+                remote.statuses.append(200)
+                self.send_response(200)
+                self.send_header('ETag', remote.etag)
+                self.send_header('Content-Length', str(len(remote.body)))
+                self.end_headers()
+                self.wfile.write(remote.body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/song.mp3"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def remote():
+    remote = Remote()
+    yield remote
+    remote.server.shutdown()
+    remote.server.server_close()
+
+
+def test_dl_revalidates_the_cached_copy(make_server, remote):
+    server = make_server()
+    server.conversions = 0
+
+    # stands in for ffmpeg, the "wav" is a copy of the download
+    async def convert(source, destination):
+        server.conversions += 1
+        shutil.copyfile(source, destination)
+        return destination
+
+    server.converter.convert = convert
+
+    async def run():
+        first = await server._fetch_url(remote.url)
+        first_body = open(first['path'], 'rb').read()
+        cached = server.url_cache.cached(remote.url)
+
+        repeat = await server._fetch_url(remote.url)
+        repeat_conversions = server.conversions
+
+        remote.body, remote.etag = b'mp3 v2', '"v2"'
+        changed = await server._fetch_url(remote.url)
+
+        return first, first_body, cached, repeat, repeat_conversions, changed
+
+    first, first_body, cached, repeat, repeat_conversions, changed = asyncio.run(run())
+
+    # downloaded, converted and stored with its validator
+    assert first['filename'] == 'song.wav'
+    assert first_body == b'mp3 v1'
+    assert first['sha256'] == hashlib.sha256(b'mp3 v1').hexdigest()
+    assert cached['etag'] == '"v1"'
+
+    # unchanged: a 304, the cached wav is reused without converting again
+    assert remote.statuses[:2] == [200, 304]
+    assert repeat_conversions == 1
+    assert repeat['path'] == first['path']
+    assert repeat['sha256'] == first['sha256']
+
+    # new ETag: downloaded and converted again
+    assert remote.statuses[2:] == [200]
+    assert server.conversions == 2
+    assert changed['sha256'] == hashlib.sha256(b'mp3 v2').hexdigest()
+    assert server.url_cache.cached(remote.url)['etag'] == '"v2"'
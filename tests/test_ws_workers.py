@@ -0,0 +1,92 @@
+import asyncio
+import ssl
+
+import websockets
+
+from server.server import BotWaveServer
+from shared.protocol import PROTOCOL_VERSION, Commands, ProtocolParser
+from shared.socket import BWWebSocketServer
+from shared.tls import gen_cert
+from shared.ws_workers import RemoteSocket, WorkerPool
+
+
+class FakeWriter:
+    def __init__(self):
+        self.written = []
+
+    def write(self, data):
+        self.written.append(data)
+
+    async def drain(self):
+        pass
+
+    def is_closing(self):
+        return False
+
+
+def test_stop_ends_the_remote_sockets():
+    async def run():
+        pool = WorkerPool(None, 2, '', '')
+        sock = RemoteSocket(FakeWriter(), 1, ('10.0.0.2', 40000))
+        pool.sockets[(0, 1)] = sock
+
+        async def read():
+            return [message async for message in sock]
+
+        reader = asyncio.create_task(read())
+        sock.feed("PONG")
+        await pool.stop()
+
+        return await asyncio.wait_for(reader, timeout=1), sock, pool
+
+    messages, sock, pool = asyncio.run(run())
+    assert messages == ["PONG"]
+    assert sock.closed
+    assert pool.sockets == {}
+
+
+def test_clients_register_through_a_worker(tmp_path):
+    cert_path, key_path = tmp_path / 'cert.pem', tmp_path / 'key.pem'
+    cert_pem, key_pem = gen_cert()
+    cert_path.write_text(cert_pem)
+    key_path.write_text(key_pem)
+
+    async def run():
+        server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_context.load_cert_chain(cert_path, key_path)
+        client_context = ssl.create_default_context()
+        client_context.check_hostname = False
+        client_context.verify_mode = ssl.CERT_NONE
+
+        server = BotWaveServer(host='127.0.0.1', ws_port=9934, handlers_dir=str(tmp_path), upload_dir=str(tmp_path / 'uploads'), cache_dir=str(tmp_path / 'cache'))
+        server.ws_server = BWWebSocketServer('127.0.0.1', 9934, server_context, server._handle_client_message, server._handle_client_connect, server._handle_client_disconnect)
+        pool = WorkerPool(server.ws_server, 1, str(cert_path), str(key_path))
+        await pool.start()
+
+        try:
+            async with websockets.connect("wss://127.0.0.1:9934", ssl=client_context) as websocket:
+                await websocket.send(ProtocolParser.build_command(Commands.HELLO, version=PROTOCOL_VERSION, hostname='pi'))
+                registered = ProtocolParser.parse_command(await websocket.recv())
+
+                # commands go back through the worker
+                await server.ws_server.send(registered['kwargs']['client_id'], ProtocolParser.build_command(Commands.PING))
+                ping = ProtocolParser.parse_command(await websocket.recv())
+
+                connected = list(server.clients)
+
+            # the worker reports the client gone
+            for _ in range(100):
+                if not server.clients:
+                    break
+                await asyncio.sleep(0.01)
+
+            return registered, ping, connected, dict(server.clients)
+        finally:
+            await server.ws_server.stop()
+            await pool.stop()
+
+    registered, ping, connected, remaining = asyncio.run(run())
+    assert registered['command'] == Commands.REGISTER_OK
+    assert ping['command'] == Commands.PING
+    assert connected == [registered['kwargs']['client_id']]
+    assert remaining == {}